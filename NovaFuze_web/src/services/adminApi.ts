@@ -89,6 +89,29 @@ export const getAdminFileDetails = async (fileId: string, token: string) => {
   }
 };
 
+export const getAdminFileChunks = async (
+  fileId: string,
+  token: string,
+  options: { afterIndex?: number; limit?: number; query?: string } = {}
+) => {
+  try {
+    const response = await api.get(`/api/admin/files/${fileId}/chunks`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      },
+      params: {
+        after_index: options.afterIndex ?? -1,
+        limit: options.limit ?? 50,
+        ...(options.query ? { q: options.query } : {})
+      }
+    });
+    return response.data;
+  } catch (error: unknown) {
+    console.error('Error fetching admin file chunks:', error);
+    throw error;
+  }
+};
+
 export const deleteAdminFile = async (fileId: string, token: string) => {
   try {
     const response = await api.delete(`/api/admin/files/${fileId}`, {
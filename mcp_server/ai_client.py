@@ -1,10 +1,109 @@
+import logging
 import os
 import re
-import google.generativeai as genai
+import threading
+import time
 
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+import metrics
+from deadline import DeadlineExceeded, remaining_seconds
 
-model = genai.GenerativeModel('gemini-2.5-pro')
+logger = logging.getLogger(__name__)
+
+
+# Model routing: simple turns go to the fast model, hard ones to the strong model.
+# MODEL_ROUTING_POLICY: "auto" (classify each request), "fast" or "strong" (always use one)
+FAST_MODEL_NAME = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash")
+STRONG_MODEL_NAME = os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-pro")
+MODEL_ROUTING_POLICY = os.getenv("MODEL_ROUTING_POLICY", "auto").lower()
+# Questions up to this many characters count as short
+ROUTING_MAX_FAST_CHARS = int(os.getenv("ROUTING_MAX_FAST_CHARS", "200"))
+# Vector similarity above which retrieved file chunks are treated as relevant
+ROUTING_MIN_RETRIEVAL_CONFIDENCE = float(os.getenv("ROUTING_MIN_RETRIEVAL_CONFIDENCE", "0.35"))
+
+# Upper bound for a single Gemini call outside of a request deadline
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+
+ROUTE_FAST = "fast"
+ROUTE_STRONG = "strong"
+
+_GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|bye|good (morning|afternoon|evening))\b[\s!.?]*$",
+    re.IGNORECASE
+)
+_COMPLEX_PATTERN = re.compile(
+    r"\b(explain|compare|analy[sz]e|summari[sz]e|why|how (does|do|can|would)|step[- ]by[- ]step|"
+    r"difference|pros and cons|calculate|code|debug|plan|write)\b",
+    re.IGNORECASE
+)
+
+_models = {}
+_genai = None
+_genai_lock = threading.Lock()
+
+def _get_genai():
+    """google.generativeai, imported and configured on first use (it pulls in grpc and protobuf)"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+                _genai = genai
+    return _genai
+
+def get_model(route: str = ROUTE_STRONG):
+    """Get (and lazily create) the Gemini model for a route"""
+    name = FAST_MODEL_NAME if route == ROUTE_FAST else STRONG_MODEL_NAME
+    if name not in _models:
+        _models[name] = _get_genai().GenerativeModel(name)
+    return _models[name]
+
+def _retrieval_confidence(file_context: list[dict] = None) -> float | None:
+    """Best vector similarity among retrieved file chunks; None when there are none"""
+    scores = [
+        chunk.get('original_similarity', chunk.get('similarity_score'))
+        for chunk in (file_context or [])
+        if 'similarity_score' in chunk
+    ]
+    scores = [s for s in scores if s is not None]
+    return max(scores) if scores else None
+
+def choose_route(prompt: str, file_context: list[dict] = None) -> tuple[str, str]:
+    """
+    Classify a request as fast or strong using cheap signals only.
+
+    Returns (route, reason). Questions with relevant file context always go to the
+    strong model so document answers keep their quality.
+    """
+    if MODEL_ROUTING_POLICY in (ROUTE_FAST, ROUTE_STRONG):
+        return MODEL_ROUTING_POLICY, "policy"
+
+    confidence = _retrieval_confidence(file_context)
+    if confidence is not None and confidence >= ROUTING_MIN_RETRIEVAL_CONFIDENCE:
+        return ROUTE_STRONG, "file_context"
+    if _GREETING_PATTERN.match(prompt or ""):
+        return ROUTE_FAST, "greeting"
+    if len(prompt or "") > ROUTING_MAX_FAST_CHARS:
+        return ROUTE_STRONG, "long_prompt"
+    if _COMPLEX_PATTERN.search(prompt or ""):
+        return ROUTE_STRONG, "complex_prompt"
+    return ROUTE_FAST, "short_prompt"
+
+def _generate(route: str, reason: str, prompt: str):
+    """Call the routed model and record per-route latency"""
+    metrics.increment("gemini_requests_total", route=route, reason=reason)
+    # Never wait on Gemini longer than the current request has left
+    timeout = remaining_seconds(GEMINI_TIMEOUT_SECONDS)
+    if timeout <= 0:
+        raise DeadlineExceeded("generation")
+    start = time.perf_counter()
+    try:
+        return get_model(route).generate_content(prompt, request_options={'timeout': timeout})
+    except Exception:
+        metrics.increment("gemini_errors_total", route=route)
+        raise
+    finally:
+        metrics.observe("gemini_latency_seconds", time.perf_counter() - start, route=route)
 
 def expand_query(query: str, conversation_context: list[dict] = None) -> list[str]:
     """
@@ -35,7 +134,8 @@ User Query: {query}
 
 Generate 2 alternative queries (one per line, no numbering):"""
         
-        response = model.generate_content(expansion_prompt)
+        # Rewrites are simple, so they always use the fast model
+        response = _generate(ROUTE_FAST, "expand_query", expansion_prompt)
         expanded = response.text.strip().split('\n')
         
         # Clean and filter expansions
@@ -50,12 +150,12 @@ Generate 2 alternative queries (one per line, no numbering):"""
         return expansions[:3]  # Max 3 total (original + 2 expansions)
         
     except Exception as e:
-        print(f"Query expansion failed: {e}")
+        logger.warning(f"Query expansion failed: {e}")
         return [query]  # Fallback to original query
 
-def generate_from_prompt(prompt: str, context: list[dict], user_name: str = None, file_context: list[dict] = None):
+def build_prompt(prompt: str, context: list[dict], user_name: str = None, file_context: list[dict] = None) -> str:
     """
-    Generates a response from the Gemini model with optional file context.
+    Builds the full Gemini prompt from the system prompt, conversation and file context.
     """
     # System prompt to define AI behavior (silent RAG)
     system_prompt = """You are Nova, an AI assistant for NovaFuze-Tech. Be polite, professional, and helpful.
@@ -96,11 +196,12 @@ Keep responses concise and natural.
         full_prompt = f"{system_prompt}\n\n{user_context}{file_context_str}\nCurrent message: {prompt}"
     else:
         full_prompt = f"{system_prompt}\n\n{user_context}Current message: {prompt}"
+    return full_prompt
 
-    # Generate
-    response = model.generate_content(full_prompt)
-    text = (response.text or "").strip()
-
+def sanitize_response(text: str) -> str:
+    """
+    Cleans up a model answer before it is returned to the user.
+    """
     # Last-resort sanitization to remove meta-source phrases and salutations
     banned_keyword_fragments = [
         "based on the document", "from the document", "from the database",
@@ -126,3 +227,19 @@ Keep responses concise and natural.
     text = re.sub(r"\n{3,}", "\n\n", text).strip()
 
     return text
+
+def generate_from_prompt(prompt: str, context: list[dict], user_name: str = None, file_context: list[dict] = None):
+    """
+    Generates a response from the Gemini model with optional file context.
+    """
+    with metrics.span("prompt_build"):
+        full_prompt = build_prompt(prompt, context, user_name, file_context)
+
+    # Generate with the model chosen for this request
+    route, reason = choose_route(prompt, file_context)
+    with metrics.span("gemini_call"):
+        response = _generate(route, reason, full_prompt)
+        text = (response.text or "").strip()
+
+    with metrics.span("sanitize"):
+        return sanitize_response(text)
@@ -0,0 +1,140 @@
+"""
+Semantic answer cache for website FAQ questions
+Reuses a previous answer when a new question without file context or chat
+history is semantically close to one already answered from the website
+knowledge base
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))
+
+
+def knowledge_hash(*knowledge_parts: Optional[str]) -> str:
+    """Hash of the knowledge base text; answers cached under another hash are never served"""
+    digest = hashlib.sha256()
+    for part in knowledge_parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _normalize(vector) -> Optional[np.ndarray]:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    if norm == 0.0:
+        return None
+    return array / norm
+
+
+class AnswerCache:
+    """
+    LRU of (question embedding, answer) pairs per knowledge-base hash.
+
+    Lookups compare the query embedding with every cached question of the
+    current knowledge hash in a single matrix-vector product.
+    """
+
+    def __init__(self, similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL,
+                 enabled: bool = ANSWER_CACHE_ENABLED):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._matrix_cache: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query_embedding: np.ndarray, kb_hash: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        query = _normalize(query_embedding)
+        with self._lock:
+            if query is None:
+                self.misses += 1
+                return None
+            keys, matrix = self._matrix_locked(kb_hash)
+            if not keys:
+                self.misses += 1
+                return None
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            key = keys[best]
+            entry = self._entries[key]
+            if entry['expires_at'] <= time.monotonic():
+                del self._entries[key]
+                self._matrix_cache.pop(kb_hash, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry['hits'] += 1
+            self.hits += 1
+            return entry['answer']
+
+    def store(self, question: str, query_embedding: np.ndarray, answer: str, kb_hash: str) -> None:
+        if not self.enabled or not answer:
+            return
+        vector = _normalize(query_embedding)
+        if vector is None:
+            return
+        key = (kb_hash, question.strip().lower())
+        with self._lock:
+            self._entries[key] = {
+                'vector': vector,
+                'answer': answer,
+                'expires_at': time.monotonic() + self.ttl,
+                'hits': 0
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix_cache.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'saved_gemini_calls': self.hits,
+                'similarity_threshold': self.similarity_threshold
+            }
+
+    def _matrix_locked(self, kb_hash: str):
+        cached = self._matrix_cache.get(kb_hash)
+        if cached is None:
+            keys = [key for key in self._entries if key[0] == kb_hash]
+            if keys:
+                matrix = np.stack([self._entries[key]['vector'] for key in keys])
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            cached = (keys, matrix)
+            self._matrix_cache[kb_hash] = cached
+        return cached
+
+
+answer_cache = AnswerCache()
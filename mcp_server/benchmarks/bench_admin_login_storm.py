@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat latency during an admin login storm
+
+Simulates chat requests on an asyncio event loop (each awaits a short I/O wait)
+while a burst of admin logins verifies bcrypt passwords, and compares:
+
+  baseline  - no logins
+  inline    - bcrypt.checkpw called directly in the coroutine (old /admin/login)
+  offloaded - verification via admin_tools on its dedicated bcrypt pool
+
+Runs fully offline; only bcrypt and python-jose are required.
+
+Usage:
+    python benchmarks/bench_admin_login_storm.py [--logins 40] [--chats 200] [--rounds 12]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def chat_request(io_wait: float) -> float:
+    start = time.perf_counter()
+    await asyncio.sleep(io_wait)
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_scenario(mode: str, hashed: str, logins: int, chats: int, io_wait: float) -> dict:
+    from tools import admin_tools
+
+    async def login_inline():
+        bcrypt.checkpw(b"wrong-password", hashed.encode('utf-8'))
+
+    async def login_offloaded():
+        try:
+            await asyncio.to_thread(admin_tools.verify_password, "wrong-password", hashed)
+        except admin_tools.PasswordHasherBusy:
+            pass
+
+    async def chat_stream():
+        latencies = []
+        for _ in range(chats):
+            latencies.append(await chat_request(io_wait))
+        return latencies
+
+    login_fn = {'inline': login_inline, 'offloaded': login_offloaded}.get(mode)
+    start = time.perf_counter()
+    chat_task = asyncio.create_task(chat_stream())
+    if login_fn:
+        await asyncio.gather(*(login_fn() for _ in range(logins)))
+    latencies = await chat_task
+    elapsed = time.perf_counter() - start
+
+    return {
+        'mode': mode,
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2),
+        'elapsed_s': round(elapsed, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat latency during an admin login storm")
+    parser.add_argument('--logins', type=int, default=40, help='Concurrent login attempts')
+    parser.add_argument('--chats', type=int, default=200, help='Sequential simulated chat requests')
+    parser.add_argument('--io-wait', type=float, default=0.005, help='Simulated I/O per chat request (s)')
+    parser.add_argument('--rounds', type=int, default=None, help='bcrypt cost factor (default: BCRYPT_ROUNDS)')
+    args = parser.parse_args()
+
+    if args.rounds:
+        os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+    from tools import admin_tools
+    hashed = admin_tools.hash_password("correct-password")
+
+    print("=" * 60)
+    print("ADMIN LOGIN STORM BENCHMARK")
+    print("=" * 60)
+    print(f"bcrypt cost: {admin_tools.BCRYPT_ROUNDS} | pool workers: {admin_tools.BCRYPT_WORKERS}"
+          f" | logins: {args.logins} | chats: {args.chats}")
+    print()
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9} {'total s':>8}")
+    for mode in ('baseline', 'inline', 'offloaded'):
+        result = asyncio.run(run_scenario(mode, hashed, args.logins, args.chats, args.io_wait))
+        print(f"{result['mode']:<10} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+              f"{result['p99_ms']:>8} {result['max_ms']:>9} {result['elapsed_s']:>8}")
+    print()
+    print("Offloaded chat latency should stay close to baseline; inline stalls for the whole storm.")
+
+
+if __name__ == "__main__":
+    main()
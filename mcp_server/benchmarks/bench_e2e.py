@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the FastAPI app against local stand-ins
+
+Boots main.app in process with FakeSupabase (tables, RPC, storage) and a
+deterministic FakeGeminiModel (see benchmarks/fakes.py), seeds users, files and
+chunk embeddings, then drives each workload through the real HTTP stack
+(httpx ASGI transport) at the requested concurrency:
+
+  chat    - POST /mcp/query
+  upload  - POST /mcp/upload-pdf (synthetic .txt documents)
+  search  - POST /mcp/search-files
+  admin   - GET /admin/files, /admin/stats and /admin/files/{id}/chunks
+
+For every workload it reports throughput, client-side latency percentiles and
+the per-stage p50/p95/p99 recorded by the server's own spans. Results can be
+saved as JSON and compared with an earlier run (e.g. from another commit).
+
+Needs the server's dependencies installed; no network, Supabase project or
+Gemini key is used. --fake-embeddings also skips loading sentence-transformers.
+
+Usage:
+    python benchmarks/bench_e2e.py --fake-embeddings --output bench.json
+    python benchmarks/bench_e2e.py --fake-embeddings --compare bench.json
+    python benchmarks/bench_e2e.py --workloads chat --concurrency 32 --gemini-latency-ms 800
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Settings() in main.py requires these; nothing talks to the real services
+os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+os.environ.setdefault("SUPABASE_URL", "http://supabase.bench.invalid")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench.fake.key")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+TOPICS = [
+    "invoice payment terms refund policy billing cycle",
+    "cloud deployment kubernetes cluster scaling nodes",
+    "machine learning model training dataset accuracy",
+    "employee onboarding leave policy holidays payroll",
+    "website redesign landing page conversion analytics",
+    "mobile app release android ios crash reports",
+    "security audit password rotation access control",
+    "customer support ticket escalation response time",
+]
+FILLER = "the a of and to in for with on project team quarterly report update plan".split()
+WORKLOADS = ("chat", "upload", "search", "admin")
+ADMIN_EMAIL = "bench-admin@example.com"
+ADMIN_PASSWORD = "bench-password"
+
+
+def synthetic_text(rng: random.Random, topic: str, words: int) -> str:
+    vocabulary = topic.split() + FILLER
+    sentences, current = [], []
+    for _ in range(words):
+        current.append(rng.choice(vocabulary))
+        if len(current) >= rng.randint(8, 16):
+            sentences.append(" ".join(current).capitalize() + ".")
+            current = []
+    if current:
+        sentences.append(" ".join(current).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def install_fakes(args):
+    """Swap Supabase, Gemini and (optionally) the embedding models for the fakes"""
+    import fakes
+    import ai_client
+    import supabase_client
+    from tools import file_tools
+
+    fake_db = fakes.FakeSupabase(latency_ms=args.db_latency_ms)
+    gemini = fakes.FakeGeminiModel(latency_ms=args.gemini_latency_ms, jitter_ms=args.gemini_jitter_ms,
+                                   seed=args.seed)
+    for name in (ai_client.FAST_MODEL_NAME, ai_client.STRONG_MODEL_NAME):
+        ai_client._models[name] = gemini
+
+    if args.fake_embeddings:
+        file_tools.generate_embedding = fakes.fake_embedding
+        file_tools.generate_embeddings_batch = fakes.fake_embeddings_batch
+        file_tools.generate_embedding_array = fakes.fake_embedding_array
+        file_tools.generate_embeddings_array = fakes.fake_embeddings_array
+        file_tools.rerank_results = fakes.fake_rerank
+        file_tools.SEMANTIC_EMBEDDINGS_AVAILABLE = True
+
+    import main
+
+    def init_fake_supabase(url, key):
+        supabase_client.supabase = fake_db
+        return fake_db
+
+    main.init_supabase = init_fake_supabase
+    return main, fake_db, gemini
+
+
+def seed(fake_db, args, rng: random.Random):
+    """Users with processed files, chunks and embeddings; returns [(firebase_uid, topic)]"""
+    import supabase_client
+    from tools import file_tools
+
+    users = []
+    for u in range(args.seed_users):
+        firebase_uid = f"bench-user-{u}"
+        user = supabase_client.get_or_create_user(firebase_uid, f"user{u}@example.com", f"Bench User {u}")
+        topic = TOPICS[u % len(TOPICS)]
+        users.append((firebase_uid, topic))
+        for f in range(args.seed_files):
+            file_row = fake_db.table('files').insert({
+                'user_id': user['id'], 'filename': f"seed-{u}-{f}.txt", 'original_filename': f"notes-{f}.txt",
+                'file_type': 'txt', 'file_size': 0, 'file_path': f"uploads/{user['id']}/seed-{f}.txt",
+                'content_type': 'text/plain', 'upload_status': 'processed'
+            }).execute().data[0]
+            texts = [synthetic_text(rng, topic, 120) for _ in range(args.seed_chunks)]
+            vectors = file_tools.generate_embeddings_batch(texts)
+            for index, (text, vector) in enumerate(zip(texts, vectors)):
+                chunk = fake_db.table('file_chunks').insert({
+                    'file_id': file_row['id'], 'chunk_index': index, 'content': text, 'page_number': 1
+                }).execute().data[0]
+                fake_db.table('embeddings').insert({
+                    'file_chunk_id': chunk['id'], 'vector': vector, 'content_type': 'file_chunk'
+                }).execute()
+    return users
+
+
+async def run_workload(name, client, count, concurrency, make_request, registry):
+    registry.reset()
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+
+    stages = {}
+    for series in registry.snapshot(prefix="chat_stage_seconds").get("chat_stage_seconds", []):
+        stages[series['labels']['stage']] = {
+            'count': series['count'],
+            'p50_ms': round(series['p50'] * 1000, 2),
+            'p95_ms': round(series['p95'] * 1000, 2),
+            'p99_ms': round(series['p99'] * 1000, 2)
+        }
+    return {
+        'requests': count,
+        'errors': errors,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2)
+        },
+        'stages': stages
+    }
+
+
+def build_workloads(users, admin_headers, rng: random.Random, args):
+    def question(i):
+        _, topic = users[i % len(users)]
+        words = topic.split()
+        return f"What does the {rng.choice(words)} {rng.choice(words)} section say? ({i})"
+
+    async def chat(client, i):
+        firebase_uid, _ = users[i % len(users)]
+        return await client.post("/mcp/query", json={
+            'user_id': firebase_uid, 'message': question(i), 'user_name': None
+        })
+
+    async def upload(client, i):
+        firebase_uid, topic = users[i % len(users)]
+        body = synthetic_text(rng, topic, args.upload_kb * 150).encode('utf-8')
+        return await client.post("/mcp/upload-pdf", params={'user_id': firebase_uid},
+                                 files={'file': (f"bench-{i}.txt", body, "text/plain")})
+
+    async def search(client, i):
+        firebase_uid, _ = users[i % len(users)]
+        return await client.post("/mcp/search-files", params={'user_id': firebase_uid, 'query': question(i)})
+
+    async def admin(client, i):
+        choice = i % 3
+        if choice == 0:
+            return await client.get("/admin/files", params={'limit': 50}, headers=admin_headers)
+        if choice == 1:
+            return await client.get("/admin/stats", headers=admin_headers)
+        files = (await client.get("/admin/files", params={'limit': 1, 'include_total': False},
+                                  headers=admin_headers)).json().get('files') or [{'id': 'missing'}]
+        return await client.get(f"/admin/files/{files[0]['id']}/chunks", params={'limit': 20},
+                                headers=admin_headers)
+
+    return {'chat': chat, 'upload': upload, 'search': search, 'admin': admin}
+
+
+async def run(args):
+    import httpx
+    import metrics
+
+    rng = random.Random(args.seed)
+    main, fake_db, gemini = install_fakes(args)
+    await main.startup_event()
+    try:
+        seed_start = time.perf_counter()
+        users = seed(fake_db, args, rng)
+        seed_seconds = time.perf_counter() - seed_start
+
+        from tools import admin_tools
+        admin_tools.create_admin_user(ADMIN_EMAIL, ADMIN_PASSWORD, "Bench Admin")
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            login = await client.post("/admin/login", json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+            token = login.json().get('token') if login.status_code == 200 else None
+            admin_headers = {'Authorization': f"Bearer {token}"} if token else {}
+            workloads = build_workloads(users, admin_headers, rng, args)
+
+            results = {}
+            for name in args.workloads:
+                count = args.requests if name != "upload" else max(1, args.requests // 4)
+                print(f"Running {name}: {count} requests at concurrency {args.concurrency}...")
+                results[name] = await run_workload(name, client, count, args.concurrency,
+                                                   workloads[name], metrics.registry)
+    finally:
+        await main.shutdown_event()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed_seconds': round(seed_seconds, 2),
+            'gemini_calls': gemini.calls,
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+        },
+        'workloads': results
+    }
+
+
+def print_report(results):
+    print(f"\nCommit {results['meta']['commit']}, seeded in {results['meta']['seed_seconds']}s\n")
+    print(f"{'workload':<8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results['workloads'].items():
+        latency = result['latency_ms']
+        print(f"{name:<8} {result['throughput_rps']:>8} {latency['p50']:>9} {latency['p95']:>9} "
+              f"{latency['p99']:>9} {result['errors']:>7}")
+    for name, result in results['workloads'].items():
+        if not result['stages']:
+            continue
+        print(f"\n{name} stages    {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, values in sorted(result['stages'].items(), key=lambda item: -item[1]['p50_ms']):
+            print(f"  {stage:<14} {values['count']:>6} {values['p50_ms']:>9} {values['p95_ms']:>9} "
+                  f"{values['p99_ms']:>9}")
+
+
+def print_comparison(baseline, current):
+    def delta(old, new):
+        if not old or new is None:
+            return "    n/a"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    print(f"\nComparison: {baseline['meta']['commit']} -> {current['meta']['commit']}")
+    print(f"{'workload':<8} {'metric':<18} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['workloads'].items():
+        old = baseline['workloads'].get(name)
+        if not old:
+            continue
+        rows = [('req/s', old['throughput_rps'], result['throughput_rps'])]
+        rows += [(f"{p} ms", old['latency_ms'][p], result['latency_ms'][p]) for p in ('p50', 'p95', 'p99')]
+        for stage, values in result['stages'].items():
+            if stage in old['stages']:
+                rows.append((f"{stage} p50", old['stages'][stage]['p50_ms'], values['p50_ms']))
+        for metric, before, after in rows:
+            print(f"{name:<8} {metric:<18} {before:>10} {after:>10} {delta(before, after):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against fake Supabase and Gemini")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"Comma-separated subset of {', '.join(WORKLOADS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per workload (uploads: a quarter)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Simulated Supabase round trip")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Hash-based embeddings and word-overlap re-ranking instead of the models")
+    parser.add_argument("--seed-users", type=int, default=20)
+    parser.add_argument("--seed-files", type=int, default=2, help="Files per seeded user")
+    parser.add_argument("--seed-chunks", type=int, default=25, help="Chunks per seeded file")
+    parser.add_argument("--upload-kb", type=int, default=20, help="Approximate size of uploaded documents")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+    args.workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
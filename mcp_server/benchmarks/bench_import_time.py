@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import time and memory of the server's entry modules
+
+Imports each module in a fresh interpreter under `python -X importtime` and
+reports the total import time (median of --repeat runs), the peak RSS after
+import, the slowest top-level imports and which heavy libraries got loaded
+(sentence-transformers/torch, google-generativeai, the document parsers).
+Heavy libraries should only show up once a code path actually needs them.
+
+Needs the server's dependencies installed; nothing is called over the network.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --modules main,tools.admin_tools --repeat 7 --top 15
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY = ("sentence_transformers", "torch", "transformers", "google.generativeai",
+         "PyPDF2", "docx", "openpyxl", "bs4", "lxml")
+DEFAULT_MODULES = "main,tools.file_tools,tools.admin_tools,ai_client,embeddings"
+
+# Child: import the module, then report the heavy libraries present and peak RSS
+CHILD = """
+import importlib, resource, sys
+importlib.import_module({module!r})
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print("LOADED=" + ",".join(loaded))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("RSS_KB=" + str(rss // 1024 if sys.platform == "darwin" else rss))
+"""
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> dict:
+    env = dict(os.environ)
+    # Settings() and ai_client read these at import time in some versions
+    for key, value in (("GEMINI_API_KEY", "bench-fake-key"), ("SUPABASE_URL", "http://supabase.bench.invalid"),
+                       ("SUPABASE_SERVICE_ROLE_KEY", "bench.fake.key")):
+        env.setdefault(key, value)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(module=module, heavy=HEAVY)],
+                          cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+
+    top_level, total_us = [], 0
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            top_level.append((cumulative, name))
+            total_us += cumulative
+    fields = dict(line.split("=", 1) for line in proc.stdout.splitlines() if "=" in line)
+    return {
+        'total_ms': total_us / 1000,
+        'rss_mb': int(fields.get('RSS_KB', 0)) / 1024,
+        'loaded': [name for name in fields.get('LOADED', '').split(",") if name],
+        'top': sorted(top_level, reverse=True)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and RSS of the server's entry modules")
+    parser.add_argument("--modules", default=DEFAULT_MODULES, help="Comma-separated modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; median reported")
+    parser.add_argument("--top", type=int, default=8, help="Slowest top-level imports to list per module")
+    args = parser.parse_args()
+
+    print(f"{'module':<20} {'import ms':>10} {'RSS MB':>8}  heavy libraries loaded")
+    details = []
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        runs = [measure(module) for _ in range(args.repeat)]
+        failed = next((run for run in runs if 'error' in run), None)
+        if failed:
+            print(f"{module:<20} {'error':>10} {'':>8}  {failed['error']}")
+            continue
+        median_run = sorted(runs, key=lambda run: run['total_ms'])[len(runs) // 2]
+        print(f"{module:<20} {statistics.median(r['total_ms'] for r in runs):>10.1f} "
+              f"{statistics.median(r['rss_mb'] for r in runs):>8.1f}  {', '.join(median_run['loaded']) or '-'}")
+        details.append((module, median_run))
+
+    for module, run in details:
+        print(f"\nSlowest top-level imports for {module}:")
+        for cumulative, name in run['top'][:args.top]:
+            print(f"  {cumulative / 1000:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark: upload ingestion throughput per file type and phase
+
+Generates synthetic PDF, DOCX, XLSX, HTML, CSV, JSON, XML and TXT documents
+holding roughly the same amount of text at each requested size, then runs the
+ingestion pipeline of tools/file_tools.py one phase at a time:
+
+  extract  - extract_text (PyPDF2, python-docx, openpyxl, BeautifulSoup/lxml, decode)
+  chunk    - _chunk_text
+  embed    - embed_chunks (batched embeddings)
+  store    - store_chunks into benchmarks/fakes.FakeSupabase
+
+and reports MB/s and chunks/s for every type and phase. Extraction MB/s is
+measured on the file bytes, the later phases on the extracted text.
+
+Runs fully offline. Embeddings come from sentence-transformers when installed,
+otherwise from file_tools' hash fallback; --fake-embeddings uses the cheap
+deterministic embeddings from fakes.py so the other phases dominate.
+--db-latency-ms adds a simulated round trip to every insert request.
+
+Usage:
+    python benchmarks/bench_ingestion.py --fake-embeddings
+    python benchmarks/bench_ingestion.py --types pdf,docx --sizes-kb 256,2048 --repeat 5
+    python benchmarks/bench_ingestion.py --fake-embeddings --db-latency-ms 5 --insert-batch-size 1
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+WORDS = ("invoice payment refund policy cloud deployment cluster scaling model training "
+         "dataset accuracy employee onboarding payroll release security audit password "
+         "customer support ticket escalation quarterly report project team update plan "
+         "the a of and to in for with on").split()
+FILE_TYPES = ("pdf", "docx", "xlsx", "html", "csv", "json", "xml", "txt")
+PHASES = ("extract", "chunk", "embed", "store")
+
+
+def synthetic_paragraphs(rng: random.Random, target_chars: int) -> list:
+    paragraphs, total = [], 0
+    while total < target_chars:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 1
+    return paragraphs
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(paragraphs: list, line_chars: int = 90, lines_per_page: int = 50) -> bytes:
+    """Minimal multi-page PDF with one Helvetica text stream per page"""
+    lines = []
+    for paragraph in paragraphs:
+        while paragraph:
+            cut = paragraph.rfind(" ", 0, line_chars) if len(paragraph) > line_chars else len(paragraph)
+            cut = cut if cut > 0 else line_chars
+            lines.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        body = "BT /F1 10 Tf 12 TL 40 800 Td\n" + "".join(f"({_pdf_escape(line)}) Tj T*\n" for line in page_lines) + "ET"
+        stream = body.encode('latin-1', errors='replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_docx(paragraphs: list) -> bytes:
+    from docx import Document
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def make_xlsx(paragraphs: list) -> bytes:
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    for index, paragraph in enumerate(paragraphs):
+        words = paragraph.split()
+        sheet.append([index, " ".join(words[:8]), " ".join(words[8:]), len(words)])
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def make_html(paragraphs: list) -> bytes:
+    body = "\n".join(
+        f"<div class=\"section\"><h2>Section {i}</h2><p>{escape(p)}</p></div>" for i, p in enumerate(paragraphs)
+    )
+    return (f"<!DOCTYPE html><html><head><title>Report</title><style>p {{margin: 0}}</style></head>"
+            f"<body><nav><a href=\"#\">Home</a></nav>{body}</body></html>").encode('utf-8')
+
+
+def make_csv(paragraphs: list) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["id", "title", "body", "words"])
+    for index, paragraph in enumerate(paragraphs):
+        words = paragraph.split()
+        writer.writerow([index, " ".join(words[:6]), paragraph, len(words)])
+    return out.getvalue().encode('utf-8')
+
+
+def make_json(paragraphs: list) -> bytes:
+    records = [{'id': i, 'title': " ".join(p.split()[:6]), 'body': p, 'tags': p.split()[:3]}
+               for i, p in enumerate(paragraphs)]
+    return json.dumps({'records': records}, indent=2).encode('utf-8')
+
+
+def make_xml(paragraphs: list) -> bytes:
+    items = "\n".join(f"  <record id=\"{i}\"><body>{escape(p)}</body></record>" for i, p in enumerate(paragraphs))
+    return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<records>\n{items}\n</records>\n".encode('utf-8')
+
+
+def make_txt(paragraphs: list) -> bytes:
+    return "\n\n".join(paragraphs).encode('utf-8')
+
+
+GENERATORS = {
+    'pdf': make_pdf, 'docx': make_docx, 'xlsx': make_xlsx, 'html': make_html,
+    'csv': make_csv, 'json': make_json, 'xml': make_xml, 'txt': make_txt
+}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_case(file_tools, file_type: str, content: bytes, repeat: int) -> dict:
+    """Median seconds per phase over `repeat` runs of the pipeline on one document"""
+    import supabase_client
+
+    seconds = {phase: [] for phase in PHASES}
+    text, chunks = "", []
+    for _ in range(repeat):
+        extracted, elapsed = timed(file_tools.extract_text, content, f"bench.{file_type}")
+        seconds['extract'].append(elapsed)
+        text = extracted['text']
+
+        chunks, elapsed = timed(file_tools._chunk_text, text)
+        seconds['chunk'].append(elapsed)
+
+        vectors, elapsed = timed(file_tools.embed_chunks, chunks)
+        seconds['embed'].append(elapsed)
+
+        db = supabase_client.supabase
+        file_row = db.table('files').insert({
+            'user_id': 'bench-user', 'filename': f"bench.{file_type}", 'original_filename': f"bench.{file_type}",
+            'file_type': file_type, 'file_size': len(content), 'file_path': f"uploads/bench/bench.{file_type}",
+            'content_type': 'application/octet-stream'
+        }).execute().data[0]
+        _, elapsed = timed(file_tools.store_chunks, file_row['id'], chunks, vectors)
+        seconds['store'].append(elapsed)
+        # Keep table sizes constant between runs
+        db.table('files').delete().eq('id', file_row['id']).execute()
+
+    text_mb = len(text.encode('utf-8')) / 1e6
+    phases = {}
+    for phase in PHASES:
+        median = statistics.median(seconds[phase])
+        mb = len(content) / 1e6 if phase == 'extract' else text_mb
+        phases[phase] = {
+            'ms': round(median * 1000, 2),
+            'mb_per_s': round(mb / median, 2) if median else None,
+            'chunks_per_s': round(len(chunks) / median, 1) if median else None
+        }
+    return {'file_bytes': len(content), 'text_chars': len(text), 'chunks': len(chunks), 'phases': phases}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion throughput per file type and phase")
+    parser.add_argument("--types", default=",".join(FILE_TYPES), help="Comma-separated file types")
+    parser.add_argument("--sizes-kb", default="32,256,1024", help="Comma-separated text sizes per document")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per document; the median is reported")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use the deterministic embeddings from fakes.py instead of the real model")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated round trip per insert request")
+    parser.add_argument("--insert-batch-size", type=int, default=None,
+                        help="Override INGEST_INSERT_BATCH_SIZE (rows per insert request)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    import fakes
+    import supabase_client
+    from tools import file_tools
+
+    if args.fake_embeddings:
+        file_tools.generate_embeddings_array = fakes.fake_embeddings_array
+    if args.insert_batch_size:
+        file_tools.INGEST_INSERT_BATCH_SIZE = args.insert_batch_size
+    supabase_client.supabase = fakes.FakeSupabase(latency_ms=args.db_latency_ms)
+
+    types = [t.strip() for t in args.types.split(",") if t.strip()]
+    sizes = [int(s) for s in args.sizes_kb.split(",") if s.strip()]
+    embedder = "fake" if args.fake_embeddings else (
+        "sentence-transformers" if file_tools.SEMANTIC_EMBEDDINGS_AVAILABLE else "hash fallback")
+    print(f"embeddings: {embedder}, insert batch size: {file_tools.INGEST_INSERT_BATCH_SIZE}, "
+          f"db latency: {args.db_latency_ms:.1f} ms, median of {args.repeat}\n")
+    print(f"{'type':<5} {'text KB':>8} {'file KB':>8} {'chunks':>7}  "
+          + "  ".join(f"{phase + ' MB/s':>12} {'chunks/s':>9}" for phase in PHASES))
+
+    rng = random.Random(args.seed)
+    results = []
+    for size_kb in sizes:
+        paragraphs = synthetic_paragraphs(rng, size_kb * 1024)
+        for file_type in types:
+            content = GENERATORS[file_type](paragraphs)
+            case = run_case(file_tools, file_type, content, args.repeat)
+            case.update({'type': file_type, 'size_kb': size_kb})
+            results.append(case)
+            print(f"{file_type:<5} {size_kb:>8} {case['file_bytes'] / 1024:>8.0f} {case['chunks']:>7}  "
+                  + "  ".join(f"{case['phases'][phase]['mb_per_s'] or 0:>12.2f} "
+                              f"{case['phases'][phase]['chunks_per_s'] or 0:>9.0f}" for phase in PHASES))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({'embeddings': embedder, 'insert_batch_size': file_tools.INGEST_INSERT_BATCH_SIZE,
+                       'db_latency_ms': args.db_latency_ms, 'repeat': args.repeat, 'results': results}, fh, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
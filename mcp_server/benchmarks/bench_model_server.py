@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark: total memory and throughput of N API workers with per-worker models
+vs one shared model server
+
+  per-worker  - every worker process loads the encoder and cross-encoder
+                (what `uvicorn --workers N` does today)
+  shared      - one model_server.py process holds the models; workers set
+                MODEL_SERVER_ADDRESS and call it over a Unix socket
+
+Each worker is a separate spawned interpreter doing chat-shaped model work:
+embed the question, then re-rank --docs candidate chunks. Reported per mode and
+worker count: total RSS and PSS (proportional set size, which splits shared
+pages fairly) of all processes after the run, and requests/s across workers.
+
+The real models need sentence-transformers; --fake-models uses MiniLM-sized
+stand-ins from fakes.py (same parameter count and similar compute) so memory
+and scheduling effects can be measured without it. Linux only (reads /proc).
+
+Usage:
+    python benchmarks/bench_model_server.py --fake-models
+    python benchmarks/bench_model_server.py --workers 1,4,8 --requests 200 --docs 15
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+QUESTION = "What is the refund window for the enterprise plan in the billing policy?"
+DOCUMENT = ("The enterprise plan includes priority support, a dedicated account manager and a "
+            "refund window of thirty days from the invoice date, as described in the billing policy.")
+
+
+def memory_kb(pid: int) -> dict:
+    """Rss and Pss of a process from /proc/<pid>/smaps_rollup"""
+    values = {'rss': 0, 'pss': 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key.lower()] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def _install_fake_models(embeddings):
+    import fakes
+    embeddings._embedding_model = fakes.FakeSentenceTransformer()
+    embeddings._reranker_model = fakes.FakeCrossEncoder()
+
+
+def server_main(address: str, fake_models: bool):
+    import embeddings
+    import model_server
+    if fake_models:
+        _install_fake_models(embeddings)
+    model_server.ModelServer(address).serve_forever()
+
+
+def worker_main(address, fake_models, requests, docs, ready, start, results, finished):
+    if address:
+        os.environ["MODEL_SERVER_ADDRESS"] = address
+    import embeddings
+    if fake_models and not address:
+        _install_fake_models(embeddings)
+
+    documents = [f"{DOCUMENT} (section {i})" for i in range(docs)]
+    # Warm: load the models (or connect) before the clock starts
+    embeddings.generate_embedding(QUESTION)
+    embeddings.rerank_results(QUESTION, documents[:2])
+    ready.put(os.getpid())
+    start.wait()
+
+    began = time.perf_counter()
+    failures = 0
+    for i in range(requests):
+        vector = embeddings.generate_embedding(f"{QUESTION} ({i})")
+        ranked = embeddings.rerank_results(QUESTION, documents, top_k=5)
+        if not any(vector) or not ranked or ranked[0][1] == 0.5:
+            failures += 1
+    results.put((requests, time.perf_counter() - began, failures))
+    finished.wait()
+
+
+def run_mode(ctx, mode: str, workers: int, args) -> dict:
+    address, server = None, None
+    if mode == "shared":
+        address = os.path.join(tempfile.mkdtemp(prefix="bench-models-"), "models.sock")
+        server = ctx.Process(target=server_main, args=(address, args.fake_models), daemon=True)
+        server.start()
+        deadline = time.time() + 120
+        while not os.path.exists(address):
+            if time.time() > deadline or not server.is_alive():
+                raise RuntimeError("model server did not start")
+            time.sleep(0.05)
+
+    ready, results = ctx.Queue(), ctx.Queue()
+    start, finished = ctx.Event(), ctx.Event()
+    processes = [
+        ctx.Process(target=worker_main, daemon=True,
+                    args=(address, args.fake_models, args.requests, args.docs, ready, start, results, finished))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=600)
+
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get(timeout=3600) for _ in processes]
+    elapsed = time.perf_counter() - began
+
+    pids = [p.pid for p in processes] + ([server.pid] if server else [])
+    memory = [memory_kb(pid) for pid in pids]
+    finished.set()
+    for process in processes:
+        process.join(timeout=30)
+    if server:
+        server.terminate()
+        server.join(timeout=10)
+
+    total_requests = sum(o[0] for o in outcomes)
+    return {
+        'mode': mode,
+        'workers': workers,
+        'rss_mb': sum(m['rss'] for m in memory) / 1024,
+        'pss_mb': sum(m['pss'] for m in memory) / 1024,
+        'throughput_rps': total_requests / elapsed,
+        'failures': sum(o[2] for o in outcomes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker models vs a shared model server")
+    parser.add_argument("--workers", default="1,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--modes", default="per-worker,shared")
+    parser.add_argument("--requests", type=int, default=40, help="Chat-shaped requests per worker")
+    parser.add_argument("--docs", type=int, default=15, help="Chunks re-ranked per request")
+    parser.add_argument("--fake-models", action="store_true",
+                        help="MiniLM-sized stand-in models from fakes.py instead of sentence-transformers")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("Memory figures need Linux /proc/<pid>/smaps_rollup; they will read 0 here")
+
+    # Like uvicorn --workers, every worker is a fresh interpreter
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.requests} requests per worker (1 embedding + re-rank of {args.docs} chunks), "
+          f"{'fake' if args.fake_models else 'real'} models, {os.cpu_count()} CPUs\n")
+    print(f"{'mode':<11} {'workers':>7} {'RSS MB':>9} {'PSS MB':>9} {'req/s':>8} {'failures':>9}")
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            row = run_mode(ctx, mode, workers, args)
+            print(f"{mode:<11} {workers:>7} {row['rss_mb']:>9.0f} {row['pss_mb']:>9.0f} "
+                  f"{row['throughput_rps']:>8.1f} {row['failures']:>9}")
+
+
+if __name__ == "__main__":
+    main()
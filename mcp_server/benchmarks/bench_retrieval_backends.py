@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark: retrieval backends behind search_similar_chunks
+
+  supabase  - embeddings table + match_file_chunks RPC (benchmarks/fakes.FakeSupabase
+              with --db-latency-ms per round trip)
+  local     - retrieval_backends.LocalSegmentBackend: memory-mapped float32
+              segment files in a temporary directory
+
+Seeds --users users with --files files of --chunks chunks each into both
+backends, then reports per-backend append throughput (chunks/s), query latency
+percentiles through file_tools._match_chunks, how often the local top-k equals
+the RPC's, the cost of a tombstone delete, the time to reopen the local store
+(cold start), its size on disk, and what a worker sharing the directory pays
+on its next search after another worker compacts or appends.
+
+Usage:
+    python benchmarks/bench_retrieval_backends.py
+    python benchmarks/bench_retrieval_backends.py --users 20 --files 5 --chunks 400 --segment-rows 20000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import numpy as np
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db, backends, args, rng: np.random.Generator) -> dict:
+    """Insert the same chunk rows into Supabase and index them in every backend; returns user -> file ids"""
+    files_by_user = {}
+    append_seconds = {backend.name: 0.0 for backend in backends}
+    total = 0
+    for u in range(args.users):
+        user = db.table('users').insert({'firebase_uid': f"backend-user-{u}"}).execute().data[0]
+        files_by_user[user['id']] = []
+        for f in range(args.files):
+            file_row = db.table('files').insert({
+                'user_id': user['id'], 'filename': f"doc-{u}-{f}.pdf", 'original_filename': f"doc-{u}-{f}.pdf",
+                'file_type': 'pdf', 'file_size': 0, 'file_path': f"uploads/{user['id']}/{f}.pdf",
+                'content_type': 'application/pdf', 'upload_status': 'processed'
+            }).execute().data[0]
+            records = db.table('file_chunks').insert([
+                {'file_id': file_row['id'], 'chunk_index': i, 'content': f"chunk {i} of file {f} " + "text " * 150,
+                 'page_number': 1 + i // 4}
+                for i in range(args.chunks)
+            ]).execute().data
+            vectors = rng.standard_normal((args.chunks, 384), dtype=np.float32).tolist()
+            for backend in backends:
+                start = time.perf_counter()
+                backend.index_chunks(user['id'], records, vectors, client=db)
+                append_seconds[backend.name] += time.perf_counter() - start
+            files_by_user[user['id']].append(file_row['id'])
+            total += len(records)
+    return {'files': files_by_user, 'append_seconds': append_seconds, 'chunks': total}
+
+
+def replay(file_tools, retrieval_backends, backend, db, queries, match_count: int) -> tuple:
+    retrieval_backends.set_retrieval_backend(backend)
+    latencies, results = [], []
+    for user_uuid, query in queries:
+        start = time.perf_counter()
+        rows = file_tools._match_chunks(db, query, match_count, user_uuid)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([row['id'] for row in rows])
+    return latencies, results
+
+
+def disk_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase RPC vs local memory-mapped segment retrieval backend")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--files", type=int, default=4, help="Files per user")
+    parser.add_argument("--chunks", type=int, default=250, help="Chunks per file")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--match-count", type=int, default=50)
+    parser.add_argument("--segment-rows", type=int, default=4000, help="Rows per local segment file")
+    parser.add_argument("--db-latency-ms", type=float, default=10.0, help="Simulated round trip per Supabase call")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import fakes
+    import retrieval_backends
+    from tools import file_tools
+
+    rng = np.random.default_rng(args.seed)
+    directory = tempfile.mkdtemp(prefix="bench-vectors-")
+    try:
+        db = fakes.FakeSupabase()
+        db.latency = args.db_latency_ms / 1000
+        remote = retrieval_backends.SupabaseRetrievalBackend(cache=None)
+        local = retrieval_backends.LocalSegmentBackend(directory, segment_rows=args.segment_rows)
+        seeded = seed(db, [remote, local], args, rng)
+
+        picker = random.Random(args.seed)
+        user_ids = list(seeded['files'])
+        queries = [(picker.choice(user_ids), rng.standard_normal(384, dtype=np.float32).tolist())
+                   for _ in range(args.queries)]
+
+        print(f"{args.users} users x {args.files} files x {args.chunks} chunks = {seeded['chunks']} chunks, "
+              f"{args.queries} queries, top {args.match_count}, db latency {args.db_latency_ms:.0f} ms, "
+              f"{local.stats()['segments']} local segments\n")
+
+        timings = {}
+        for backend in (remote, local):
+            timings[backend.name] = replay(file_tools, retrieval_backends, backend, db, queries, args.match_count)
+
+        print(f"{'backend':<9} {'append/s':>10} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, (values, _) in timings.items():
+            rate = seeded['chunks'] / max(seeded['append_seconds'][name], 1e-9)
+            print(f"{name:<9} {rate:>10.0f} {statistics.mean(values):>8.2f} {statistics.median(values):>8.2f} "
+                  f"{percentile(values, 95):>8.2f} {percentile(values, 99):>8.2f}")
+
+        same = sum(1 for a, b in zip(timings['supabase'][1], timings['local'][1]) if a == b)
+        print(f"\nidentical top-{args.match_count} to the RPC: {same}/{len(queries)}")
+
+        # Tombstone one file per user, in both backends, and check it no longer comes back
+        deleted = set()
+        start = time.perf_counter()
+        for user_uuid, file_ids in seeded['files'].items():
+            local.delete_file(user_uuid, file_ids[0])
+            deleted.add(file_ids[0])
+        delete_ms = (time.perf_counter() - start) * 1000 / len(deleted)
+        leaked = sum(1 for user_uuid, query in queries
+                     for row in local.search(user_uuid, query, args.match_count) if row['file_id'] in deleted)
+        print(f"delete: {delete_ms:.2f} ms per file (tombstone), deleted chunks returned afterwards: {leaked}")
+
+        size = disk_bytes(directory)
+        start = time.perf_counter()
+        reopened = retrieval_backends.LocalSegmentBackend(directory, segment_rows=args.segment_rows, compact_ratio=1.1)
+        reopen_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        compacted = retrieval_backends.LocalSegmentBackend(directory, segment_rows=args.segment_rows, compact_ratio=0.0)
+        compact_ms = (time.perf_counter() - start) * 1000
+        stats = compacted.stats()
+        print(f"local store: {size / 1e6:.1f} MB on disk ({size / seeded['chunks']:.0f} B/chunk), "
+              f"reopen {reopen_ms:.0f} ms ({reopened.stats()['live_rows']} live rows), "
+              f"reopen + compact {compact_ms:.0f} ms -> {stats['rows']} rows / {stats['disk_bytes'] / 1e6:.1f} MB")
+
+        # Instances sharing the directory stand in for API workers: the first search after
+        # another worker's compaction reloads the store, after an append it reads the new rows only
+        user_uuid, query = queries[0]
+        start = time.perf_counter()
+        local.search(user_uuid, query, args.match_count)
+        reload_ms = (time.perf_counter() - start) * 1000
+        records = [{'id': f"shared-{i}", 'file_id': "shared-file", 'page_number': 1, 'content': ''}
+                   for i in range(args.chunks)]
+        vectors = rng.standard_normal((args.chunks, 384), dtype=np.float32)
+        compacted.index_chunks(user_uuid, records, vectors)
+        start = time.perf_counter()
+        rows = local.search(user_uuid, vectors[0], 1)
+        catch_up_ms = (time.perf_counter() - start) * 1000
+        print(f"shared directory: first search after another worker compacts {reload_ms:.0f} ms, "
+              f"after it appends {args.chunks} chunks {catch_up_ms:.1f} ms "
+              f"(new chunk found: {bool(rows) and rows[0]['id'] == 'shared-0'})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality vs latency for search_similar_chunks configurations
+
+Loads a labelled corpus into benchmarks/fakes.FakeSupabase, runs every query
+through tools/file_tools.search_similar_chunks under each configuration and
+reports recall@k, MRR@k and nDCG@k next to per-query latency, followed by the
+Pareto frontier (configurations no other one beats on both quality and
+latency), drawn in ASCII and optionally with matplotlib (--plot).
+
+Configurations are written as "+"-joined options:
+
+  vector          vector search only (limit candidates)
+  hybrid          vector + keyword_search_chunks, fused by reciprocal rank
+  rerank-xN       re-rank limit*N vector candidates (candidate_multiplier=N)
+  hybrid+rerank-xN
+
+Corpus format (JSONL, one object per line):
+
+  {"type": "chunk", "id": "c1", "file": "handbook.pdf", "content": "...", "page": 3}
+  {"type": "query", "id": "q1", "query": "What is ...?", "relevant": {"c1": 2, "c7": 1}}
+
+"relevant" maps chunk ids to graded relevance (used by nDCG; any grade > 0
+counts for recall and MRR) or is a plain list of ids (grade 1). Without
+--corpus a synthetic corpus of product facts with near-duplicate distractors
+is generated; --write-corpus saves it as a starting point for a real one.
+
+Runs offline. Quality numbers are only meaningful with the real models
+(sentence-transformers installed); --fake-embeddings uses the word-hash
+embeddings and word-overlap re-ranker from fakes.py to exercise the harness.
+Latency includes --db-latency-ms per RPC, standing in for the Supabase round trip.
+
+Usage:
+    python benchmarks/bench_retrieval_quality.py --fake-embeddings
+    python benchmarks/bench_retrieval_quality.py --corpus labelled.jsonl --k 5 --plot pareto.png
+    python benchmarks/bench_retrieval_quality.py --configs vector,rerank-x2,rerank-x5,hybrid+rerank-x3
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+DEFAULT_CONFIGS = ("vector,hybrid,rerank-x1,rerank-x2,rerank-x3,rerank-x5,rerank-x8,"
+                   "hybrid+rerank-x2,hybrid+rerank-x3,hybrid+rerank-x5")
+BENCH_USER = "bench-retrieval-user"
+
+SYLLABLES = ["zor", "kel", "mir", "van", "tas", "lio", "dra", "pen", "qua", "rix", "sol", "bex"]
+ATTRIBUTES = [
+    ("refund window", "What is the refund window for {e}?", "{v} days"),
+    ("support hours", "When is support available for {e}?", "{v} hours a day"),
+    ("monthly price", "How much does {e} cost per month?", "{v} dollars"),
+    ("data retention period", "How long does {e} keep data?", "{v} months"),
+    ("user limit", "How many users can {e} have?", "{v} seats"),
+    ("uptime target", "What uptime does {e} promise?", "{v} percent"),
+]
+FILLER = ("the team reviewed the quarterly plan and agreed on next steps for the rollout while "
+          "customers asked about onboarding billing and general account settings").split()
+
+
+def generate_corpus(rng: random.Random, entities: int, files: int):
+    """Chunks holding one fact each (plus filler) and one question per fact"""
+    names = set()
+    while len(names) < entities:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(2)).capitalize())
+    chunks, queries = [], []
+    for entity in sorted(names):
+        overview_id = f"c{len(chunks)}"
+        chunks.append({'type': 'chunk', 'id': overview_id, 'file': f"catalog-{len(chunks) % files}.pdf",
+                       'content': f"{entity} overview. " + " ".join(rng.choice(FILLER) for _ in range(40)), 'page': 1})
+        for attribute, question, value in ATTRIBUTES:
+            chunk_id = f"c{len(chunks)}"
+            fact = f"The {attribute} for {entity} is {value.format(v=rng.randint(2, 99))}."
+            words = [rng.choice(FILLER) for _ in range(rng.randint(30, 60))]
+            words.insert(rng.randint(0, len(words)), fact)
+            chunks.append({'type': 'chunk', 'id': chunk_id, 'file': f"catalog-{len(chunks) % files}.pdf",
+                           'content': " ".join(words), 'page': 1 + len(chunks) % 20})
+            queries.append({'type': 'query', 'id': f"q{len(queries)}", 'query': question.format(e=entity),
+                            'relevant': {chunk_id: 2, overview_id: 1}})
+    return chunks, queries
+
+
+def load_corpus(path: str):
+    chunks, queries = [], []
+    with open(path) as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get('type') == 'query':
+                relevant = item['relevant']
+                item['relevant'] = {cid: 1 for cid in relevant} if isinstance(relevant, list) else relevant
+                queries.append(item)
+            else:
+                chunks.append(item)
+    return chunks, queries
+
+
+def index_corpus(db, file_tools, chunks) -> dict:
+    """Insert the chunks (grouped into files) with embeddings; returns db chunk id -> corpus id"""
+    import supabase_client
+
+    user = supabase_client.get_or_create_user(BENCH_USER, "retrieval@example.com", "Retrieval Bench")
+    by_file = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk.get('file') or "corpus.txt", []).append(chunk)
+    id_map = {}
+    for filename, file_chunks in by_file.items():
+        file_row = db.table('files').insert({
+            'user_id': user['id'], 'filename': filename, 'original_filename': filename,
+            'file_type': os.path.splitext(filename)[1].lstrip('.') or 'txt', 'file_size': 0,
+            'file_path': f"uploads/{user['id']}/{filename}", 'content_type': 'text/plain',
+            'upload_status': 'processed'
+        }).execute().data[0]
+        rows = [{'chunk_index': i, 'content': c['content'], 'page_number': c.get('page')}
+                for i, c in enumerate(file_chunks)]
+        records = file_tools.store_chunks(file_row['id'], rows, file_tools.embed_chunks(rows))
+        for record in records:
+            id_map[record['id']] = file_chunks[record['chunk_index']]['id']
+    return id_map
+
+
+def parse_config(name: str) -> dict:
+    options = {'hybrid': False, 'use_reranking': False, 'candidate_multiplier': 1}
+    for part in name.split("+"):
+        if part == "vector":
+            continue
+        elif part == "hybrid":
+            options['hybrid'] = True
+        elif part.startswith("rerank"):
+            options['use_reranking'] = True
+            options['candidate_multiplier'] = int(part.partition("-x")[2] or 3)
+        else:
+            raise ValueError(f"Unknown configuration option: {part}")
+    return options
+
+
+def score_query(retrieved: list, relevant: dict, k: int) -> dict:
+    retrieved = retrieved[:k]
+    hits = [cid for cid in retrieved if relevant.get(cid, 0) > 0]
+    relevant_count = sum(1 for grade in relevant.values() if grade > 0)
+    first = next((rank for rank, cid in enumerate(retrieved, start=1) if relevant.get(cid, 0) > 0), None)
+    dcg = sum((2 ** relevant.get(cid, 0) - 1) / math.log2(rank + 1) for rank, cid in enumerate(retrieved, start=1))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(rank + 1) for rank, grade in enumerate(ideal, start=1))
+    return {
+        'recall': len(hits) / relevant_count if relevant_count else 0.0,
+        'mrr': 1.0 / first if first else 0.0,
+        'ndcg': dcg / idcg if idcg else 0.0
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate(file_tools, name: str, queries: list, id_map: dict, k: int, warmup: int) -> dict:
+    options = parse_config(name)
+    for query in queries[:warmup]:
+        file_tools.search_similar_chunks(query['query'], BENCH_USER, limit=k, **options)
+
+    scores, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = file_tools.search_similar_chunks(query['query'], BENCH_USER, limit=k, **options)
+        latencies.append((time.perf_counter() - start) * 1000)
+        scores.append(score_query([id_map.get(r['id']) for r in results], query['relevant'], k))
+    return {
+        'config': name,
+        **options,
+        f'recall@{k}': round(statistics.mean(s['recall'] for s in scores), 4),
+        f'mrr@{k}': round(statistics.mean(s['mrr'] for s in scores), 4),
+        f'ndcg@{k}': round(statistics.mean(s['ndcg'] for s in scores), 4),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2)
+        }
+    }
+
+
+def pareto_frontier(points: list) -> list:
+    """Indices of points (latency, quality) not dominated by any other point"""
+    order = sorted(range(len(points)), key=lambda i: (points[i][0], -points[i][1]))
+    frontier, best = [], -1.0
+    for index in order:
+        if points[index][1] > best:
+            frontier.append(index)
+            best = points[index][1]
+    return frontier
+
+
+def ascii_plot(points: list, labels: list, frontier: list, x_title: str, y_title: str,
+               width: int = 64, height: int = 16) -> str:
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    x_min, x_max = min(xs), max(xs)
+    y_min, y_max = min(ys), max(ys)
+    x_span, y_span = (x_max - x_min) or 1.0, (y_max - y_min) or 1.0
+    grid = [[" "] * width for _ in range(height)]
+    for index, (x, y) in enumerate(points):
+        column = round((x - x_min) / x_span * (width - 1))
+        row = height - 1 - round((y - y_min) / y_span * (height - 1))
+        grid[row][column] = labels[index].upper() if index in frontier else labels[index]
+    lines = [f"{y_title} (upper case = Pareto frontier)"]
+    for row_index, row in enumerate(grid):
+        value = y_max - row_index / (height - 1) * y_span
+        lines.append(f"{value:>7.3f} |" + "".join(row))
+    lines.append(" " * 8 + "+" + "-" * width)
+    lines.append(" " * 9 + f"{x_min:<10.1f}{x_title:^{width - 20}}{x_max:>10.1f}")
+    return "\n".join(lines)
+
+
+def save_plot(path: str, rows: list, points: list, frontier: list, x_title: str, y_title: str) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print(f"matplotlib is not installed; skipping {path}")
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter([p[0] for p in points], [p[1] for p in points], color="tab:gray")
+    line = sorted(frontier, key=lambda i: points[i][0])
+    ax.plot([points[i][0] for i in line], [points[i][1] for i in line], "o-", color="tab:red", label="Pareto frontier")
+    for row, (x, y) in zip(rows, points):
+        ax.annotate(row['config'], (x, y), fontsize=7, xytext=(3, 3), textcoords="offset points")
+    ax.set_xlabel(x_title)
+    ax.set_ylabel(y_title)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    print(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality vs latency per search configuration")
+    parser.add_argument("--corpus", help="Labelled JSONL corpus (default: generate a synthetic one)")
+    parser.add_argument("--write-corpus", help="Save the synthetic corpus as JSONL to this path")
+    parser.add_argument("--entities", type=int, default=60, help="Synthetic corpus: products described")
+    parser.add_argument("--files", type=int, default=8, help="Synthetic corpus: files the chunks are spread over")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="Comma-separated configurations")
+    parser.add_argument("--k", type=int, default=5, help="Results per query (search limit)")
+    parser.add_argument("--objective", choices=("ndcg", "recall", "mrr"), default="ndcg",
+                        help="Quality metric for the Pareto frontier")
+    parser.add_argument("--latency-stat", choices=("mean", "p50", "p95"), default="p50")
+    parser.add_argument("--warmup", type=int, default=3, help="Unscored queries per configuration")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use the word-hash embeddings and word-overlap re-ranker from fakes.py")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="Simulated round trip per RPC")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--plot", help="Also save the Pareto plot to this image (needs matplotlib)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    import fakes
+    import supabase_client
+    from tools import file_tools
+
+    if args.fake_embeddings:
+        file_tools.generate_embedding = fakes.fake_embedding
+        file_tools.generate_embeddings_batch = fakes.fake_embeddings_batch
+        file_tools.generate_embedding_array = fakes.fake_embedding_array
+        file_tools.generate_embeddings_array = fakes.fake_embeddings_array
+        file_tools.rerank_results = fakes.fake_rerank
+        file_tools.SEMANTIC_EMBEDDINGS_AVAILABLE = True
+    elif not file_tools.SEMANTIC_EMBEDDINGS_AVAILABLE:
+        print("sentence-transformers is not installed: hash embeddings and no re-ranking, "
+              "quality numbers are meaningless (use --fake-embeddings to exercise the harness)\n")
+
+    db = fakes.FakeSupabase(latency_ms=args.db_latency_ms)
+    supabase_client.supabase = db
+
+    if args.corpus:
+        chunks, queries = load_corpus(args.corpus)
+    else:
+        chunks, queries = generate_corpus(random.Random(args.seed), args.entities, args.files)
+        if args.write_corpus:
+            with open(args.write_corpus, "w") as fh:
+                for item in chunks + queries:
+                    fh.write(json.dumps(item) + "\n")
+            print(f"Wrote {args.write_corpus}")
+    id_map = index_corpus(db, file_tools, chunks)
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={args.k}, "
+          f"db latency {args.db_latency_ms:.1f} ms per RPC\n")
+
+    k = args.k
+    print(f"{'config':<20} {'recall@' + str(k):>9} {'mrr@' + str(k):>7} {'ndcg@' + str(k):>8} "
+          f"{'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    rows = []
+    for name in [c.strip() for c in args.configs.split(",") if c.strip()]:
+        row = evaluate(file_tools, name, queries, id_map, k, args.warmup)
+        rows.append(row)
+        latency = row['latency_ms']
+        print(f"{name:<20} {row[f'recall@{k}']:>9.3f} {row[f'mrr@{k}']:>7.3f} {row[f'ndcg@{k}']:>8.3f} "
+              f"{latency['mean']:>8.2f} {latency['p50']:>8.2f} {latency['p95']:>8.2f}")
+
+    metric = f"{args.objective}@{k}"
+    points = [(row['latency_ms'][args.latency_stat], row[metric]) for row in rows]
+    frontier = pareto_frontier(points)
+    labels = [chr(ord('a') + i) if i < 26 else '?' for i in range(len(rows))]
+    x_title = f"{args.latency_stat} latency (ms)"
+
+    print(f"\nPareto frontier ({metric} vs {x_title}):")
+    for index in sorted(frontier, key=lambda i: points[i][0]):
+        print(f"  {labels[index].upper()}  {rows[index]['config']:<20} {points[index][1]:.3f} at {points[index][0]:.2f} ms")
+    print()
+    print(ascii_plot(points, labels, frontier, x_title, metric))
+    print("\n" + "  ".join(f"{label}={row['config']}" for label, row in zip(labels, rows)))
+
+    if args.plot:
+        save_plot(args.plot, rows, points, frontier, x_title, metric)
+    if args.output:
+        for index, row in enumerate(rows):
+            row['pareto'] = index in frontier
+        with open(args.output, "w") as fh:
+            json.dump({'k': k, 'objective': metric, 'latency_stat': args.latency_stat,
+                       'chunks': len(chunks), 'queries': len(queries), 'results': rows}, fh, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: list-based vs array-first embedding handling on --vectors vectors
+
+  similarity  - compute_similarity as it was (list -> fresh float64 arrays and two
+                norms per pair) looped over every document, vs one
+                embeddings.similarity_matrix call over the normalised float32 matrix
+  model out   - float32 model output kept as an ndarray vs converted with .tolist()
+                (time and resident size)
+  storage     - a request body of embedding rows as JSON lists of floats vs
+                embeddings.to_pgvector text (time, bytes per vector, exact round trip)
+
+Usage:
+    python benchmarks/bench_similarity.py
+    python benchmarks/bench_similarity.py --vectors 10000 --queries 20 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+
+def legacy_compute_similarity(embedding1, embedding2) -> float:
+    """embeddings.compute_similarity before the array-first API"""
+    vec1 = np.array(embedding1)
+    vec2 = np.array(embedding2)
+    return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+
+
+def best_of(repeat: int, fn):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def allocated_mb(fn) -> float:
+    tracemalloc.start()
+    value = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List-based vs array-first embedding handling")
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=10, help="Queries scored against all vectors")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import embeddings
+
+    rng = np.random.default_rng(args.seed)
+    matrix = embeddings.normalize_rows(rng.standard_normal((args.vectors, embeddings.EMBEDDING_DIM)))
+    queries = embeddings.normalize_rows(rng.standard_normal((args.queries, embeddings.EMBEDDING_DIM)))
+    doc_lists = matrix.tolist()
+    query_lists = queries.tolist()
+
+    print(f"{args.vectors} vectors x {embeddings.EMBEDDING_DIM} dims, {args.queries} queries, "
+          f"best of {args.repeat}\n")
+    print(f"{'operation':<42} {'list ms':>10} {'array ms':>10} {'speedup':>8}")
+
+    def row(name, list_ms, array_ms):
+        print(f"{name:<42} {list_ms:>10.1f} {array_ms:>10.2f} {list_ms / max(array_ms, 1e-9):>7.0f}x")
+
+    legacy_ms, legacy_scores = best_of(args.repeat, lambda: [
+        [legacy_compute_similarity(q, d) for d in doc_lists] for q in query_lists
+    ])
+    array_ms, array_scores = best_of(args.repeat, lambda: embeddings.similarity_matrix(queries, matrix))
+    row(f"score {args.queries} queries x {args.vectors} docs", legacy_ms, array_ms)
+    max_error = float(np.abs(np.asarray(legacy_scores) - array_scores).max())
+
+    pair_ms, _ = best_of(args.repeat, lambda: [embeddings.compute_similarity(queries[0], d) for d in matrix])
+    row(f"compute_similarity x {args.vectors} (arrays in)", legacy_ms / args.queries, pair_ms)
+
+    tolist_ms, _ = best_of(args.repeat, lambda: matrix.tolist())
+
+    json_ms, bodies = best_of(args.repeat, lambda: json.dumps(
+        [{'file_chunk_id': i, 'vector': vector} for i, vector in enumerate(doc_lists)]))
+    pg_ms, pg_bodies = best_of(args.repeat, lambda: json.dumps(
+        [{'file_chunk_id': i, 'vector': embeddings.to_pgvector(vector)} for i, vector in enumerate(matrix)]))
+    row("request body: JSON floats vs pgvector text", json_ms, pg_ms)
+
+    parsed = np.stack([embeddings.parse_vector(item['vector']) for item in json.loads(pg_bodies)])
+    list_mb = allocated_mb(lambda: matrix.tolist())
+    print(f"\nmax |legacy - similarity_matrix| score difference: {max_error:.2e}")
+    print(f"model output -> Python lists: {tolist_ms:.1f} ms, skipped when the ndarray is kept")
+    print(f"resident size: ndarray {matrix.nbytes / 1e6:.1f} MB vs lists of floats {list_mb:.1f} MB")
+    print(f"request body: {len(bodies) / args.vectors:.0f} B/vector as JSON floats, "
+          f"{len(pg_bodies) / args.vectors:.0f} B/vector as pgvector text; "
+          f"pgvector text round-trips float32 exactly: {bool((parsed == matrix).all())}")
+
+
+if __name__ == "__main__":
+    main()
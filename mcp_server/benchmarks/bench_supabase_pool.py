@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PostgREST round-trip latency with and without connection reuse
+
+Starts a local HTTP/1.1 stand-in for PostgREST (answers GET /rest/v1/<table>
+with a small JSON array, like a users lookup) and issues the same requests
+from several threads in two modes:
+
+  fresh   - a new client and connection per request (no reuse)
+  pooled  - one keep-alive client shared by all threads, with the same
+            limits/timeout shape as supabase_pool
+
+`--handshake-ms` adds a delay to the first request on every new connection to
+stand in for the TCP + TLS setup to a remote Supabase project, which the
+loopback connection here does not have.
+
+Runs fully offline; only httpx is required.
+
+Usage:
+    python benchmarks/bench_supabase_pool.py [--requests 2000] [--threads 8] [--handshake-ms 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+PAYLOAD = json.dumps([{
+    'id': '4b1e7c3a-0000-4000-8000-000000000001',
+    'firebase_uid': 'bench-user',
+    'email': 'bench@example.com',
+    'name': 'Bench User'
+}]).encode('utf-8')
+
+
+def make_handler(handshake_seconds: float, counters: dict):
+    class PostgrestStandIn(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            self._fresh_connection = True
+            with counters['lock']:
+                counters['connections'] += 1
+
+        def do_GET(self):
+            # postgrest-py sends a (usually empty) JSON body even on GET
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            if self._fresh_connection and handshake_seconds:
+                time.sleep(handshake_seconds)
+            self._fresh_connection = False
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PostgrestStandIn
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(mode: str, base_url: str, requests: int, threads: int, pool_size: int) -> list:
+    headers = {'apikey': 'bench', 'Accept-Profile': 'public'}
+    timeout = httpx.Timeout(connect=5, read=30, write=30, pool=5)
+    shared = None
+    if mode == "pooled":
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=30)
+        shared = httpx.Client(base_url=base_url, headers=headers, timeout=timeout,
+                              transport=httpx.HTTPTransport(limits=limits))
+
+    def one_request(_):
+        start = time.perf_counter()
+        if shared is not None:
+            response = shared.get("/users", params={'firebase_uid': 'eq.bench-user', 'select': '*'})
+        else:
+            with httpx.Client(base_url=base_url, headers=headers, timeout=timeout) as client:
+                response = client.get("/users", params={'firebase_uid': 'eq.bench-user', 'select': '*'})
+        response.raise_for_status()
+        response.json()
+        return (time.perf_counter() - start) * 1000
+
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return list(executor.map(one_request, range(requests)))
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgREST round trips with and without connection reuse")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent caller threads")
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20")),
+                        help="Max connections of the pooled client")
+    parser.add_argument("--handshake-ms", type=float, default=20.0,
+                        help="Simulated connection setup cost per new connection")
+    args = parser.parse_args()
+
+    counters = {'connections': 0, 'lock': threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000, counters))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/rest/v1"
+
+    print(f"{args.requests} requests per mode, {args.threads} threads, "
+          f"simulated handshake {args.handshake_ms:.0f} ms\n")
+    print(f"{'mode':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'connections':>12}")
+    try:
+        for mode in ("fresh", "pooled"):
+            counters['connections'] = 0
+            start = time.perf_counter()
+            latencies = run_mode(mode, base_url, args.requests, args.threads, args.pool_size)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<8} {len(latencies) / elapsed:>8.0f} {statistics.median(latencies):>8.2f} "
+                  f"{percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f} "
+                  f"{counters['connections']:>12}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
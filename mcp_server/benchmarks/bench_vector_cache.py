@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-user vector cache vs the match_file_chunks RPC
+
+Seeds benchmarks/fakes.FakeSupabase with --users users of --chunks chunks each
+and replays chat-like sessions (--followups questions per user visit) through
+file_tools._match_chunks, once against the RPC and once with the in-process
+vector cache enabled. Reports per-query latency percentiles, the cost of the
+cold loads, cache memory, evictions under --max-mb and how often the cached
+top-k matches the RPC's top-k exactly.
+
+--db-latency-ms stands in for the round trip to Supabase, which dominates the
+RPC path and is paid only once per user (per page) by the cache.
+
+Usage:
+    python benchmarks/bench_vector_cache.py
+    python benchmarks/bench_vector_cache.py --users 50 --chunks 2000 --max-mb 64 --db-latency-ms 15
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import numpy as np
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db, users: int, chunks: int, rng: np.random.Generator) -> list:
+    user_ids = []
+    for u in range(users):
+        user = db.table('users').insert({'firebase_uid': f"cache-user-{u}"}).execute().data[0]
+        file_row = db.table('files').insert({
+            'user_id': user['id'], 'filename': f"doc-{u}.pdf", 'original_filename': f"doc-{u}.pdf",
+            'file_type': 'pdf', 'file_size': 0, 'file_path': f"uploads/{user['id']}/doc.pdf",
+            'content_type': 'application/pdf', 'upload_status': 'processed'
+        }).execute().data[0]
+        chunk_rows = db.table('file_chunks').insert([
+            {'file_id': file_row['id'], 'chunk_index': i, 'content': f"chunk {i} of user {u} " + "text " * 150,
+             'page_number': 1 + i // 4}
+            for i in range(chunks)
+        ]).execute().data
+        vectors = rng.standard_normal((chunks, 384), dtype=np.float32)
+        db.table('embeddings').insert([
+            {'file_chunk_id': row['id'], 'vector': vector.tolist(), 'content_type': 'file_chunk'}
+            for row, vector in zip(chunk_rows, vectors)
+        ]).execute()
+        user_ids.append(user['id'])
+    return user_ids
+
+
+def replay(file_tools, db, sessions, match_count: int) -> tuple:
+    latencies, results = [], []
+    for user_uuid, query in sessions:
+        start = time.perf_counter()
+        rows = file_tools._match_chunks(db, query.tolist(), match_count, user_uuid)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([row['id'] for row in rows])
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user vector cache vs match_file_chunks RPC")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per user")
+    parser.add_argument("--visits", type=int, default=60, help="User visits (a user chosen at random each time)")
+    parser.add_argument("--followups", type=int, default=5, help="Questions per visit")
+    parser.add_argument("--match-count", type=int, default=50)
+    parser.add_argument("--max-mb", type=float, default=256.0, help="Cache memory budget")
+    parser.add_argument("--db-latency-ms", type=float, default=10.0, help="Simulated round trip per RPC")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import fakes
+    import retrieval_backends
+    import vector_cache
+    from tools import file_tools
+
+    rng = np.random.default_rng(args.seed)
+    db = fakes.FakeSupabase()
+    user_ids = seed(db, args.users, args.chunks, rng)
+    db.latency = args.db_latency_ms / 1000
+
+    picker = random.Random(args.seed)
+    sessions = []
+    for _ in range(args.visits):
+        user_uuid = picker.choice(user_ids)
+        sessions.extend((user_uuid, rng.standard_normal(384, dtype=np.float32)) for _ in range(args.followups))
+
+    print(f"{args.users} users x {args.chunks} chunks, {len(sessions)} queries "
+          f"({args.followups} per visit), top {args.match_count}, db latency {args.db_latency_ms:.0f} ms, "
+          f"budget {args.max_mb:.0f} MB\n")
+
+    retrieval_backends.set_retrieval_backend(retrieval_backends.SupabaseRetrievalBackend(cache=None))
+    rpc_latencies, rpc_results = replay(file_tools, db, sessions, args.match_count)
+
+    cache = vector_cache.VectorCache(max_bytes=int(args.max_mb * 1024 * 1024))
+    retrieval_backends.set_retrieval_backend(retrieval_backends.SupabaseRetrievalBackend(cache=cache))
+    cache_latencies, cache_results = replay(file_tools, db, sessions, args.match_count)
+
+    print(f"{'path':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, values in (("rpc", rpc_latencies), ("cache", cache_latencies)):
+        print(f"{name:<8} {statistics.mean(values):>8.2f} {statistics.median(values):>8.2f} "
+              f"{percentile(values, 95):>8.2f} {percentile(values, 99):>8.2f}")
+
+    stats = cache.stats()
+    same = sum(1 for a, b in zip(rpc_results, cache_results) if a == b)
+    print(f"\ncache: {stats['hits']} hits, {stats['misses']} loads, {stats['evictions']} evictions, "
+          f"{stats['bypassed']} bypassed, {stats['users']} users / {stats['bytes'] / 1e6:.1f} MB resident")
+    print(f"identical top-{args.match_count} to the RPC: {same}/{len(sessions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+"""
+In-process stand-ins for Supabase and Gemini used by the benchmark harness
+
+FakeSupabase implements the subset of the supabase-py / postgrest-py API the
+server uses: table queries with eq/neq/gt/gte/lt/lte/in_/or_/order/limit/
+text_search, embedded selects such as "users(name, email)" or
+"files!inner(filename)", count modes, insert/upsert/update/delete with the
+schema's cascades, the match_file_chunks / match_file_chunks_binary /
+keyword_search_chunks / user_chunk_vectors / admin_system_stats RPCs and a
+storage bucket API.
+
+FakeGeminiModel returns deterministic answers after a configurable latency.
+fake_embedding is a deterministic 384-dim unit vector derived from word hashes,
+so texts that share words are similar, without loading sentence-transformers.
+FakeSentenceTransformer / FakeCrossEncoder mimic the real models' memory and
+compute footprint (not their quality) for process and memory benchmarks.
+"""
+
+import copy
+import hashlib
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+# Defaults applied on insert, mirroring db/schema_384_fresh.sql
+_DEFAULTS = {
+    'users': {'is_admin': False},
+    'admin_users': {'is_active': True},
+    'files': {'upload_status': 'uploaded'},
+    'messages': {'metadata': {}},
+}
+# parent table -> [(child table, foreign key)] for "on delete cascade"
+_CASCADES = {
+    'users': [('files', 'user_id'), ('messages', 'user_id')],
+    'files': [('file_chunks', 'file_id')],
+    'file_chunks': [('embeddings', 'file_chunk_id')],
+    'messages': [('embeddings', 'message_id')],
+}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas that are not inside parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append(''.join(current).strip())
+    return [p for p in parts if p]
+
+
+def _coerce(row_value: Any, value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip('"')
+        if isinstance(row_value, bool):
+            return value.lower() == 'true'
+        if isinstance(row_value, (int, float)):
+            return float(value)
+    return value
+
+
+def _compare(op: str, row_value: Any, value: Any) -> bool:
+    if op == 'is':
+        return row_value is None if str(value).lower() == 'null' else row_value == _coerce(row_value, value)
+    if row_value is None:
+        return False
+    value = _coerce(row_value, value)
+    if op == 'eq':
+        return row_value == value
+    if op == 'neq':
+        return row_value != value
+    if op == 'gt':
+        return row_value > value
+    if op == 'gte':
+        return row_value >= value
+    if op == 'lt':
+        return row_value < value
+    if op == 'lte':
+        return row_value <= value
+    raise ValueError(f"Unsupported operator in fake PostgREST filter: {op}")
+
+
+def _parse_logic(expression: str) -> Callable[[dict], bool]:
+    """Parse a PostgREST or=(...) body, e.g. 'a.lt.1,and(a.eq.1,id.lt.x)'"""
+    predicates = []
+    for term in _split_top_level(expression):
+        if term.startswith('and(') and term.endswith(')'):
+            inner = [_parse_logic(t) for t in _split_top_level(term[4:-1])]
+            predicates.append(lambda row, inner=inner: all(p(row) for p in inner))
+        elif term.startswith('or(') and term.endswith(')'):
+            predicates.append(_parse_logic(term[3:-1]))
+        else:
+            column, op, value = term.split('.', 2)
+            predicates.append(lambda row, c=column, o=op, v=value: _compare(o, row.get(c), v))
+    return lambda row: any(p(row) for p in predicates)
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Chainable builder with the same surface as postgrest's request builders"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._count: Optional[str] = None
+        self._filters: List[Callable[[dict], bool]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._payload: Any = None
+        self._on_conflict = 'id'
+        self._ignore_duplicates = False
+
+    # Actions
+    def select(self, columns: str = '*', count: Optional[str] = None) -> "FakeQuery":
+        self._action, self._columns, self._count = 'select', columns, count
+        return self
+
+    def insert(self, data, **kwargs) -> "FakeQuery":
+        self._action, self._payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict: str = 'id', ignore_duplicates: bool = False, **kwargs) -> "FakeQuery":
+        self._action, self._payload = 'upsert', data
+        self._on_conflict, self._ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, data, **kwargs) -> "FakeQuery":
+        self._action, self._payload = 'update', data
+        return self
+
+    def delete(self, **kwargs) -> "FakeQuery":
+        self._action = 'delete'
+        return self
+
+    # Filters
+    def _filter(self, op: str, column: str, value: Any) -> "FakeQuery":
+        self._filters.append(lambda row: _compare(op, row.get(column), value))
+        return self
+
+    def eq(self, column, value): return self._filter('eq', column, value)
+    def neq(self, column, value): return self._filter('neq', column, value)
+    def gt(self, column, value): return self._filter('gt', column, value)
+    def gte(self, column, value): return self._filter('gte', column, value)
+    def lt(self, column, value): return self._filter('lt', column, value)
+    def lte(self, column, value): return self._filter('lte', column, value)
+    def is_(self, column, value): return self._filter('is', column, value)
+
+    def in_(self, column: str, values) -> "FakeQuery":
+        allowed = set(values)
+        self._filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def or_(self, filters: str, **kwargs) -> "FakeQuery":
+        self._filters.append(_parse_logic(filters))
+        return self
+
+    def text_search(self, column: str, query: str, options: Optional[dict] = None) -> "FakeQuery":
+        # plainto_tsquery semantics: every word must appear
+        words = set(_tokens(query))
+        self._filters.append(lambda row: words.issubset(_tokens(row.get(column))))
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, **kwargs) -> "FakeQuery":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs) -> "FakeQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "FakeQuery":
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self) -> FakeResponse:
+        self._db._maybe_delay()
+        with self._db.lock:
+            self._db.calls[f"{self._action}:{self._table}"] = self._db.calls.get(f"{self._action}:{self._table}", 0) + 1
+            return getattr(self, f"_execute_{self._action}")()
+
+    # Execution (caller holds the lock)
+    def _matching(self) -> List[dict]:
+        rows = self._db.tables.setdefault(self._table, [])
+        return [row for row in rows if all(f(row) for f in self._filters)]
+
+    def _execute_select(self) -> FakeResponse:
+        rows = self._matching()
+        rows = self._embed(rows)
+        count = len(rows) if self._count else None
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        end = None if self._limit is None else self._offset + self._limit
+        return FakeResponse(copy.deepcopy(rows[self._offset:end]), count)
+
+    def _embed(self, rows: List[dict]) -> List[dict]:
+        plain, embeds = [], []
+        for part in _split_top_level(self._columns):
+            match = re.match(r"^(\w+)(!inner)?\((.*)\)$", part)
+            if match:
+                embeds.append((match.group(1), bool(match.group(2)), _split_top_level(match.group(3))))
+            else:
+                plain.append(part)
+        result = []
+        for row in rows:
+            shaped = dict(row) if '*' in plain else {c: row.get(c) for c in plain}
+            keep = True
+            for relation, inner, columns in embeds:
+                foreign_key = relation.rstrip('s') + '_id'
+                parent = self._db._by_id(relation, row.get(foreign_key))
+                if parent is None and inner:
+                    keep = False
+                    break
+                shaped[relation] = None if parent is None else (
+                    dict(parent) if '*' in columns else {c: parent.get(c) for c in columns}
+                )
+            if keep:
+                result.append(shaped)
+        return result
+
+    def _execute_insert(self) -> FakeResponse:
+        rows = self._payload if isinstance(self._payload, list) else [self._payload]
+        return FakeResponse([copy.deepcopy(self._db._insert(self._table, row)) for row in rows])
+
+    def _execute_upsert(self) -> FakeResponse:
+        rows = self._payload if isinstance(self._payload, list) else [self._payload]
+        keys = [k.strip() for k in self._on_conflict.split(',')]
+        table = self._db.tables.setdefault(self._table, [])
+        written = []
+        for row in rows:
+            existing = next((r for r in table if all(r.get(k) == row.get(k) for k in keys)), None)
+            if existing is None:
+                written.append(self._db._insert(self._table, row))
+            elif not self._ignore_duplicates:
+                existing.update(row)
+                written.append(existing)
+        return FakeResponse(copy.deepcopy(written))
+
+    def _execute_update(self) -> FakeResponse:
+        rows = self._matching()
+        for row in rows:
+            row.update(copy.deepcopy(self._payload))
+        if self._table == 'embeddings':
+            self._db._version += 1
+        return FakeResponse(copy.deepcopy(rows))
+
+    def _execute_delete(self) -> FakeResponse:
+        rows = self._matching()
+        for row in rows:
+            self._db._delete_cascade(self._table, row)
+        return FakeResponse(copy.deepcopy(rows))
+
+
+class FakeBucket:
+    def __init__(self, storage: "FakeStorage", bucket: str):
+        self._storage = storage
+        self._bucket = bucket
+
+    def upload(self, path: str, file: bytes, file_options: Optional[dict] = None):
+        self._storage._db._maybe_delay()
+        with self._storage.lock:
+            self._storage.objects[(self._bucket, path)] = bytes(file)
+        return FakeResponse({'Key': f"{self._bucket}/{path}"})
+
+    def download(self, path: str) -> bytes:
+        with self._storage.lock:
+            return self._storage.objects[(self._bucket, path)]
+
+    def remove(self, paths: List[str]):
+        with self._storage.lock:
+            for path in paths:
+                self._storage.objects.pop((self._bucket, path), None)
+        return FakeResponse([{'name': p} for p in paths])
+
+    def list(self, path: str = "", *args, **kwargs):
+        with self._storage.lock:
+            return [{'name': key[1]} for key in self._storage.objects if key[0] == self._bucket
+                    and key[1].startswith(path)]
+
+
+class FakeStorage:
+    def __init__(self, db: "FakeSupabase"):
+        self._db = db
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.lock = threading.Lock()
+
+    def from_(self, bucket: str) -> FakeBucket:
+        return FakeBucket(self, bucket)
+
+
+class FakeRPC:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self._db = db
+        self._name = name
+        self._params = params
+
+    def execute(self) -> FakeResponse:
+        self._db._maybe_delay()
+        handler = getattr(self._db, f"_rpc_{self._name}", None)
+        if handler is None:
+            raise Exception(f"Could not find the function public.{self._name} in the schema cache")
+        with self._db.lock:
+            self._db.calls[f"rpc:{self._name}"] = self._db.calls.get(f"rpc:{self._name}", 0) + 1
+            return FakeResponse(handler(**self._params))
+
+
+class FakeSupabase:
+    """Thread-safe in-memory database with the supabase-py client surface"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.tables: Dict[str, List[dict]] = {}
+        self.lock = threading.RLock()
+        self.storage = FakeStorage(self)
+        self.latency = latency_ms / 1000
+        self.calls: Dict[str, int] = {}
+        self._version = 0
+        self._matrix_cache: Optional[Tuple[int, List[dict], np.ndarray]] = None
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeRPC:
+        return FakeRPC(self, name, params or {})
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    def _maybe_delay(self) -> None:
+        # Network round trip to Supabase; slept outside the lock like real I/O
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _insert(self, table: str, row: dict) -> dict:
+        stored = {**_DEFAULTS.get(table, {}), **copy.deepcopy(row)}
+        stored.setdefault('id', str(uuid.uuid4()))
+        stored.setdefault('created_at', _now_iso())
+        if table == 'files':
+            stored.setdefault('updated_at', stored['created_at'])
+        self.tables.setdefault(table, []).append(stored)
+        if table == 'embeddings':
+            self._version += 1
+        return stored
+
+    def _by_id(self, table: str, row_id: Any) -> Optional[dict]:
+        if row_id is None:
+            return None
+        return next((row for row in self.tables.get(table, []) if row.get('id') == row_id), None)
+
+    def _delete_cascade(self, table: str, row: dict) -> None:
+        rows = self.tables.get(table, [])
+        if row in rows:
+            rows.remove(row)
+        if table == 'embeddings':
+            self._version += 1
+        for child_table, foreign_key in _CASCADES.get(table, []):
+            for child in [c for c in self.tables.get(child_table, []) if c.get(foreign_key) == row.get('id')]:
+                self._delete_cascade(child_table, child)
+
+    def _embedding_matrix(self) -> Tuple[List[dict], np.ndarray]:
+        if self._matrix_cache is None or self._matrix_cache[0] != self._version:
+            rows = [e for e in self.tables.get('embeddings', []) if e.get('content_type') == 'file_chunk']
+            if rows:
+                matrix = np.asarray([_parse_vector(e['vector']) for e in rows], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms == 0, 1, norms)
+            else:
+                matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            self._matrix_cache = (self._version, rows, matrix)
+        return self._matrix_cache[1], self._matrix_cache[2]
+
+    def _user_chunks(self, user_uuid: str) -> Dict[str, dict]:
+        file_ids = {f['id'] for f in self.tables.get('files', []) if f.get('user_id') == user_uuid}
+        return {c['id']: c for c in self.tables.get('file_chunks', []) if c.get('file_id') in file_ids}
+
+    def _rpc_match_file_chunks(self, query_embedding, match_count: int, user_uuid: str) -> List[dict]:
+        rows, matrix = self._embedding_matrix()
+        chunks = self._user_chunks(user_uuid)
+        if not rows or not chunks:
+            return []
+        query = np.asarray(_parse_vector(query_embedding), dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        mask = np.fromiter((e.get('file_chunk_id') in chunks for e in rows), dtype=bool, count=len(rows))
+        scores = np.where(mask, matrix @ query, -np.inf)
+        top = np.argsort(-scores)[:match_count]
+        result = []
+        for index in top:
+            if not mask[index]:
+                break
+            chunk = chunks[rows[index]['file_chunk_id']]
+            result.append({
+                'id': chunk['id'],
+                'content': chunk.get('content'),
+                'page_number': chunk.get('page_number'),
+                'file_id': chunk['file_id'],
+                'similarity': float(scores[index])
+            })
+        return result
+
+    def _rpc_match_file_chunks_binary(self, query_embedding, match_count: int, user_uuid: str,
+                                      rescore_count: int = 200) -> List[dict]:
+        """Hamming distance on sign bits picks the candidates, cosine similarity orders them"""
+        rows, matrix = self._embedding_matrix()
+        chunks = self._user_chunks(user_uuid)
+        if not rows or not chunks:
+            return []
+        query = np.asarray(_parse_vector(query_embedding), dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        mask = np.fromiter((e.get('file_chunk_id') in chunks for e in rows), dtype=bool, count=len(rows))
+        positions = np.flatnonzero(mask)
+        distances = ((matrix[positions] > 0) != (query > 0)).sum(axis=1)
+        candidates = positions[np.argsort(distances, kind='stable')[:max(rescore_count, match_count)]]
+        scores = matrix[candidates] @ query
+        result = []
+        for index, score in sorted(zip(candidates, scores), key=lambda item: -item[1])[:match_count]:
+            chunk = chunks[rows[index]['file_chunk_id']]
+            result.append({
+                'id': chunk['id'],
+                'content': chunk.get('content'),
+                'page_number': chunk.get('page_number'),
+                'file_id': chunk['file_id'],
+                'similarity': float(score)
+            })
+        return result
+
+    def _rpc_keyword_search_chunks(self, search_query: str, user_uuid: str, match_count: int) -> List[dict]:
+        words = set(_tokens(search_query))
+        result = []
+        for chunk in self._user_chunks(user_uuid).values():
+            tokens = _tokens(chunk.get('content'))
+            if words and words.issubset(tokens):
+                rank = sum(tokens.count(w) for w in words) / (len(tokens) or 1)
+                result.append({
+                    'id': chunk['id'],
+                    'content': chunk.get('content'),
+                    'page_number': chunk.get('page_number'),
+                    'file_id': chunk['file_id'],
+                    'rank': rank
+                })
+        result.sort(key=lambda row: row['rank'], reverse=True)
+        return result[:match_count]
+
+    def _rpc_user_chunk_vectors(self, user_uuid: str, after_id: Optional[str] = None,
+                                page_size: int = 1000) -> List[dict]:
+        chunks = self._user_chunks(user_uuid)
+        rows = []
+        for embedding in self.tables.get('embeddings', []):
+            chunk = chunks.get(embedding.get('file_chunk_id'))
+            if chunk is None or embedding.get('content_type') != 'file_chunk':
+                continue
+            if after_id is not None and chunk['id'] <= after_id:
+                continue
+            rows.append({
+                'id': chunk['id'],
+                'content': chunk.get('content'),
+                'page_number': chunk.get('page_number'),
+                'file_id': chunk['file_id'],
+                # PostgREST returns pgvector columns as text
+                'vector': '[' + ','.join(repr(float(v)) for v in _parse_vector(embedding['vector'])) + ']'
+            })
+        rows.sort(key=lambda row: row['id'])
+        return rows[:page_size]
+
+    def _rpc_admin_system_stats(self, use_estimates: bool = False) -> dict:
+        files = self.tables.get('files', [])
+        return {
+            'total_users': len(self.tables.get('users', [])),
+            'total_files': len(files),
+            'processed_files': sum(1 for f in files if f.get('upload_status') == 'processed'),
+            'processing_files': sum(1 for f in files if f.get('upload_status') in ('uploaded', 'processing')),
+            'failed_files': sum(1 for f in files if f.get('upload_status') == 'failed'),
+            'total_messages': len(self.tables.get('messages', [])),
+            'total_chunks': len(self.tables.get('file_chunks', [])),
+            'total_embeddings': len(self.tables.get('embeddings', [])),
+            'storage': {'uploaded_file_bytes': sum(f.get('file_size') or 0 for f in files)},
+            'estimated': use_estimates,
+            'generated_at': _now_iso()
+        }
+
+
+def _parse_vector(vector) -> List[float]:
+    """Vectors arrive as lists from the app or as pgvector text '[0.1,0.2,...]'"""
+    if isinstance(vector, str):
+        return [float(v) for v in vector.strip('[]').split(',') if v]
+    return vector
+
+
+def fake_embedding_array(text: str) -> np.ndarray:
+    """Deterministic bag-of-words embedding: shared words give similar vectors"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in _tokens(text) or ['empty']:
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        seed = int.from_bytes(digest, 'little')
+        vector += np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return vector / norm
+
+
+def fake_embeddings_array(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.stack([fake_embedding_array(text) for text in texts])
+
+
+def fake_embedding(text: str) -> List[float]:
+    return fake_embedding_array(text).tolist()
+
+
+def fake_embeddings_batch(texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    return fake_embeddings_array(texts).tolist()
+
+
+def fake_rerank(query: str, documents: List[str], top_k: int = 5) -> List[Tuple[int, float]]:
+    """Word-overlap scores standing in for the cross-encoder"""
+    query_tokens = set(_tokens(query))
+    scored = []
+    for index, document in enumerate(documents):
+        tokens = set(_tokens(document))
+        scored.append((index, len(query_tokens & tokens) / (len(query_tokens) or 1)))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_k]
+
+
+class _FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    Deterministic stand-in for genai.GenerativeModel.
+    Latency is base + per_1k_prompt_chars * (len(prompt) / 1000), plus seeded jitter.
+    """
+
+    def __init__(self, name: str = "fake-gemini", latency_ms: float = 300.0,
+                 per_1k_chars_ms: float = 2.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.model_name = name
+        self.latency = latency_ms / 1000
+        self.per_1k_chars = per_1k_chars_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        time.sleep(max(0.0, self.latency + self.per_1k_chars * len(prompt) / 1000 + jitter))
+        question = prompt.rsplit("Current message:", 1)[-1].strip()
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        return _FakeGeminiResponse(f"Here is what I found about {question[:80]} (ref {digest}).")
+
+
+class _FakeTransformer:
+    """
+    MiniLM-sized stand-in for the sentence-transformers models: ~22M float32
+    parameters (a token table plus six feed-forward layers) held in real,
+    written pages, and a forward pass with MiniLM-like compute per token.
+    """
+
+    def __init__(self, vocab: int = 30522, dim: int = EMBEDDING_DIM, layers: int = 6, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.vocab = vocab
+        self.token_table = rng.standard_normal((vocab, dim), dtype=np.float32) * 0.05
+        self.layers = [
+            (rng.standard_normal((dim, dim * 4), dtype=np.float32) * 0.02,
+             rng.standard_normal((dim * 4, dim), dtype=np.float32) * 0.02)
+            for _ in range(layers)
+        ]
+
+    def _forward(self, text: str) -> np.ndarray:
+        ids = [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=4).digest(), 'little') % self.vocab
+               for t in (_tokens(text)[:128] or ['empty'])]
+        states = self.token_table[ids]
+        for up, down in self.layers:
+            states = states + np.maximum(states @ up, 0) @ down
+        return states.mean(axis=0)
+
+
+class FakeSentenceTransformer(_FakeTransformer):
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        vectors = np.stack([self._forward(s) for s in ([sentences] if single else sentences)])
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return vectors[0] if single else vectors
+
+
+class FakeCrossEncoder(_FakeTransformer):
+    def __init__(self, **kwargs):
+        super().__init__(seed=1, **kwargs)
+
+    def predict(self, sentences, **kwargs):
+        return np.array([float(self._forward(f"{q} {d}")[0]) for q, d in sentences], dtype=np.float32)
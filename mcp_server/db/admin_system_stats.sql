@@ -0,0 +1,97 @@
+-- ============================================================================
+-- ADMIN DASHBOARD STATS
+-- ============================================================================
+-- One round-trip for every figure on the admin dashboard
+-- (tools/admin_tools.get_system_stats). Included in schema_384_fresh.sql;
+-- run this file on existing databases. Safe to run more than once.
+-- ============================================================================
+
+-- Throughput figures filter on created_at
+create index if not exists idx_messages_created_at on messages(created_at);
+create index if not exists idx_file_chunks_created_at on file_chunks(created_at);
+
+-- Planner row estimate for a table; null when the table has never been analyzed
+create or replace function public.estimated_row_count(table_name regclass)
+returns bigint
+language sql
+stable
+as $$
+  select case when c.reltuples < 0 then null else c.reltuples::bigint end
+  from pg_class c
+  where c.oid = table_name;
+$$;
+
+-- use_estimates: read the large tables (messages, file_chunks, embeddings)
+-- from planner statistics instead of scanning them
+create or replace function public.admin_system_stats(use_estimates boolean default false)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  message_count bigint;
+  chunk_count bigint;
+  embedding_count bigint;
+begin
+  if use_estimates then
+    message_count := public.estimated_row_count('public.messages');
+    chunk_count := public.estimated_row_count('public.file_chunks');
+    embedding_count := public.estimated_row_count('public.embeddings');
+  end if;
+  if message_count is null then
+    select count(*) into message_count from public.messages;
+  end if;
+  if chunk_count is null then
+    select count(*) into chunk_count from public.file_chunks;
+  end if;
+  if embedding_count is null then
+    select count(*) into embedding_count from public.embeddings;
+  end if;
+
+  return jsonb_build_object(
+    'total_users', (select count(*) from public.users),
+    'total_files', (select count(*) from public.files),
+    'processed_files', (select count(*) from public.files where upload_status = 'processed'),
+    'processing_files', (select count(*) from public.files where upload_status in ('uploaded', 'processing')),
+    'failed_files', (select count(*) from public.files where upload_status = 'failed'),
+    'total_messages', message_count,
+    'total_chunks', chunk_count,
+    'total_embeddings', embedding_count,
+    'throughput', jsonb_build_object(
+      'files_processed_last_hour', (
+        select count(*) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '1 hour'),
+      'files_processed_last_24h', (
+        select count(*) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '24 hours'),
+      'bytes_ingested_last_24h', (
+        select coalesce(sum(file_size), 0) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '24 hours'),
+      'chunks_ingested_last_24h', (
+        select count(*) from public.file_chunks
+        where created_at > now() - interval '24 hours'),
+      'messages_last_24h', (
+        select count(*) from public.messages
+        where created_at > now() - interval '24 hours')
+    ),
+    'storage', jsonb_build_object(
+      'uploaded_file_bytes', (select coalesce(sum(file_size), 0) from public.files),
+      'files_table_bytes', pg_total_relation_size('public.files'),
+      'file_chunks_table_bytes', pg_total_relation_size('public.file_chunks'),
+      'embeddings_table_bytes', pg_total_relation_size('public.embeddings'),
+      'messages_table_bytes', pg_total_relation_size('public.messages')
+    ),
+    'estimated', use_estimates,
+    'generated_at', now()
+  );
+end;
+$$;
+
+comment on function public.admin_system_stats(boolean) is
+'All admin dashboard statistics in a single call; use_estimates reads large tables from planner statistics';
+
+-- Only the API (service role) may call these: they expose table sizes and totals
+revoke execute on function public.estimated_row_count(regclass) from public, anon, authenticated;
+revoke execute on function public.admin_system_stats(boolean) from public, anon, authenticated;
+grant execute on function public.estimated_row_count(regclass) to service_role;
+grant execute on function public.admin_system_stats(boolean) to service_role;
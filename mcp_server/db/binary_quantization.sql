@@ -0,0 +1,83 @@
+-- ============================================================================
+-- BINARY QUANTIZED SEARCH (optional)
+-- ============================================================================
+-- Adds match_file_chunks_binary: a first pass by Hamming distance between the
+-- sign bits of the query and of each of the user's chunk vectors
+-- (binary_quantize, 48 bytes for 384 dims) keeps rescore_count candidates,
+-- which are then ranked by exact cosine distance on the full vector.
+-- Used by the API with VECTOR_QUANTIZATION=binary (quantization.py).
+--
+-- The bits are not stored: an HNSW expression index on
+-- binary_quantize(vector)::bit(384) holds them (about 48 bytes per chunk plus
+-- graph links), and the table keeps only the full vectors, so ingestion is
+-- unchanged. What the index buys depends on the plan:
+--   * When Postgres walks the index, the first pass reads the compact index
+--     instead of the full vectors. The per-user filter is applied to what the
+--     walk returns, so a user who owns a small share of all chunks can get
+--     fewer than rescore_count candidates (pgvector 0.8+: set
+--     hnsw.iterative_scan = relaxed_order to keep walking until enough match).
+--   * When Postgres starts from the user's rows (the usual plan when a user
+--     owns few chunks), binary_quantize runs on each full vector read from the
+--     table. That saves distance arithmetic, not I/O.
+-- An index scan returns at most hnsw.ef_search rows, so the function raises
+-- ef_search to the candidate count for its own transaction (max 1000).
+--
+-- Requires pgvector 0.7.0 or newer (binary_quantize, bit <~> operator,
+-- bit_hamming_ops). Building the index reads the whole embeddings table; use
+-- CREATE INDEX CONCURRENTLY by hand on a busy database. Safe to run more than
+-- once, and drops the stored vector_bits column added by earlier versions.
+-- ============================================================================
+
+alter table public.embeddings drop column if exists vector_bits;
+
+create index if not exists idx_embeddings_vector_bits
+  on public.embeddings
+  using hnsw ((binary_quantize(vector)::bit(384)) bit_hamming_ops)
+  where content_type = 'file_chunk';
+
+create or replace function public.match_file_chunks_binary(
+  query_embedding vector(384),
+  match_count int,
+  user_uuid uuid,
+  rescore_count int default 200
+)
+returns table (
+  id uuid,
+  content text,
+  page_number int,
+  file_id uuid,
+  similarity float
+)
+language plpgsql
+stable
+as $$
+begin
+  perform set_config('hnsw.ef_search', least(greatest(rescore_count, match_count), 1000)::text, true);
+
+  return query
+  with candidates as (
+    select e.file_chunk_id,
+           e.vector
+    from public.embeddings e
+    join public.file_chunks fc on fc.id = e.file_chunk_id
+    join public.files f on f.id = fc.file_id
+    where e.content_type = 'file_chunk'
+      and f.user_id = user_uuid
+    -- Same expression as idx_embeddings_vector_bits, so the planner can use it
+    order by binary_quantize(e.vector)::bit(384) <~> binary_quantize(query_embedding)::bit(384)
+    limit greatest(rescore_count, match_count)
+  )
+  select fc.id,
+         fc.content,
+         fc.page_number,
+         fc.file_id,
+         1 - (c.vector <=> query_embedding) as similarity
+  from candidates c
+  join public.file_chunks fc on fc.id = c.file_chunk_id
+  order by c.vector <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+comment on function public.match_file_chunks_binary(vector(384), int, uuid, int) is
+'Hamming-distance candidate search on binary-quantized embeddings with exact cosine rescoring';
@@ -0,0 +1,23 @@
+-- ============================================================================
+-- MIGRATION: Indexes for keyset pagination of the admin file listing
+-- ============================================================================
+-- GET /admin/files pages through files newest first on (created_at, id),
+-- optionally filtered by upload_status, user_id or file_type.
+-- Safe to run more than once. Run this in Supabase SQL Editor
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_files_created_at_id
+  ON files(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_files_status_created_at_id
+  ON files(upload_status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_files_user_created_at_id
+  ON files(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_files_type_created_at_id
+  ON files(file_type, created_at DESC, id DESC);
+
+-- Superseded by the composite indexes above (same leading column)
+DROP INDEX IF EXISTS idx_files_user_id;
+DROP INDEX IF EXISTS idx_files_upload_status;
+
+-- Keep planner estimates fresh for count=planned/estimated totals
+ANALYZE files;
@@ -0,0 +1,36 @@
+-- ============================================================================
+-- MIGRATION: Unique (file_chunk_id, content_type) on embeddings
+-- ============================================================================
+-- Required by migrate_embeddings.py, which writes embeddings with bulk
+-- upserts instead of a select + update/insert per chunk.
+-- Safe to run more than once. Run this in Supabase SQL Editor
+-- ============================================================================
+
+-- Step 1: Remove duplicate embeddings, keeping the most recent row per chunk
+DELETE FROM embeddings e
+USING embeddings newer
+WHERE e.file_chunk_id = newer.file_chunk_id
+  AND e.content_type = newer.content_type
+  AND (e.created_at, e.id) < (newer.created_at, newer.id);
+
+-- Step 2: Add the unique constraint used as the upsert conflict target
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conname = 'embeddings_file_chunk_id_content_type_key'
+  ) THEN
+    ALTER TABLE embeddings
+      ADD CONSTRAINT embeddings_file_chunk_id_content_type_key
+      UNIQUE (file_chunk_id, content_type);
+  END IF;
+END $$;
+
+-- The unique index also serves lookups by file_chunk_id
+DROP INDEX IF EXISTS idx_embeddings_file_chunk_id;
+
+-- ============================================================================
+-- MIGRATION COMPLETE
+-- ============================================================================
+-- Next step: python migrate_embeddings.py --workers 4 --batch-size 64
+-- ============================================================================
@@ -73,7 +73,9 @@ create table if not exists embeddings (
   message_id uuid references messages(id) on delete cascade,
   vector vector(384), -- 384 dimensions for Sentence Transformers
   content_type text not null, -- 'file_chunk' or 'message'
-  created_at timestamptz default now()
+  created_at timestamptz default now(),
+  -- conflict target for bulk upserts (migrate_embeddings.py)
+  constraint embeddings_file_chunk_id_content_type_key unique (file_chunk_id, content_type)
 );
 
 -- file_permissions for admin file access control
@@ -87,11 +89,16 @@ create table if not exists file_permissions (
 );
 
 -- Create indexes for better performance
-create index if not exists idx_files_user_id on files(user_id);
-create index if not exists idx_files_upload_status on files(upload_status);
+-- Admin file listing: keyset pagination on (created_at, id), newest first,
+-- optionally filtered by status, user or type (tools/admin_tools.get_all_files).
+-- The filtered indexes lead with the filter column, so they also serve plain
+-- lookups by user_id / upload_status.
+create index if not exists idx_files_created_at_id on files(created_at desc, id desc);
+create index if not exists idx_files_status_created_at_id on files(upload_status, created_at desc, id desc);
+create index if not exists idx_files_user_created_at_id on files(user_id, created_at desc, id desc);
+create index if not exists idx_files_type_created_at_id on files(file_type, created_at desc, id desc);
 create index if not exists idx_file_chunks_file_id on file_chunks(file_id);
 create index if not exists idx_file_chunks_content_fts on file_chunks using gin(to_tsvector('english', content));
-create index if not exists idx_embeddings_file_chunk_id on embeddings(file_chunk_id);
 create index if not exists idx_embeddings_message_id on embeddings(message_id);
 create index if not exists idx_embeddings_content_type on embeddings(content_type);
 
@@ -169,6 +176,128 @@ as $$
   limit match_count;
 $$;
 
+-- One page of a user's chunk embeddings for the per-user vector cache (see db/user_chunk_vectors.sql)
+create or replace function public.user_chunk_vectors(
+  user_uuid uuid,
+  after_id uuid default null,
+  page_size int default 1000
+)
+returns table (
+  id uuid,
+  content text,
+  page_number int,
+  file_id uuid,
+  vector vector(384)
+)
+language sql
+stable
+as $$
+  select fc.id,
+         fc.content,
+         fc.page_number,
+         fc.file_id,
+         e.vector
+  from public.embeddings e
+  join public.file_chunks fc on fc.id = e.file_chunk_id
+  join public.files f on f.id = fc.file_id
+  where e.content_type = 'file_chunk'
+    and f.user_id = user_uuid
+    and (after_id is null or fc.id > after_id)
+  order by fc.id
+  limit page_size;
+$$;
+
+-- Admin dashboard statistics in a single round-trip (see db/admin_system_stats.sql)
+-- Throughput figures filter on created_at
+create index if not exists idx_messages_created_at on messages(created_at);
+create index if not exists idx_file_chunks_created_at on file_chunks(created_at);
+
+-- Planner row estimate for a table; null when the table has never been analyzed
+create or replace function public.estimated_row_count(table_name regclass)
+returns bigint
+language sql
+stable
+as $$
+  select case when c.reltuples < 0 then null else c.reltuples::bigint end
+  from pg_class c
+  where c.oid = table_name;
+$$;
+
+-- use_estimates: read the large tables (messages, file_chunks, embeddings)
+-- from planner statistics instead of scanning them
+create or replace function public.admin_system_stats(use_estimates boolean default false)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  message_count bigint;
+  chunk_count bigint;
+  embedding_count bigint;
+begin
+  if use_estimates then
+    message_count := public.estimated_row_count('public.messages');
+    chunk_count := public.estimated_row_count('public.file_chunks');
+    embedding_count := public.estimated_row_count('public.embeddings');
+  end if;
+  if message_count is null then
+    select count(*) into message_count from public.messages;
+  end if;
+  if chunk_count is null then
+    select count(*) into chunk_count from public.file_chunks;
+  end if;
+  if embedding_count is null then
+    select count(*) into embedding_count from public.embeddings;
+  end if;
+
+  return jsonb_build_object(
+    'total_users', (select count(*) from public.users),
+    'total_files', (select count(*) from public.files),
+    'processed_files', (select count(*) from public.files where upload_status = 'processed'),
+    'processing_files', (select count(*) from public.files where upload_status in ('uploaded', 'processing')),
+    'failed_files', (select count(*) from public.files where upload_status = 'failed'),
+    'total_messages', message_count,
+    'total_chunks', chunk_count,
+    'total_embeddings', embedding_count,
+    'throughput', jsonb_build_object(
+      'files_processed_last_hour', (
+        select count(*) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '1 hour'),
+      'files_processed_last_24h', (
+        select count(*) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '24 hours'),
+      'bytes_ingested_last_24h', (
+        select coalesce(sum(file_size), 0) from public.files
+        where upload_status = 'processed' and updated_at > now() - interval '24 hours'),
+      'chunks_ingested_last_24h', (
+        select count(*) from public.file_chunks
+        where created_at > now() - interval '24 hours'),
+      'messages_last_24h', (
+        select count(*) from public.messages
+        where created_at > now() - interval '24 hours')
+    ),
+    'storage', jsonb_build_object(
+      'uploaded_file_bytes', (select coalesce(sum(file_size), 0) from public.files),
+      'files_table_bytes', pg_total_relation_size('public.files'),
+      'file_chunks_table_bytes', pg_total_relation_size('public.file_chunks'),
+      'embeddings_table_bytes', pg_total_relation_size('public.embeddings'),
+      'messages_table_bytes', pg_total_relation_size('public.messages')
+    ),
+    'estimated', use_estimates,
+    'generated_at', now()
+  );
+end;
+$$;
+
+comment on function public.admin_system_stats(boolean) is
+'All admin dashboard statistics in a single call; use_estimates reads large tables from planner statistics';
+
+-- Only the API (service role) may call these: they expose table sizes and totals
+revoke execute on function public.estimated_row_count(regclass) from public, anon, authenticated;
+revoke execute on function public.admin_system_stats(boolean) from public, anon, authenticated;
+grant execute on function public.estimated_row_count(regclass) to service_role;
+grant execute on function public.admin_system_stats(boolean) to service_role;
+
 -- Add comments for documentation
 comment on function public.match_file_chunks(vector(384), int, uuid) is 
 'Semantic vector similarity search using 384-dimensional embeddings from Sentence Transformers';
@@ -176,6 +305,9 @@ comment on function public.match_file_chunks(vector(384), int, uuid) is
 comment on function public.keyword_search_chunks(text, uuid, int) is 
 'Full-text keyword search for hybrid search implementation';
 
+comment on function public.user_chunk_vectors(uuid, uuid, int) is
+'One page of a user''s chunk embeddings (ordered by chunk id) for the per-user vector cache';
+
 -- ============================================================================
 -- SCHEMA SETUP COMPLETE
 -- ============================================================================
@@ -0,0 +1,42 @@
+-- ============================================================================
+-- USER CHUNK VECTORS
+-- ============================================================================
+-- All of one user's file-chunk embeddings, for the in-process per-user vector
+-- cache (vector_cache.py). Keyset-paginated on the chunk id so a large
+-- library is read in pages below PostgREST's max-rows limit.
+-- Included in schema_384_fresh.sql; run this file on existing databases.
+-- Safe to run more than once.
+-- ============================================================================
+
+create or replace function public.user_chunk_vectors(
+  user_uuid uuid,
+  after_id uuid default null,
+  page_size int default 1000
+)
+returns table (
+  id uuid,
+  content text,
+  page_number int,
+  file_id uuid,
+  vector vector(384)
+)
+language sql
+stable
+as $$
+  select fc.id,
+         fc.content,
+         fc.page_number,
+         fc.file_id,
+         e.vector
+  from public.embeddings e
+  join public.file_chunks fc on fc.id = e.file_chunk_id
+  join public.files f on f.id = fc.file_id
+  where e.content_type = 'file_chunk'
+    and f.user_id = user_uuid
+    and (after_id is null or fc.id > after_id)
+  order by fc.id
+  limit page_size;
+$$;
+
+comment on function public.user_chunk_vectors(uuid, uuid, int) is
+'One page of a user''s chunk embeddings (ordered by chunk id) for the per-user vector cache';
@@ -0,0 +1,116 @@
+"""
+End-to-end request deadlines for the chat pipeline
+Each stage checks the remaining budget: optional stages are skipped when it runs
+low, mandatory stages fail fast with DeadlineExceeded
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, Callable, Optional
+
+# starlette's, which fastapi.concurrency re-exports, without importing all of fastapi
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from profiler import profile_stage
+
+# Total time budget for one /mcp/query request
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+# Optional stages (re-ranking, UI context, query expansion) only run with at least this much left
+OPTIONAL_STAGE_MIN_REMAINING = float(os.getenv("OPTIONAL_STAGE_MIN_REMAINING", "20"))
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A mandatory stage could not finish within the request deadline"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, budget: float = REQUEST_DEADLINE_SECONDS):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows_optional(self, stage: str, min_remaining: float = OPTIONAL_STAGE_MIN_REMAINING) -> bool:
+        """True if an optional stage may run; records a skip otherwise"""
+        if self.remaining() >= min_remaining:
+            return True
+        metrics.increment("chat_stage_skipped_total", stage=stage)
+        return False
+
+    def check(self, stage: str) -> None:
+        """Raise DeadlineExceeded if the budget is already spent before a mandatory stage"""
+        if self.expired():
+            metrics.increment("chat_stage_timeouts_total", stage=stage)
+            raise DeadlineExceeded(stage)
+
+
+def start_deadline(budget: float = REQUEST_DEADLINE_SECONDS) -> Deadline:
+    """Start a deadline for the current request (visible to threads started via run_stage)"""
+    deadline = Deadline(budget)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def optional_stage_allowed(stage: str) -> bool:
+    """For code below the request handler: may this optional stage run?"""
+    deadline = current_deadline()
+    return deadline is None or deadline.allows_optional(stage)
+
+
+def remaining_seconds(default: Optional[float] = None) -> Optional[float]:
+    deadline = current_deadline()
+    return deadline.remaining() if deadline else default
+
+
+async def run_stage(stage: str, fn: Callable, *args, optional: bool = False, default: Any = None, **kwargs) -> Any:
+    """
+    Run a blocking pipeline stage in the threadpool under the request deadline.
+
+    Optional stages return `default` when skipped, timed out or failed; mandatory
+    stages raise DeadlineExceeded on timeout. The request's context (including the
+    deadline) is copied into the worker thread.
+    """
+    fn = profile_stage(stage, fn)
+    deadline = current_deadline()
+    if deadline is None:
+        with metrics.span(stage):
+            return await run_in_threadpool(fn, *args, **kwargs)
+
+    if optional and not deadline.allows_optional(stage):
+        return default
+    deadline.check(stage)
+
+    context = contextvars.copy_context()
+    with metrics.span(stage):
+        try:
+            return await asyncio.wait_for(
+                run_in_threadpool(context.run, fn, *args, **kwargs),
+                timeout=deadline.remaining()
+            )
+        except asyncio.TimeoutError:
+            metrics.increment("chat_stage_timeouts_total", stage=stage)
+            if optional:
+                return default
+            raise DeadlineExceeded(stage)
+        except Exception:
+            if optional:
+                metrics.increment("chat_stage_errors_total", stage=stage)
+                return default
+            raise
@@ -1,26 +1,49 @@
 """
 Enhanced embedding generation using Sentence Transformers
 Provides semantic understanding for better RAG retrieval
+
+Embeddings stay float32 ndarrays of unit-normalised rows inside the server
+(generate_embedding_array / generate_embeddings_array, similarity_matrix);
+to_pgvector turns them into pgvector text only where they are sent to
+Supabase. generate_embedding / generate_embeddings_batch return lists for
+scripts that need plain Python values.
 """
 
-from typing import List, Optional
+import os
+from typing import TYPE_CHECKING, Any, List, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer, CrossEncoder
 import logging
 
+# sentence-transformers (and torch/transformers behind it) is imported on first
+# use in the model getters, so importing this module stays cheap
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+
 logger = logging.getLogger(__name__)
 
 # Global model instances (loaded once)
-_embedding_model: Optional[SentenceTransformer] = None
-_reranker_model: Optional[CrossEncoder] = None
+_embedding_model: Optional["SentenceTransformer"] = None
+_reranker_model: Optional["CrossEncoder"] = None
 
 # Model configuration
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'  # 384 dimensions, fast and accurate
 RERANKER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
 EMBEDDING_DIM = 384
 
+# Nine significant digits round-trip every float32 exactly, as pgvector stores them
+_PGVECTOR_FORMAT = '[' + ','.join(['%.9g'] * EMBEDDING_DIM) + ']'
+
+# Unix socket of a shared model server (model_server.py); when set, embedding and
+# re-ranking run there instead of loading the models in every worker process
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS")
+
+
+def _model_server():
+    from model_server import get_client
+    return get_client(MODEL_SERVER_ADDRESS)
 
-def get_embedding_model() -> SentenceTransformer:
+
+def get_embedding_model() -> "SentenceTransformer":
     """
     Get or initialize the embedding model (singleton pattern)
     """
@@ -29,6 +52,7 @@ def get_embedding_model() -> SentenceTransformer:
     if _embedding_model is None:
         try:
             logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
+            from sentence_transformers import SentenceTransformer
             _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
             logger.info("Embedding model loaded successfully")
         except Exception as e:
@@ -38,7 +62,7 @@ def get_embedding_model() -> SentenceTransformer:
     return _embedding_model
 
 
-def get_reranker_model() -> CrossEncoder:
+def get_reranker_model() -> "CrossEncoder":
     """
     Get or initialize the re-ranker model (singleton pattern)
     """
@@ -47,6 +71,7 @@ def get_reranker_model() -> CrossEncoder:
     if _reranker_model is None:
         try:
             logger.info(f"Loading re-ranker model: {RERANKER_MODEL_NAME}")
+            from sentence_transformers import CrossEncoder
             _reranker_model = CrossEncoder(RERANKER_MODEL_NAME)
             logger.info("Re-ranker model loaded successfully")
         except Exception as e:
@@ -56,7 +81,7 @@ def get_reranker_model() -> CrossEncoder:
     return _reranker_model
 
 
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding_array(text: str) -> np.ndarray:
     """
     Generate semantic embedding for given text
     
@@ -64,13 +89,16 @@ def generate_embedding(text: str) -> List[float]:
         text: Input text to embed
         
     Returns:
-        List of 384 floats representing the embedding
+        float32 array of shape (384,), unit length (zeros on failure)
     """
     if not text or not text.strip():
         logger.warning("Empty text provided for embedding")
-        return [0.0] * EMBEDDING_DIM
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
     
     try:
+        if MODEL_SERVER_ADDRESS:
+            return np.asarray(_model_server().embed([text])[0], dtype=np.float32)
+        
         model = get_embedding_model()
         
         # Generate embedding
@@ -80,15 +108,15 @@ def generate_embedding(text: str) -> List[float]:
             normalize_embeddings=True  # Normalize for cosine similarity
         )
         
-        return embedding.tolist()
+        return embedding.astype(np.float32, copy=False)
         
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
         # Return zero vector as fallback
-        return [0.0] * EMBEDDING_DIM
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
 
 
-def generate_embeddings_batch(texts: List[str], batch_size: int = 32) -> List[List[float]]:
+def generate_embeddings_array(texts: List[str], batch_size: int = 32) -> np.ndarray:
     """
     Generate embeddings for multiple texts efficiently
     
@@ -97,12 +125,15 @@ def generate_embeddings_batch(texts: List[str], batch_size: int = 32) -> List[Li
         batch_size: Number of texts to process at once
         
     Returns:
-        List of embeddings
+        float32 array of shape (len(texts), 384), one unit-length row per text
     """
     if not texts:
-        return []
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
     
     try:
+        if MODEL_SERVER_ADDRESS:
+            return np.asarray(_model_server().embed(texts), dtype=np.float32)
+        
         model = get_embedding_model()
         
         # Generate embeddings in batches
@@ -114,12 +145,22 @@ def generate_embeddings_batch(texts: List[str], batch_size: int = 32) -> List[Li
             show_progress_bar=len(texts) > 100  # Show progress for large batches
         )
         
-        return [emb.tolist() for emb in embeddings]
+        return embeddings.astype(np.float32, copy=False)
         
     except Exception as e:
         logger.error(f"Error generating batch embeddings: {e}")
         # Return zero vectors as fallback
-        return [[0.0] * EMBEDDING_DIM for _ in texts]
+        return np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+
+
+def generate_embedding(text: str) -> List[float]:
+    """generate_embedding_array as a list of floats"""
+    return generate_embedding_array(text).tolist()
+
+
+def generate_embeddings_batch(texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    """generate_embeddings_array as lists of floats"""
+    return generate_embeddings_array(texts, batch_size).tolist()
 
 
 def rerank_results(query: str, documents: List[str], top_k: Optional[int] = None) -> List[tuple]:
@@ -138,13 +179,16 @@ def rerank_results(query: str, documents: List[str], top_k: Optional[int] = None
         return []
     
     try:
-        reranker = get_reranker_model()
-        
-        # Create query-document pairs
-        pairs = [(query, doc) for doc in documents]
-        
-        # Get relevance scores
-        scores = reranker.predict(pairs)
+        if MODEL_SERVER_ADDRESS:
+            scores = _model_server().rerank(query, documents)
+        else:
+            reranker = get_reranker_model()
+            
+            # Create query-document pairs
+            pairs = [(query, doc) for doc in documents]
+            
+            # Get relevance scores
+            scores = reranker.predict(pairs)
         
         # Create (index, score) tuples and sort by score
         ranked = [(idx, float(score)) for idx, score in enumerate(scores)]
@@ -162,7 +206,38 @@ def rerank_results(query: str, documents: List[str], top_k: Optional[int] = None
         return [(idx, 0.5) for idx in range(len(documents))]
 
 
-def compute_similarity(embedding1: List[float], embedding2: List[float]) -> float:
+def normalize_rows(vectors: Any) -> np.ndarray:
+    """float32 copy of a vector or matrix with every row scaled to unit length (zero rows stay zero)"""
+    matrix = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def similarity_matrix(queries: Any, documents: Any, normalized: bool = True) -> np.ndarray:
+    """
+    Cosine similarity of every query with every document in one matrix product
+    
+    Args:
+        queries: (q, dim) or (dim,) embeddings
+        documents: (d, dim) embeddings
+        normalized: Inputs are already unit length, as the model outputs are;
+                    pass False to normalise them first
+        
+    Returns:
+        float32 array of shape (q, d) ((d,) for a single query vector)
+    """
+    if normalized:
+        queries = np.asarray(queries, dtype=np.float32)
+        documents = np.asarray(documents, dtype=np.float32)
+    else:
+        queries = normalize_rows(queries)
+        documents = normalize_rows(documents)
+    return queries @ documents.T
+
+
+def compute_similarity(embedding1: Any, embedding2: Any) -> float:
     """
     Compute cosine similarity between two embeddings
     
@@ -171,29 +246,50 @@ def compute_similarity(embedding1: List[float], embedding2: List[float]) -> floa
         embedding2: Second embedding vector
         
     Returns:
-        Similarity score between 0 and 1
+        Similarity score between -1 and 1 (0.0 if either vector is zero)
     """
     try:
-        # Convert to numpy arrays
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
-        
-        # Compute cosine similarity
-        similarity = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
-        
-        return float(similarity)
+        vec1 = np.asarray(embedding1, dtype=np.float32)
+        vec2 = np.asarray(embedding2, dtype=np.float32)
+        norms = float(np.linalg.norm(vec1)) * float(np.linalg.norm(vec2))
+        if norms == 0.0:
+            return 0.0
+        return float(np.dot(vec1, vec2)) / norms
         
     except Exception as e:
         logger.error(f"Error computing similarity: {e}")
         return 0.0
 
 
+def to_pgvector(vector: Any) -> str:
+    """pgvector text literal '[0.1,0.2,...]' for PostgREST inserts and RPC arguments"""
+    values = np.asarray(vector, dtype=np.float32).ravel().tolist()
+    if len(values) == EMBEDDING_DIM:
+        return _PGVECTOR_FORMAT % tuple(values)
+    return '[' + ','.join('%.9g' % value for value in values) + ']'
+
+
+def parse_vector(value: Any) -> np.ndarray:
+    """pgvector arrives from PostgREST as text '[0.1,0.2,...]'"""
+    if isinstance(value, str):
+        return np.array(value.strip('[]').split(','), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
 # Preload models on module import (optional, for faster first request)
 def preload_models():
     """
     Preload models to avoid cold start delay
     Call this during application startup
     """
+    if MODEL_SERVER_ADDRESS:
+        # The model server holds the models; just check it is reachable
+        try:
+            _model_server().ping()
+            logger.info(f"Using shared model server at {MODEL_SERVER_ADDRESS}")
+        except Exception as e:
+            logger.warning(f"Model server not reachable: {e}")
+        return
     try:
         logger.info("Preloading embedding and re-ranking models...")
         get_embedding_model()
@@ -0,0 +1,135 @@
+"""
+Structured, level-gated logging for the MCP server
+Debug payloads (query results, chat history) are formatted lazily, sampled and
+size-truncated, so a server running at INFO pays nothing for them
+"""
+
+import json
+import logging
+import os
+import random
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for humans, "json" for log pipelines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Fraction of debug payload records that are actually emitted
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# Upper bound on the rendered size of one payload
+LOG_MAX_PAYLOAD_CHARS = int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "500"))
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+
+def _shorten(value: Any, limit: int) -> str:
+    """
+    Render value in at most ~limit characters without rendering all of it:
+    strings are sliced and containers are rendered item by item until the budget runs out.
+    """
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return repr(value)
+        return repr(value[:limit]) + f"... [{len(value) - limit} more chars]"
+
+    if isinstance(value, dict):
+        items, opening, closing = list(value.items()), "{", "}"
+
+        def render(item, budget):
+            return f"{item[0]!r}: {_shorten(item[1], budget)}"
+    elif isinstance(value, (list, tuple)):
+        items, opening, closing = value, "[", "]"
+        render = _shorten
+    else:
+        text = repr(value)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+    parts, used = [], 0
+    for index, item in enumerate(items):
+        if used >= limit:
+            parts.append(f"... [{len(items) - index} more items]")
+            break
+        part = render(item, max(20, limit - used))
+        parts.append(part)
+        used += len(part) + 2
+    return opening + ", ".join(parts) + closing
+
+
+class Truncated:
+    """Lazy, size-bounded rendering of a payload for use as a %s log argument"""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: int = LOG_MAX_PAYLOAD_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return _shorten(self.value, self.limit)
+
+
+class MessagesSummary:
+    """Lazy one-line summary of a list of chat messages (count, size, roles)"""
+
+    __slots__ = ('messages',)
+
+    def __init__(self, messages: Optional[list]):
+        self.messages = messages or []
+
+    def __str__(self) -> str:
+        chars = sum(len(m.get('content') or '') for m in self.messages)
+        roles = {}
+        for message in self.messages:
+            roles[message.get('role')] = roles.get(message.get('role'), 0) + 1
+        return f"{len(self.messages)} messages, {chars} chars, roles={roles}"
+
+
+def truncated(value: Any, limit: int = LOG_MAX_PAYLOAD_CHARS) -> Truncated:
+    return Truncated(value, limit)
+
+
+def summarize_messages(messages: Optional[list]) -> MessagesSummary:
+    return MessagesSummary(messages)
+
+
+def debug_sampled(logger: logging.Logger, msg: str, *args, sample_rate: Optional[float] = None, **kwargs) -> None:
+    """
+    logger.debug for hot paths: returns before doing anything (including
+    sampling) unless DEBUG is enabled, then emits only a sample of records.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = LOG_DEBUG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logger.debug(msg, *args, stacklevel=2, **kwargs)
@@ -1,7 +1,14 @@
 import os
 import sys
+import asyncio
+import hmac
+import math
+import time
 import logging
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
@@ -11,21 +18,31 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.'))
 
 from tools import user_tools, chat_tools, file_tools, admin_tools
 from tools import site_tools
+import metrics
 from ai_client import generate_from_prompt
-from supabase_client import init_supabase
+from supabase_client import init_supabase, close_supabase
+from message_writer import message_writer, build_message
+from answer_cache import answer_cache, knowledge_hash
+from deadline import DeadlineExceeded, run_stage, start_deadline
+from log_utils import configure_logging, debug_sampled, summarize_messages, truncated
+from profiler import profile_stage, request_profiler
+from warmup import WARMUP_MODE, mark_ready, run_phase, run_warmup, startup_state
 
 class Settings(BaseSettings):
     GEMINI_API_KEY: str
     SUPABASE_URL: str
     SUPABASE_SERVICE_ROLE_KEY: str
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
+    # When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>";
+    # when unset it is only served to clients on the loopback interface
+    METRICS_TOKEN: str | None = None
 
     class Config:
         env_file = ".env"
 
 settings = Settings()
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -33,9 +50,52 @@ app = FastAPI()
 # Security scheme
 security = HTTPBearer()
 
+metrics.registry.describe("http_request_duration_seconds", "HTTP request latency by route")
+metrics.registry.describe("http_requests_total", "HTTP requests by route and status")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-endpoint latency histogram plus a Server-Timing header with the request's spans"""
+    trace = metrics.start_trace()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if trace:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in trace
+            )
+        return response
+    finally:
+        # Route templates (not raw paths) keep label cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - start,
+                        method=request.method, route=path)
+        metrics.increment("http_requests_total", method=request.method, route=path, status=str(status))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request, authorization: str | None = Header(None)):
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+        if not hmac.compare_digest((authorization or "").encode(), expected):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif not request.client or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="Set METRICS_TOKEN to scrape metrics remotely")
+    return PlainTextResponse(
+        metrics.registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.on_event("startup")
 async def startup_event():
-    init_supabase(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    def supabase_phase():
+        if init_supabase(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY) is None:
+            raise RuntimeError("Supabase client not initialized")
+
+    run_phase(startup_state, "supabase_client", supabase_phase)
+    message_writer.start()
     # Load UI awareness from frontend (optional - frontend may not be on same server)
     try:
         site_tools.load_site_facts()
@@ -46,6 +106,20 @@ async def startup_event():
         logger.info(f"Frontend files not available (expected in production): {e}")
         logger.info("Using comprehensive knowledge base instead")
 
+    # Models, knowledge indexes and connection pools; /ready reports 503 until done
+    if WARMUP_MODE == "off":
+        mark_ready(startup_state)
+    elif WARMUP_MODE == "blocking":
+        await run_in_threadpool(run_warmup, startup_state)
+    else:
+        app.state.warmup_task = asyncio.create_task(run_in_threadpool(run_warmup, startup_state))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Persist chat messages still waiting in the write-behind queue
+    await run_in_threadpool(message_writer.flush)
+    await close_supabase()
+
 class ChatRequest(BaseModel):
     user_id: str
     message: str
@@ -57,6 +131,11 @@ class AdminLoginRequest(BaseModel):
     email: str
     password: str
 
+class ProfileArmRequest(BaseModel):
+    count: int = 1
+    endpoint: str | None = None
+    user_id: str | None = None
+
 class AdminCreateRequest(BaseModel):
     email: str
     password: str
@@ -74,9 +153,20 @@ async def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends
 def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+def readiness_check():
+    """Load balancer readiness: 503 until warm startup has finished"""
+    state = startup_state.snapshot()
+    return JSONResponse(state, status_code=200 if state['ready'] else 503)
+
 @app.post("/mcp/query")
-async def mcp_query(request: ChatRequest):
+async def mcp_query(request: ChatRequest, background_tasks: BackgroundTasks,
+                    x_profile_token: str | None = Header(None)):
+    received_at = datetime.now(timezone.utc)
+    start_deadline()
     user_id = request.user_id
+    profile = request_profiler.start("/mcp/query", user_id, x_profile_token)
+    profile_status = "error"
     user_message = request.message
     user_name = request.user_name
     user_email = request.user_email
@@ -85,19 +175,22 @@ async def mcp_query(request: ChatRequest):
     try:
         # 1. Get or create user profile with name/email
         logger.info("Getting/creating user profile...")
-        logger.info(f"Calling get_user_profile with: firebase_uid={user_id}, email={user_email}, name={user_name}")
-        user = user_tools.get_user_profile(user_id, user_email, user_name)
-        logger.info(f"User profile result: {user}")
+        user = await run_stage("user_lookup", user_tools.get_user_profile, user_id, user_email, user_name)
+        debug_sampled(logger, "User profile: %s", truncated(user))
 
         # 2. Get chat history
         logger.info("Getting chat history...")
-        chat_history = chat_tools.get_chat_history(user_id)
-        logger.info(f"Chat history: {chat_history}")
-        print(f"DEBUG: MCP server returning chat history: {chat_history}")
+        chat_history = await run_stage("history", chat_tools.get_chat_history, user_id, user=user)
+        debug_sampled(logger, "Chat history for %s: %s", user_id, summarize_messages(chat_history))
 
-        # 3. Search for relevant file content
+        # 3. Search for relevant file content (re-ranking and query expansion are
+        # skipped inside search_similar_chunks when the deadline runs low)
         logger.info("Searching for relevant file content...")
-        file_context = file_tools.search_similar_chunks(user_message, user_id, limit=50)
+        query_embedding = await run_stage("embedding", file_tools.generate_embedding_array, user_message)
+        file_context = await run_stage(
+            "retrieval", file_tools.search_similar_chunks,
+            user_message, user_id, limit=50, query_embedding=query_embedding, conversation_context=chat_history
+        )
         logger.info(f"Found {len(file_context)} relevant file chunks")
 
         # 3.5 Add UI awareness as context (knowledge base + optional frontend scanning)
@@ -111,34 +204,56 @@ async def mcp_query(request: ChatRequest):
             site_context.append({ 'content': website_knowledge })
         
         # Optionally add scanned UI context if available
-        try:
-            ui_context = site_tools.get_ui_context()
-            if ui_context:
-                site_context.append({ 'content': ui_context })
-        except Exception as e:
-            logger.debug(f"UI context not available: {e}")
-
-        # 4. Generate response with user context, file context, and site facts
-        logger.info("Generating AI response...")
-        merged_context = (file_context or []) + site_context
-        assistant_response = generate_from_prompt(user_message, chat_history, user_name, merged_context)
-        logger.info(f"Assistant response generated successfully")
-
-        # 5. Store messages
-        logger.info("Storing user message...")
-        chat_tools.store_message(user_id, "user", user_message)
-        logger.info("Storing assistant message...")
-        chat_tools.store_message(user_id, "assistant", assistant_response)
-        logger.info("Messages stored successfully")
+        ui_context = await run_stage("ui_context", site_tools.get_ui_context, optional=True)
+        if ui_context:
+            site_context.append({ 'content': ui_context })
+
+        # 4. Website FAQ questions (no file context) asked at the start of a conversation
+        # may reuse a cached answer; with history the answer depends on the conversation
+        # (and retrieval used it), so it is neither looked up nor shared
+        kb_hash = knowledge_hash(website_knowledge, ui_context)
+        cacheable = not file_context and not chat_history
+        assistant_response = None
+        if cacheable:
+            assistant_response = answer_cache.lookup(query_embedding, kb_hash)
+            if assistant_response:
+                logger.info("Answered from semantic answer cache")
+
+        # 4.5 Generate response with user context, file context, and site facts
+        if assistant_response is None:
+            logger.info("Generating AI response...")
+            merged_context = (file_context or []) + site_context
+            assistant_response = await run_stage(
+                "generation", generate_from_prompt, user_message, chat_history, user_name, merged_context
+            )
+            logger.info(f"Assistant response generated successfully")
+            # Personalised answers are not shared with other users
+            personalised = bool(user_name) and user_name.lower() in assistant_response.lower()
+            if cacheable and not personalised:
+                answer_cache.store(user_message, query_embedding, assistant_response, kb_hash)
+
+        # 5. Store both messages in one bulk insert after the response is sent
+        # (outside the request deadline; the message writer retries on its own)
+        background_tasks.add_task(chat_tools.queue_messages, [
+            build_message(user['id'], "user", user_message, created_at=received_at),
+            build_message(user['id'], "assistant", assistant_response)
+        ])
 
         # 6. Return response
+        profile_status = "ok"
         return {"reply": assistant_response}
+    except DeadlineExceeded as e:
+        logger.error(f"Chat request for user {user_id} timed out during {e.stage}")
+        raise HTTPException(status_code=504, detail=f"The assistant took too long to respond (stage: {e.stage}). Please try again.")
     except Exception as e:
         logger.error(f"Error processing chat request for user {user_id}: {str(e)}")
         logger.error(f"Error type: {type(e).__name__}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if profile:
+            await run_in_threadpool(request_profiler.finish, profile, profile_status, metrics.current_trace())
 
 @app.get("/mcp/history")
 async def mcp_history(user_id: str):
@@ -171,7 +286,7 @@ async def mcp_clear_chat(user_id: str):
 
 # File Upload Endpoints
 @app.post("/mcp/upload-pdf")
-async def upload_pdf(user_id: str, file: UploadFile = File(...)):
+async def upload_pdf(user_id: str, file: UploadFile = File(...), x_profile_token: str | None = Header(None)):
     logger.info(f"Uploading file for user {user_id}")
     
     # Supported MIME types
@@ -210,21 +325,27 @@ async def upload_pdf(user_id: str, file: UploadFile = File(...)):
     if len(file_content) > 50 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File size too large. Maximum 50MB allowed")
     
+    profile = request_profiler.start("/mcp/upload-pdf", user_id, x_profile_token)
+    profile_status = "error"
     try:
         # Import file tools
         from tools.file_tools import upload_pdf_file
         
         # Upload file
-        result = upload_pdf_file(
+        result = profile_stage("upload", upload_pdf_file)(
             user_id=user_id, 
             filename=file.filename, 
             file_content=file_content
         )
         
+        profile_status = "ok"
         return result
     except Exception as e:
         logger.error(f"Error uploading file for user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if profile:
+            await run_in_threadpool(request_profiler.finish, profile, profile_status, metrics.current_trace())
 
 @app.get("/mcp/files")
 async def get_user_files(user_id: str):
@@ -261,15 +382,29 @@ async def search_files(user_id: str, query: str):
 
 # Admin Endpoints
 @app.post("/admin/login")
-async def admin_login(request: AdminLoginRequest):
+async def admin_login(request: AdminLoginRequest, http_request: Request):
     logger.info(f"Admin login attempt for {request.email}")
+    client_ip = http_request.client.host if http_request.client else None
+    retry_after = admin_tools.check_login_rate(request.email, client_ip)
+    if retry_after:
+        logger.warning(f"Admin login rate limited for {request.email} from {client_ip}")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
     try:
-        result = admin_tools.authenticate_admin(request.email, request.password)
+        # bcrypt runs on admin_tools' dedicated pool; this thread only waits for it
+        result = await run_in_threadpool(admin_tools.authenticate_admin, request.email, request.password)
         if result['success']:
             logger.info(f"Admin login successful for {request.email}")
             return result
+        elif result.get('busy'):
+            raise HTTPException(status_code=503, detail="Login temporarily unavailable, try again shortly")
         else:
             raise HTTPException(status_code=401, detail=result['error'])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in admin login: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -278,25 +413,73 @@ async def admin_login(request: AdminLoginRequest):
 async def create_admin(request: AdminCreateRequest):
     logger.info(f"Creating admin user: {request.email}")
     try:
-        result = admin_tools.create_admin_user(request.email, request.password, request.name)
+        result = await run_in_threadpool(admin_tools.create_admin_user, request.email, request.password, request.name)
         if result['success']:
             logger.info(f"Admin user created successfully: {request.email}")
             return result
         else:
             raise HTTPException(status_code=400, detail=result['error'])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating admin user: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/admin/logout")
+async def admin_logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if not admin_tools.revoke_admin_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid or expired admin token")
+    return {"message": "Logged out successfully"}
+
+@app.post("/admin/users/{admin_id}/deactivate")
+async def deactivate_admin(admin_id: str, admin: dict = Depends(verify_admin_token)):
+    logger.info(f"Admin {admin['email']} deactivating admin user: {admin_id}")
+    try:
+        if admin_tools.deactivate_admin_user(admin_id):
+            return {"message": "Admin user deactivated successfully"}
+        else:
+            raise HTTPException(status_code=404, detail="Admin user not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deactivating admin user: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/admin/files")
-async def get_all_files(limit: int = 100, offset: int = 0, admin: dict = Depends(verify_admin_token)):
+async def get_all_files(
+    limit: int = 100,
+    cursor: str | None = None,
+    status: str | None = None,
+    user_id: str | None = None,
+    file_type: str | None = None,
+    count: str = "exact",
+    include_total: bool = True,
+    admin: dict = Depends(verify_admin_token)
+):
     logger.info(f"Admin {admin['email']} fetching all files")
+    if count not in admin_tools.ADMIN_FILES_COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count must be one of {', '.join(admin_tools.ADMIN_FILES_COUNT_MODES)}")
+    if cursor:
+        try:
+            admin_tools.decode_files_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        result = admin_tools.get_all_files(limit, offset)
+        result = admin_tools.get_all_files(
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            user_id=user_id,
+            file_type=file_type,
+            count_mode=count,
+            include_total=include_total
+        )
         if result['success']:
             return result
         else:
             raise HTTPException(status_code=500, detail=result['error'])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching files for admin: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -310,10 +493,33 @@ async def get_file_details(file_id: str, admin: dict = Depends(verify_admin_toke
             return result
         else:
             raise HTTPException(status_code=404, detail=result['error'])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching file details for admin: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/admin/files/{file_id}/chunks")
+async def get_file_chunks(
+    file_id: str,
+    after_index: int = -1,
+    limit: int = 50,
+    q: str | None = None,
+    admin: dict = Depends(verify_admin_token)
+):
+    logger.info(f"Admin {admin['email']} fetching chunks for file {file_id} (after {after_index})")
+    try:
+        result = admin_tools.get_file_chunks(file_id, after_index=after_index, limit=limit, query=q)
+        if result['success']:
+            return result
+        else:
+            raise HTTPException(status_code=500, detail=result['error'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching file chunks for admin: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.delete("/admin/files/{file_id}")
 async def delete_file_admin(file_id: str, admin: dict = Depends(verify_admin_token)):
     logger.info(f"Admin {admin['email']} deleting file: {file_id}")
@@ -328,18 +534,53 @@ async def delete_file_admin(file_id: str, admin: dict = Depends(verify_admin_tok
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/admin/stats")
-async def get_system_stats(admin: dict = Depends(verify_admin_token)):
+async def get_system_stats(estimate: bool = False, refresh: bool = False, admin: dict = Depends(verify_admin_token)):
     logger.info(f"Admin {admin['email']} fetching system stats")
     try:
-        result = admin_tools.get_system_stats()
+        result = admin_tools.get_system_stats(use_estimates=estimate, refresh=refresh)
         if result['success']:
             return result
         else:
             raise HTTPException(status_code=500, detail=result['error'])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching system stats for admin: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/admin/profiles/arm")
+async def arm_profiling(request: ProfileArmRequest, admin: dict = Depends(verify_admin_token)):
+    logger.info(f"Admin {admin['email']} arming profiling for {request.count} request(s)")
+    if request.count < 1 or request.count > 100:
+        raise HTTPException(status_code=400, detail="count must be between 1 and 100")
+    if request.endpoint not in (None, "/mcp/query", "/mcp/upload-pdf"):
+        raise HTTPException(status_code=400, detail="endpoint must be /mcp/query or /mcp/upload-pdf")
+    armed = request_profiler.arm(request.count, request.endpoint, request.user_id)
+    return {"armed": armed, "pending": request_profiler.armed()}
+
+@app.get("/admin/profiles")
+async def list_profiles(admin: dict = Depends(verify_admin_token)):
+    return {"profiles": request_profiler.list_profiles(), "armed": request_profiler.armed()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin: dict = Depends(verify_admin_token)):
+    result = request_profiler.get(profile_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {k: v for k, v in result.items() if k != 'pstats'}
+
+@app.get("/admin/profiles/{profile_id}/download")
+async def download_profile(profile_id: str, admin: dict = Depends(verify_admin_token)):
+    result = request_profiler.get(profile_id)
+    if not result or not result.get('pstats'):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Loadable with pstats.Stats(path) or snakeviz
+    return Response(
+        content=result['pstats'],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
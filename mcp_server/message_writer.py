@@ -0,0 +1,193 @@
+"""
+Write-behind persistence for chat messages
+Messages are queued after the reply is sent and bulk-inserted by a background thread
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_QUEUE_MAX = int(os.getenv("MESSAGE_QUEUE_MAX", "1000"))
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "50"))
+MESSAGE_WRITE_RETRIES = int(os.getenv("MESSAGE_WRITE_RETRIES", "5"))
+MESSAGE_FLUSH_TIMEOUT = float(os.getenv("MESSAGE_FLUSH_TIMEOUT", "10"))
+
+_STOP = object()
+
+
+def build_message(user_uuid: str, role: str, content: str, created_at: Optional[datetime] = None,
+                  metadata: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Build a messages row with a client-side id and timestamp.
+
+    The id makes retried inserts idempotent and the explicit created_at keeps the
+    user message ahead of the reply even when both are inserted in one statement.
+    """
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': user_uuid,
+        'role': role,
+        'content': content,
+        'metadata': metadata,
+        'created_at': (created_at or datetime.now(timezone.utc)).isoformat()
+    }
+
+
+class MessageWriter:
+    """
+    Bounded queue drained by one background thread that bulk-inserts messages.
+
+    When the queue is full, enqueue() writes synchronously instead of dropping.
+    Rows stay visible through pending_for() until they are persisted, so a
+    follow-up question sees the previous turn even before it reaches the database.
+    """
+
+    def __init__(self, max_queued: int = MESSAGE_QUEUE_MAX, batch_size: int = MESSAGE_BATCH_SIZE,
+                 max_retries: int = MESSAGE_WRITE_RETRIES):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        self._cleared_at: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._accepting = False
+        self.written = 0
+        self.retried = 0
+        self.failed = 0
+        self.sync_writes = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._accepting = True
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, rows: List[Dict[str, Any]]) -> None:
+        """Queue rows for insertion; falls back to a synchronous write when full or stopped"""
+        if not rows:
+            return
+        self._add_pending(rows)
+        if self._accepting:
+            try:
+                self._queue.put_nowait(rows)
+                return
+            except queue.Full:
+                logger.warning("Message queue full, writing synchronously")
+        self.sync_writes += 1
+        self._write_with_retry(rows)
+
+    def pending_for(self, user_uuid: str) -> List[Dict[str, Any]]:
+        with self._pending_lock:
+            return list(self._pending.get(user_uuid, []))
+
+    def discard_pending(self, user_uuid: str) -> None:
+        """Forget unwritten rows for a user whose history was cleared, including queued ones"""
+        now = datetime.now(timezone.utc)
+        with self._pending_lock:
+            self._pending.pop(user_uuid, None)
+            self._cleared_at[user_uuid] = now.isoformat()
+            stale = (now - timedelta(minutes=10)).isoformat()
+            for cleared_user in [u for u, at in self._cleared_at.items() if at < stale]:
+                del self._cleared_at[cleared_user]
+
+    def flush(self, timeout: float = MESSAGE_FLUSH_TIMEOUT) -> bool:
+        """Stop accepting work and wait for queued rows to be written (shutdown hook)"""
+        self._accepting = False
+        if not self._thread:
+            return True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        drained = not self._thread.is_alive()
+        if not drained:
+            logger.error(f"Message writer did not drain within {timeout}s; {self._queue.qsize()} batches left")
+        return drained
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued_batches': self._queue.qsize(),
+            'written': self.written,
+            'retried': self.retried,
+            'failed': self.failed,
+            'sync_writes': self.sync_writes
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while True:
+            if stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+            else:
+                item = self._queue.get()
+            if item is _STOP:
+                stopping = True
+                continue
+            rows = list(item)
+            # Coalesce whatever else is already queued into one insert
+            while len(rows) < self.batch_size:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is _STOP:
+                    stopping = True
+                    continue
+                rows.extend(more)
+            self._write_with_retry(rows)
+
+    def _write_with_retry(self, rows: List[Dict[str, Any]]) -> None:
+        from supabase_client import store_messages
+
+        with self._pending_lock:
+            rows = [
+                row for row in rows
+                if row['created_at'] > self._cleared_at.get(row['user_id'], '')
+            ]
+        if not rows:
+            return
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with metrics.span("persistence"):
+                    store_messages(rows)
+                self.written += len(rows)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(rows)
+                    logger.error(f"Dropping {len(rows)} messages after {attempt} failed inserts: {e}")
+                    break
+                self.retried += 1
+                logger.warning(f"Message insert failed (attempt {attempt}), retrying: {e}")
+                time.sleep(min(0.2 * 2 ** (attempt - 1), 5.0))
+        self._remove_pending(rows)
+
+    def _add_pending(self, rows: List[Dict[str, Any]]) -> None:
+        with self._pending_lock:
+            for row in rows:
+                self._pending.setdefault(row['user_id'], []).append(row)
+
+    def _remove_pending(self, rows: List[Dict[str, Any]]) -> None:
+        written_ids = {row['id'] for row in rows}
+        with self._pending_lock:
+            for user_uuid in {row['user_id'] for row in rows}:
+                remaining = [r for r in self._pending.get(user_uuid, []) if r['id'] not in written_ids]
+                if remaining:
+                    self._pending[user_uuid] = remaining
+                else:
+                    self._pending.pop(user_uuid, None)
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,232 @@
+"""
+In-process metrics: counters, latency histograms and per-request spans
+No external collector needed; snapshots are served by the admin endpoints
+and /metrics renders everything in Prometheus text format
+"""
+
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers a fast cache hit up to a slow Gemini generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Recent observations kept per histogram for percentile estimates
+RESERVOIR_SIZE = 2048
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Per-bucket counts plus a window of recent values for p50/p95/p99"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=RESERVOIR_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self._recent.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        with self._lock:
+            counts = list(self.bucket_counts)
+            total = self.count
+        result, running = [], 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            result.append((bound, running))
+        result.append((math.inf, total))
+        return result
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Named metric families, each keyed by a set of label values"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, Counter]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help: str) -> None:
+        """Set the HELP text of a metric family without creating a series"""
+        with self._lock:
+            self._help[name] = help
+
+    def histogram(self, name: str, help: str = "", **labels) -> Histogram:
+        key = _label_key(labels)
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            if help:
+                self._help.setdefault(name, help)
+            if key not in family:
+                family[key] = Histogram()
+            return family[key]
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        key = _label_key(labels)
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            if help:
+                self._help.setdefault(name, help)
+            if key not in family:
+                family[key] = Counter()
+            return family[key]
+
+    def reset(self) -> None:
+        """Drop all series (HELP texts are kept); used between benchmark phases"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self, prefix: str = "") -> Dict[str, list]:
+        """JSON-friendly view of every metric whose name starts with prefix"""
+        with self._lock:
+            histograms = {n: dict(f) for n, f in self._histograms.items() if n.startswith(prefix)}
+            counters = {n: dict(f) for n, f in self._counters.items() if n.startswith(prefix)}
+        result: Dict[str, list] = {}
+        for name, family in histograms.items():
+            result[name] = [{'labels': dict(key), **hist.snapshot()} for key, hist in family.items()]
+        for name, family in counters.items():
+            result[name] = [{'labels': dict(key), 'value': counter.value} for key, counter in family.items()]
+        return result
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus text exposition (format 0.0.4).
+        Histograms are exported with buckets, _sum and _count, plus a
+        <name>_recent gauge with the p50/p95/p99 of the recent window.
+        """
+        with self._lock:
+            histograms = {n: dict(f) for n, f in self._histograms.items()}
+            counters = {n: dict(f) for n, f in self._counters.items()}
+            help_texts = dict(self._help)
+        lines: List[str] = []
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, counter in counters[name].items():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(counter.value)}")
+        for name in sorted(histograms):
+            family = histograms[name]
+            lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in family.items():
+                for bound, count in hist.cumulative_buckets():
+                    le = "+Inf" if bound == math.inf else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(hist.sum)}")
+                lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            lines.append(f"# HELP {name}_recent Quantiles of the last {RESERVOIR_SIZE} {name} observations")
+            lines.append(f"# TYPE {name}_recent gauge")
+            for key, hist in family.items():
+                for q in (0.5, 0.95, 0.99):
+                    value = hist.quantile(q)
+                    if value is not None:
+                        labels = _format_labels(key + (('quantile', str(q)),))
+                        lines.append(f"{name}_recent{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = (f'{k}="{_escape_label(v)}"' for k, v in key)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+registry = MetricsRegistry()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    registry.histogram(name, **labels).observe(value)
+
+
+def increment(name: str, amount: float = 1.0, **labels) -> None:
+    registry.counter(name, **labels).inc(amount)
+
+
+registry.describe("chat_stage_seconds", "Latency of chat pipeline stages")
+
+# Spans recorded during the current request: [(stage, seconds), ...]
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Collect spans for the current request (contexts copied from here share the list)"""
+    trace: List[Tuple[str, float]] = []
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[List[Tuple[str, float]]]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, metric: str = "chat_stage_seconds"):
+    """Time a pipeline stage into the per-stage histogram and the request trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(metric, elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
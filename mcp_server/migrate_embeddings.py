@@ -2,19 +2,160 @@
 """
 Migration script to update embeddings from hash-based (1536-dim) to semantic (384-dim)
 Run this after updating the database schema and installing sentence-transformers
+
+Embeddings are written with bulk upserts on the unique (file_chunk_id, content_type)
+constraint (see db/migration_embeddings_upsert.sql). Model inference runs in the main
+thread while a pool of writer threads upserts finished batches, so the GPU/CPU and the
+database are busy at the same time.
+
+Usage:
+    python migrate_embeddings.py [--workers 4] [--batch-size 64] [--resume-from <chunk_id>]
 """
 
 import os
 import sys
+import argparse
+import queue
+import threading
 from dotenv import load_dotenv
+from postgrest.types import ReturnMethod
 from supabase_client import init_supabase
-from embeddings import generate_embedding, generate_embeddings_batch, EMBEDDING_DIM
+from embeddings import generate_embeddings_array, to_pgvector, EMBEDDING_DIM
 import time
 
 # Load environment variables
 load_dotenv()
 
-def migrate_embeddings():
+# Rows fetched from file_chunks per keyset page
+FETCH_PAGE_SIZE = 1000
+# Attempts per upsert before a batch is counted as failed
+MAX_UPSERT_ATTEMPTS = 3
+
+_STOP = object()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate semantic embeddings for all file chunks")
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of concurrent database writer threads (default: 4)')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Chunks per embedding batch and per bulk upsert (default: 64)')
+    parser.add_argument('--resume-from', type=str, default=None,
+                        help='Skip all chunks with id <= this chunk id (printed on interruption)')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be >= 1')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be >= 1')
+    return args
+
+
+def iter_chunk_pages(supabase, resume_from=None, page_size=FETCH_PAGE_SIZE):
+    """
+    Yield pages of file chunks ordered by id using keyset pagination.
+    PostgREST caps unbounded selects at its max-rows setting, so the old single
+    select silently skipped chunks on large databases.
+    """
+    last_id = resume_from
+    while True:
+        query = supabase.table('file_chunks').select('id, content').order('id')
+        if last_id:
+            query = query.gt('id', last_id)
+        response = query.limit(page_size).execute()
+        rows = response.data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def count_chunks(supabase, resume_from=None):
+    query = supabase.table('file_chunks').select('id', count='exact')
+    if resume_from:
+        query = query.gt('id', resume_from)
+    response = query.limit(1).execute()
+    return response.count or 0
+
+
+def upsert_embeddings(supabase, rows):
+    """Bulk upsert one batch of embedding rows, retrying transient failures."""
+    for attempt in range(1, MAX_UPSERT_ATTEMPTS + 1):
+        try:
+            supabase.table('embeddings').upsert(
+                rows,
+                on_conflict='file_chunk_id,content_type',
+                returning=ReturnMethod.minimal
+            ).execute()
+            return
+        except Exception:
+            if attempt == MAX_UPSERT_ATTEMPTS:
+                raise
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+
+class MigrationProgress:
+    """
+    Thread-safe counters plus a resume watermark.
+
+    Batches finish out of order, so the watermark only advances over the longest
+    prefix of batches that have all been written; everything at or below it is
+    safe to skip with --resume-from.
+    """
+
+    def __init__(self, total_chunks, resume_from=None):
+        self.total_chunks = total_chunks
+        self.successful = 0
+        self.failed = 0
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._done = {}
+        self._next_seq = 0
+        self.watermark = resume_from
+
+    def record(self, seq, last_id, count, ok):
+        with self._lock:
+            if ok:
+                self.successful += count
+            else:
+                self.failed += count
+            self._done[seq] = (last_id, ok)
+            # A failed batch pins the watermark so a resume retries it
+            while self._next_seq in self._done and self._done[self._next_seq][1]:
+                self.watermark = self._done.pop(self._next_seq)[0]
+                self._next_seq += 1
+
+    def report(self):
+        processed = self.successful + self.failed
+        elapsed = time.time() - self.start_time
+        rate = processed / elapsed if elapsed > 0 else 0
+        progress = (processed / self.total_chunks) * 100 if self.total_chunks else 100.0
+        eta = (self.total_chunks - processed) / rate if rate > 0 else 0
+        print(f"  Progress: {progress:.1f}% | Rate: {rate:.1f} chunks/sec | ETA: {eta:.0f}s")
+
+
+def _writer(supabase, work_queue, progress):
+    while True:
+        item = work_queue.get()
+        try:
+            if item is _STOP:
+                return
+            seq, rows = item
+            last_id = rows[-1]['file_chunk_id']
+            try:
+                upsert_embeddings(supabase, rows)
+                ok = True
+            except Exception as e:
+                print(f"  ⚠️  Failed to upsert batch {seq + 1} ({len(rows)} chunks): {e}")
+                ok = False
+            progress.record(seq, last_id, len(rows), ok)
+            progress.report()
+        finally:
+            work_queue.task_done()
+
+
+def migrate_embeddings(workers=4, batch_size=64, resume_from=None):
     """
     Re-generate all embeddings using semantic embeddings
     """
@@ -22,127 +163,113 @@ def migrate_embeddings():
     print("EMBEDDING MIGRATION SCRIPT")
     print("=" * 60)
     print()
-    
+
     # Initialize Supabase
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    
+
     if not supabase_url or not supabase_key:
         print("❌ Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
         sys.exit(1)
-    
+
     print(f"📡 Connecting to Supabase: {supabase_url}")
     supabase = init_supabase(supabase_url, supabase_key)
-    
+
     if not supabase:
         print("❌ Failed to initialize Supabase connection")
         sys.exit(1)
-    
+
     print("✅ Connected to Supabase")
     print()
-    
-    # Get all file chunks
-    print("📊 Fetching file chunks...")
+
+    # Count file chunks
+    print("📊 Counting file chunks...")
+    if resume_from:
+        print(f"   Resuming after chunk {resume_from}")
     try:
-        response = supabase.table('file_chunks').select('id, content').execute()
-        chunks = response.data if response.data else []
-        print(f"✅ Found {len(chunks)} file chunks")
+        total_chunks = count_chunks(supabase, resume_from)
+        print(f"✅ Found {total_chunks} file chunks")
     except Exception as e:
-        print(f"❌ Error fetching chunks: {e}")
+        print(f"❌ Error counting chunks: {e}")
         sys.exit(1)
-    
-    if not chunks:
+
+    if not total_chunks:
         print("ℹ️  No chunks to migrate")
         return
-    
+
     print()
     print(f"🔄 Generating new {EMBEDDING_DIM}-dimensional semantic embeddings...")
+    print(f"   Batch size: {batch_size} | Writer threads: {workers}")
     print()
-    
-    # Process in batches for efficiency
-    batch_size = 32
-    total_chunks = len(chunks)
-    successful = 0
-    failed = 0
-    
-    start_time = time.time()
-    
-    for i in range(0, total_chunks, batch_size):
-        batch = chunks[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (total_chunks + batch_size - 1) // batch_size
-        
-        print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} chunks)...")
-        
-        try:
-            # Generate embeddings for batch
-            texts = [chunk['content'] for chunk in batch]
-            embeddings = generate_embeddings_batch(texts, batch_size=batch_size)
-            
-            # Update each chunk's embedding
-            for chunk, embedding in zip(batch, embeddings):
-                chunk_id = chunk['id']
-                
-                try:
-                    # Check if embedding exists
-                    existing = supabase.table('embeddings')\
-                        .select('id')\
-                        .eq('file_chunk_id', chunk_id)\
-                        .eq('content_type', 'file_chunk')\
-                        .execute()
-                    
-                    if existing.data and len(existing.data) > 0:
-                        # Update existing embedding
-                        supabase.table('embeddings')\
-                            .update({'vector': embedding})\
-                            .eq('file_chunk_id', chunk_id)\
-                            .eq('content_type', 'file_chunk')\
-                            .execute()
-                    else:
-                        # Create new embedding
-                        supabase.table('embeddings').insert({
-                            'file_chunk_id': chunk_id,
-                            'vector': embedding,
-                            'content_type': 'file_chunk'
-                        }).execute()
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    print(f"  ⚠️  Failed to update chunk {chunk_id}: {e}")
-                    failed += 1
-            
-            # Progress indicator
-            progress = ((i + len(batch)) / total_chunks) * 100
-            elapsed = time.time() - start_time
-            rate = (i + len(batch)) / elapsed if elapsed > 0 else 0
-            eta = (total_chunks - (i + len(batch))) / rate if rate > 0 else 0
-            
-            print(f"  Progress: {progress:.1f}% | Rate: {rate:.1f} chunks/sec | ETA: {eta:.0f}s")
-            
-        except Exception as e:
-            print(f"  ❌ Batch processing failed: {e}")
-            failed += len(batch)
-    
-    elapsed_time = time.time() - start_time
-    
+
+    progress = MigrationProgress(total_chunks, resume_from)
+    # Bounded so inference cannot run arbitrarily far ahead of the writers
+    work_queue = queue.Queue(maxsize=workers * 2)
+    writer_threads = [
+        threading.Thread(target=_writer, args=(supabase, work_queue, progress), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in writer_threads:
+        thread.start()
+
+    seq = 0
+    interrupted = False
+    try:
+        for page in iter_chunk_pages(supabase, resume_from):
+            for i in range(0, len(page), batch_size):
+                batch = page[i:i + batch_size]
+                texts = [chunk['content'] for chunk in batch]
+                embeddings = generate_embeddings_array(texts, batch_size=batch_size)
+                rows = [
+                    {
+                        'file_chunk_id': chunk['id'],
+                        'vector': to_pgvector(embedding),
+                        'content_type': 'file_chunk'
+                    }
+                    for chunk, embedding in zip(batch, embeddings)
+                ]
+                work_queue.put((seq, rows))
+                seq += 1
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n⚠️  Interrupted, waiting for queued batches to be written...")
+    except Exception as e:
+        print(f"  ❌ Reading chunks failed: {e}")
+    finally:
+        for _ in writer_threads:
+            work_queue.put(_STOP)
+        for thread in writer_threads:
+            thread.join()
+
+    elapsed_time = time.time() - progress.start_time
+
     print()
     print("=" * 60)
-    print("MIGRATION COMPLETE")
+    print("MIGRATION INTERRUPTED" if interrupted else "MIGRATION COMPLETE")
     print("=" * 60)
-    print(f"✅ Successfully migrated: {successful} chunks")
-    if failed > 0:
-        print(f"❌ Failed: {failed} chunks")
+    print(f"✅ Successfully migrated: {progress.successful} chunks")
+    if progress.failed > 0:
+        print(f"❌ Failed: {progress.failed} chunks")
     print(f"⏱️  Total time: {elapsed_time:.1f} seconds")
-    print(f"📊 Average rate: {successful / elapsed_time:.1f} chunks/second")
+    print(f"📊 Average rate: {progress.successful / elapsed_time:.1f} chunks/second")
     print()
+    if interrupted or progress.failed > 0 or progress.successful < total_chunks:
+        if progress.watermark:
+            print(f"↩️  Resume with: python migrate_embeddings.py --resume-from {progress.watermark}")
+        else:
+            print("↩️  Nothing was committed; rerun without --resume-from")
+        print()
+        if interrupted:
+            raise KeyboardInterrupt
+        return
     print("🎉 Your RAG system now uses semantic embeddings!")
     print("   Expect 50-80% better retrieval accuracy.")
     print()
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        migrate_embeddings()
+        migrate_embeddings(workers=args.workers, batch_size=args.batch_size, resume_from=args.resume_from)
     except KeyboardInterrupt:
         print("\n\n⚠️  Migration interrupted by user")
         sys.exit(1)
@@ -0,0 +1,255 @@
+"""
+Shared model server: one process holds the embedding and re-ranking models for
+every API worker on the host
+
+Run it next to the API workers and point them at its Unix socket:
+
+    MODEL_SERVER_ADDRESS=/run/novafuze/models.sock python model_server.py
+    MODEL_SERVER_ADDRESS=/run/novafuze/models.sock uvicorn main:app --workers 4
+
+With MODEL_SERVER_ADDRESS set, embeddings.generate_embedding(s_batch) and
+rerank_results send their inputs here instead of loading the models in each
+worker. Concurrent embedding requests are coalesced into one encode call.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS")
+# Optional shared secret for the connection handshake (the socket is also chmod 600)
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY")
+MODEL_SERVER_TIMEOUT_SECONDS = float(os.getenv("MODEL_SERVER_TIMEOUT_SECONDS", "30"))
+# Upper bound on texts encoded in one coalesced batch
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "64"))
+# How long the first embedding request waits for others to join its batch
+MODEL_SERVER_BATCH_WAIT_MS = float(os.getenv("MODEL_SERVER_BATCH_WAIT_MS", "2"))
+
+
+def _authkey() -> Optional[bytes]:
+    return MODEL_SERVER_AUTHKEY.encode("utf-8") if MODEL_SERVER_AUTHKEY else None
+
+
+class ModelServerError(Exception):
+    """The model server could not be reached or failed the request"""
+
+
+class _Job:
+    __slots__ = ('op', 'args', 'result', 'error', 'done')
+
+    def __init__(self, op: str, args: Dict[str, Any]):
+        self.op = op
+        self.args = args
+        self.result = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class ModelServer:
+    """
+    Accepts worker connections (one thread each) and runs all inference on a
+    single thread, so torch's own thread pool is not oversubscribed.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None,
+                 max_batch: int = MODEL_SERVER_MAX_BATCH, batch_wait_ms: float = MODEL_SERVER_BATCH_WAIT_MS):
+        self.address = address
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        self._jobs: "queue.Queue[_Job]" = queue.Queue()
+        self._stats = {'embed_requests': 0, 'embed_batches': 0, 'texts': 0, 'rerank_requests': 0, 'connections': 0}
+        self._started = time.time()
+
+    def serve_forever(self) -> None:
+        import embeddings
+        # This process is the model server: always run the models locally
+        embeddings.MODEL_SERVER_ADDRESS = None
+        embeddings.preload_models()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey, backlog=128)
+        os.chmod(self.address, 0o600)
+        threading.Thread(target=self._inference_loop, args=(embeddings,), name="model-inference",
+                         daemon=True).start()
+        logger.info("Model server listening on %s", self.address)
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    logger.warning("Rejected model server connection: %s", e)
+                    continue
+                self._stats['connections'] += 1
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _handle(self, connection: Connection) -> None:
+        try:
+            while True:
+                request = connection.recv()
+                op = request.get('op')
+                if op == 'ping':
+                    connection.send({'ok': True, 'stats': self.stats()})
+                    continue
+                job = _Job(op, request)
+                self._jobs.put(job)
+                job.done.wait()
+                connection.send({'ok': False, 'error': job.error} if job.error else {'ok': True, 'result': job.result})
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def _inference_loop(self, embeddings) -> None:
+        deferred: List[_Job] = []
+        while True:
+            job = deferred.pop(0) if deferred else self._jobs.get()
+            if job.op != 'embed':
+                self._run(job, lambda: self._rerank(embeddings, job))
+                continue
+
+            # Coalesce embedding requests that arrive within the batch window
+            batch, texts = [job], len(job.args['texts'])
+            deadline = time.perf_counter() + self.batch_wait
+            while texts < self.max_batch:
+                try:
+                    other = self._jobs.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if other.op == 'embed':
+                    batch.append(other)
+                    texts += len(other.args['texts'])
+                else:
+                    deferred.append(other)
+            self._embed(embeddings, batch)
+
+    def _embed(self, embeddings, batch: List[_Job]) -> None:
+        texts = [text for job in batch for text in job.args['texts']]
+        try:
+            vectors = embeddings.get_embedding_model().encode(
+                texts, batch_size=max(32, len(texts)), convert_to_numpy=True, normalize_embeddings=True
+            ).astype(np.float32)
+        except Exception as e:
+            for job in batch:
+                job.error = str(e)
+                job.done.set()
+            return
+        self._stats['embed_requests'] += len(batch)
+        self._stats['embed_batches'] += 1
+        self._stats['texts'] += len(texts)
+        offset = 0
+        for job in batch:
+            count = len(job.args['texts'])
+            job.result = vectors[offset:offset + count]
+            offset += count
+            job.done.set()
+
+    def _rerank(self, embeddings, job: _Job):
+        self._stats['rerank_requests'] += 1
+        pairs = [(job.args['query'], document) for document in job.args['documents']]
+        return np.asarray(embeddings.get_reranker_model().predict(pairs), dtype=np.float32)
+
+    @staticmethod
+    def _run(job: _Job, fn) -> None:
+        try:
+            job.result = fn()
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats['uptime_seconds'] = round(time.time() - self._started, 1)
+        stats['pending'] = self._jobs.qsize()
+        return stats
+
+
+class ModelServerClient:
+    """One connection per calling thread; a broken connection is reopened once"""
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, timeout: float = MODEL_SERVER_TIMEOUT_SECONDS):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _drop(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def call(self, request: Dict[str, Any]) -> Any:
+        for attempt in (1, 2):
+            try:
+                connection = self._connection()
+                connection.send(request)
+                if not connection.poll(self.timeout):
+                    # A late reply would be read by the next request on this connection
+                    self._drop()
+                    raise ModelServerError(f"Model server did not answer within {self.timeout}s")
+                response = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._drop()
+                if attempt == 2:
+                    raise ModelServerError(f"Model server unavailable at {self.address}: {e}")
+        if not response.get('ok'):
+            raise ModelServerError(response.get('error') or "Model server request failed")
+        return response.get('result', response.get('stats'))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.call({'op': 'embed', 'texts': list(texts)})
+
+    def rerank(self, query: str, documents: List[str]) -> np.ndarray:
+        return self.call({'op': 'rerank', 'query': query, 'documents': list(documents)})
+
+    def ping(self) -> Dict[str, Any]:
+        return self.call({'op': 'ping'})
+
+
+_client: Optional[ModelServerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client(address: Optional[str] = None) -> ModelServerClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ModelServerClient(address or MODEL_SERVER_ADDRESS, _authkey())
+    return _client
+
+
+def serve(address: Optional[str] = None) -> None:
+    address = address or MODEL_SERVER_ADDRESS
+    if not address:
+        raise SystemExit("Set MODEL_SERVER_ADDRESS to the Unix socket path to listen on")
+    ModelServer(address, _authkey()).serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve()
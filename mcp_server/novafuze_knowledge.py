@@ -950,20 +950,29 @@ def get_website_knowledge() -> str:
     """Get the complete website knowledge base."""
     return WEBSITE_KNOWLEDGE
 
+_knowledge_index = None
+
+def build_knowledge_index():
+    """Split and lower-case the knowledge base once; search_knowledge scans the result"""
+    global _knowledge_index
+    if _knowledge_index is None:
+        lines = WEBSITE_KNOWLEDGE.split('\n')
+        _knowledge_index = (lines, [line.lower() for line in lines])
+    return _knowledge_index
+
 def search_knowledge(query: str) -> str:
     """
     Search the knowledge base for relevant information.
     This is a simple keyword-based search.
     """
     query_lower = query.lower()
-    lines = WEBSITE_KNOWLEDGE.split('\n')
+    lines, lowered_lines = build_knowledge_index()
     relevant_lines = []
     
     # Keywords to search for
     keywords = query_lower.split()
     
-    for i, line in enumerate(lines):
-        line_lower = line.lower()
+    for i, line_lower in enumerate(lowered_lines):
         if any(keyword in line_lower for keyword in keywords):
             # Include context (previous and next lines)
             start = max(0, i - 2)
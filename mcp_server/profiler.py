@@ -0,0 +1,216 @@
+"""
+Opt-in profiling of individual chat and upload requests
+A profiled request records a CPU profile of every pipeline stage (merged
+into one pstats profile) and an allocation snapshot, kept in memory for
+download from the admin endpoints
+"""
+
+import contextvars
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+# Requests carrying "X-Profile-Token: <PROFILE_TOKEN>" are profiled (disabled when unset)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Fraction of profilable requests sampled without a header or admin arming
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "20"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "40"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))
+
+_current_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """
+    Profiles collected for one request.
+
+    cProfile only sees the thread it is enabled in, so each stage function is
+    profiled in its own worker thread and the profiles are merged at the end.
+    """
+
+    def __init__(self, endpoint: str, user_id: Optional[str], trigger: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.trigger = trigger
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.profiles: List[cProfile.Profile] = []
+        self.profiled_stages: List[str] = []
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        def profiled(*args, **kwargs):
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self.profiles.append(profile)
+                    self.profiled_stages.append(stage)
+        return profiled
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the most recent results"""
+
+    def __init__(self, max_stored: int = PROFILE_MAX_STORED, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 token: Optional[str] = PROFILE_TOKEN):
+        self.sample_rate = sample_rate
+        self.token = token
+        self.max_stored = max_stored
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._armed: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # One profiled request at a time: tracemalloc is process-wide and
+        # overlapping sessions would attribute each other's allocations
+        self._active = threading.Lock()
+
+    def arm(self, count: int = 1, endpoint: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Profile the next `count` matching requests (admin trigger)"""
+        entry = {'remaining': count, 'endpoint': endpoint, 'user_id': user_id}
+        with self._lock:
+            self._armed.append(entry)
+        return dict(entry)
+
+    def start(self, endpoint: str, user_id: Optional[str] = None,
+              header_token: Optional[str] = None) -> Optional[ProfileSession]:
+        """Start a session for this request if it was requested, armed or sampled"""
+        # Take the slot first so an armed trigger is only used up by a request that gets profiled
+        if not self._active.acquire(blocking=False):
+            return None
+        trigger = self._trigger(endpoint, user_id, header_token)
+        if trigger is None:
+            self._active.release()
+            return None
+        session = ProfileSession(endpoint, user_id, trigger)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            session._started_tracemalloc = True
+        _current_session.set(session)
+        metrics.increment("profiled_requests_total", endpoint=endpoint, trigger=trigger)
+        return session
+
+    def finish(self, session: Optional[ProfileSession], status: str = "ok",
+               trace: Optional[List[tuple]] = None) -> None:
+        """Store the session's results; `trace` is the request's metrics.current_trace()"""
+        if session is None:
+            return
+        try:
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            if session._started_tracemalloc:
+                tracemalloc.stop()
+            self._store(session, snapshot, status, trace or [])
+        finally:
+            self._active.release()
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {k: v for k, v in result.items() if k not in ('pstats', 'cpu_summary', 'allocations')}
+                for result in reversed(self._results.values())
+            ]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._results.get(profile_id)
+
+    def armed(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._armed]
+
+    def _trigger(self, endpoint: str, user_id: Optional[str], header_token: Optional[str]) -> Optional[str]:
+        if self.token and header_token and hmac.compare_digest(header_token.encode(), self.token.encode()):
+            return "header"
+        with self._lock:
+            for entry in self._armed:
+                if entry['endpoint'] not in (None, endpoint) or entry['user_id'] not in (None, user_id):
+                    continue
+                entry['remaining'] -= 1
+                if entry['remaining'] <= 0:
+                    self._armed.remove(entry)
+                return "admin"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def _store(self, session: ProfileSession, snapshot, status: str, trace: List[tuple]) -> None:
+        stats = None
+        for profile in session.profiles:
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+        cpu_summary = ""
+        if stats is not None:
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            cpu_summary = buffer.getvalue()
+
+        allocations = []
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+            ])
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                allocations.append({
+                    'location': str(stat.traceback),
+                    'size_kb': round(stat.size / 1024, 1),
+                    'count': stat.count
+                })
+
+        result = {
+            'id': session.id,
+            'endpoint': session.endpoint,
+            'user_id': session.user_id,
+            'trigger': session.trigger,
+            'status': status,
+            'created_at': session.started_at.isoformat(),
+            'duration_ms': round((time.perf_counter() - session.start) * 1000, 1),
+            'stage_timings_ms': [
+                {'stage': stage, 'ms': round(seconds * 1000, 1)} for stage, seconds in trace
+            ],
+            'profiled_stages': list(session.profiled_stages),
+            # marshal of the merged stats dict is the .prof format pstats/snakeviz load
+            'pstats': marshal.dumps(stats.stats) if stats is not None else None,
+            'cpu_summary': cpu_summary,
+            'allocations': allocations
+        }
+        with self._lock:
+            self._results[session.id] = result
+            while len(self._results) > self.max_stored:
+                self._results.popitem(last=False)
+
+
+def current_session() -> Optional[ProfileSession]:
+    return _current_session.get()
+
+
+def profile_stage(stage: str, fn: Callable) -> Callable:
+    """fn, profiled when the current request is being profiled"""
+    session = _current_session.get()
+    return session.wrap(stage, fn) if session is not None else fn
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,116 @@
+"""
+Compressed embeddings for a first-pass candidate search
+  binary  - one sign bit per dimension (48 bytes for 384 dims), compared by
+            Hamming distance; the same encoding as pgvector's binary_quantize
+  int8    - one signed byte per dimension plus a float32 scale per vector
+A query scores the compressed vectors, keeps the best
+match_count * VECTOR_RESCORE_MULTIPLIER candidates and ranks those by exact
+float32 cosine similarity, so returned similarities are always exact.
+"""
+
+import os
+from typing import Tuple
+
+import numpy as np
+
+# none | binary | int8
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Candidates kept from the compressed pass per requested result (binary needs 10-16
+# for recall near 1 on clustered embeddings; int8 is near-exact from 2)
+VECTOR_RESCORE_MULTIPLIER = int(os.getenv("VECTOR_RESCORE_MULTIPLIER", "10"))
+
+QUANTIZATION_MODES = ("none", "binary", "int8")
+
+# Rows converted from int8 to float32 at a time when scoring (a block stays in cache)
+_INT8_BLOCK_ROWS = 2048
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def rescore_count(match_count: int, multiplier: int = VECTOR_RESCORE_MULTIPLIER) -> int:
+    return max(match_count, match_count * max(1, multiplier))
+
+
+def int8_dtype(dim: int) -> np.dtype:
+    """One int8-quantized vector: codes and the scale that maps them back to floats"""
+    return np.dtype([('codes', np.int8, (dim,)), ('scale', np.float32)])
+
+
+def quantize_binary(matrix) -> np.ndarray:
+    """(n, dim) floats -> (n, dim / 8) uint8, bit set where the component is positive"""
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+def quantize_int8(matrix) -> np.ndarray:
+    """(n, dim) floats -> records of int8 codes and a per-vector scale (max |component| / 127)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    records = np.empty(len(matrix), dtype=int8_dtype(matrix.shape[1]))
+    records['codes'] = np.clip(np.rint(matrix / scales[:, None]), -127, 127)
+    records['scale'] = scales
+    return records
+
+
+def _popcount64(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 (SWAR), for numpy versions without bitwise_count"""
+    words = words - ((words >> np.uint64(1)) & _M1)
+    words = (words & _M2) + ((words >> np.uint64(2)) & _M2)
+    words = (words + (words >> np.uint64(4))) & _M4
+    return (words * _H01) >> np.uint64(56)
+
+
+def binary_scores(packed: np.ndarray, query) -> np.ndarray:
+    """Negated Hamming distance of each packed row to the query's sign bits (higher is closer)"""
+    query_bits = quantize_binary(query)
+    xor = np.bitwise_xor(packed, query_bits)
+    if xor.shape[-1] % 8:
+        return -np.unpackbits(xor, axis=-1).sum(axis=-1, dtype=np.int32)
+    words = xor.view(np.uint64)
+    counts = np.bitwise_count(words) if hasattr(np, "bitwise_count") else _popcount64(words)
+    return -counts.sum(axis=-1, dtype=np.int32)
+
+
+def int8_scores(records: np.ndarray, query) -> np.ndarray:
+    """Approximate dot products of the dequantized rows with the query"""
+    query = np.asarray(query, dtype=np.float32)
+    codes = records['codes']
+    scores = np.empty(len(records), dtype=np.float32)
+    # numpy has no int8 matrix-vector kernel: convert a block at a time and use float32 BLAS
+    for start in range(0, len(records), _INT8_BLOCK_ROWS):
+        block = codes[start:start + _INT8_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ query
+    return scores * records['scale']
+
+
+def first_pass(mode: str, quantized: np.ndarray, query, count: int) -> np.ndarray:
+    """Positions of the count rows of quantized that score best against the query, unordered"""
+    if mode == "binary":
+        scores = binary_scores(quantized, query)
+    elif mode == "int8":
+        scores = int8_scores(quantized, query)
+    else:
+        raise ValueError(f"Unknown quantization mode {mode!r}")
+    if count >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(-scores, count - 1)[:count]
+
+
+def quantize(mode: str, matrix) -> np.ndarray:
+    if mode == "binary":
+        return quantize_binary(matrix)
+    if mode == "int8":
+        return quantize_int8(matrix)
+    raise ValueError(f"Unknown quantization mode {mode!r}")
+
+
+def row_layout(mode: str, dim: int) -> Tuple[np.dtype, Tuple[int, ...]]:
+    """dtype and per-row shape of a quantized row, for memory-mapping a file of them"""
+    if mode == "binary":
+        return np.dtype(np.uint8), ((dim + 7) // 8,)
+    if mode == "int8":
+        return int8_dtype(dim), ()
+    raise ValueError(f"Unknown quantization mode {mode!r}")
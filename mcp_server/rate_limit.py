@@ -0,0 +1,65 @@
+"""
+In-process token-bucket rate limiting
+Used in front of expensive endpoints such as admin login
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (e.g. an email address or client IP).
+
+    Each bucket holds up to `capacity` tokens and refills at `refill_per_second`.
+    The least recently used buckets are dropped beyond `max_keys`, which only
+    ever makes the limiter more lenient, never stricter.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 10000):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the key's bucket.
+        Returns 0 when allowed, otherwise the number of seconds until enough tokens refill.
+        """
+        now = time.monotonic()
+        with self._lock:
+            level, updated_at = self._buckets.get(key, (self.capacity, now))
+            level = min(self.capacity, level + (now - updated_at) * self.refill_per_second)
+            if level >= tokens:
+                self._store_locked(key, level - tokens, now)
+                self.allowed += 1
+                return 0.0
+            self._store_locked(key, level, now)
+            self.rejected += 1
+            if self.refill_per_second <= 0:
+                return float('inf')
+            return (tokens - level) / self.refill_per_second
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'tracked_keys': len(self._buckets),
+                'allowed': self.allowed,
+                'rejected': self.rejected
+            }
+
+    def _store_locked(self, key: str, level: float, now: float) -> None:
+        self._buckets[key] = (level, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
@@ -0,0 +1,758 @@
+"""
+Retrieval backends behind file_tools.search_similar_chunks
+A backend indexes the embeddings of stored chunks and answers per-user top-k
+vector queries with rows shaped like the match_file_chunks RPC
+(id, content, page_number, file_id, similarity).
+
+  supabase  - embeddings table + match_file_chunks RPC, optionally fronted by
+              the per-user vector cache (the default)
+  local     - memory-mapped float32 segment files on local disk with a JSON
+              lines metadata sidecar and tombstone deletes; no Supabase vector
+              dependency (RETRIEVAL_BACKEND=local, LOCAL_VECTOR_DIR); workers
+              on one host can share the directory (file locks, see
+              LocalSegmentBackend)
+
+Both take VECTOR_QUANTIZATION (quantization.py): a first pass over binary or
+int8 vectors picks candidates that are then ranked by exact cosine similarity.
+The supabase backend supports binary only (match_file_chunks_binary, see
+db/binary_quantization.sql).
+
+Chunks stored before switching to the local backend are copied in once with
+
+    RETRIEVAL_BACKEND=local python retrieval_backends.py backfill
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the local store is then single-process only
+    fcntl = None
+
+import numpy as np
+
+import metrics
+import quantization
+from embeddings import parse_vector, to_pgvector
+from quantization import QUANTIZATION_MODES, VECTOR_QUANTIZATION, VECTOR_RESCORE_MULTIPLIER
+from vector_cache import VECTOR_CACHE_ENABLED, VectorCache, vector_cache
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "supabase").lower()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(os.path.dirname(__file__), "data", "vectors"))
+# Rows per segment file before a new segment is started
+LOCAL_VECTOR_SEGMENT_ROWS = int(os.getenv("LOCAL_VECTOR_SEGMENT_ROWS", "100000"))
+# Segments are rewritten without deleted rows on open once this share of rows is dead
+LOCAL_VECTOR_COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.3"))
+# Rows per user_chunk_vectors page when filling the per-user vector cache
+VECTOR_CACHE_PAGE_SIZE = int(os.getenv("VECTOR_CACHE_PAGE_SIZE", "1000"))
+
+EMBEDDING_DIM = 384
+
+
+def _quantization_mode(mode: str, backend: str, supported=QUANTIZATION_MODES) -> str:
+    if mode not in supported:
+        logger.warning(f"VECTOR_QUANTIZATION={mode!r} is not supported by the {backend} backend, "
+                       f"searching full vectors")
+        return "none"
+    return mode
+
+
+class RetrievalBackend:
+    """Interface implemented by every backend"""
+
+    name = "base"
+
+    def search(self, user_uuid: str, query_vector, match_count: int, client=None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def index_chunks(self, user_uuid: str, chunk_records: List[Dict[str, Any]], vectors: List[Any],
+                     client=None) -> None:
+        """Make freshly inserted file_chunks rows (with their vectors) searchable"""
+        raise NotImplementedError
+
+    def delete_file(self, user_uuid: str, file_id: str) -> None:
+        """Stop returning the file's chunks"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class SupabaseRetrievalBackend(RetrievalBackend):
+    """The embeddings table and match_file_chunks RPC, with an optional per-user vector cache"""
+
+    name = "supabase"
+
+    def __init__(self, cache: Optional[VectorCache] = None, quantization: str = VECTOR_QUANTIZATION,
+                 rescore_multiplier: int = VECTOR_RESCORE_MULTIPLIER):
+        self.cache = cache
+        # Postgres has a binary_quantize but no int8 vector type
+        self.quantization = _quantization_mode(quantization, self.name, ("none", "binary"))
+        self.rescore_multiplier = rescore_multiplier
+
+    @staticmethod
+    def _client(client):
+        if client is None:
+            from supabase_client import supabase as client
+        if client is None:
+            raise Exception("Supabase client not initialized")
+        return client
+
+    def search(self, user_uuid: str, query_vector, match_count: int, client=None) -> List[Dict[str, Any]]:
+        client = self._client(client)
+        rows = None
+        if self.cache is not None:
+            try:
+                with metrics.span("vector_cache"):
+                    rows = self.cache.search(user_uuid, query_vector, match_count,
+                                             lambda uuid, limit: self._load_user_vectors(client, uuid, limit))
+            except Exception as e:
+                logger.warning(f"Vector cache unavailable, using match_file_chunks: {e}")
+        if rows is None and self.quantization == "binary":
+            try:
+                with metrics.span("vector_rpc"):
+                    rows = client.rpc('match_file_chunks_binary', {
+                        'query_embedding': to_pgvector(query_vector),
+                        'match_count': match_count,
+                        'user_uuid': user_uuid,
+                        'rescore_count': quantization.rescore_count(match_count, self.rescore_multiplier)
+                    }).execute().data
+            except Exception as e:
+                logger.warning(f"match_file_chunks_binary failed, using match_file_chunks: {e}")
+        if rows is None:
+            with metrics.span("vector_rpc"):
+                rows = client.rpc('match_file_chunks', {
+                    'query_embedding': to_pgvector(query_vector),
+                    'match_count': match_count,
+                    'user_uuid': user_uuid
+                }).execute().data
+        return rows or []
+
+    @staticmethod
+    def _load_user_vectors(client, user_uuid: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The user's chunk embeddings, read page by page through user_chunk_vectors;
+        stops after limit rows when one is given
+        """
+        rows: List[Dict[str, Any]] = []
+        after_id = None
+        while True:
+            page_size = VECTOR_CACHE_PAGE_SIZE if limit is None else min(VECTOR_CACHE_PAGE_SIZE, limit - len(rows))
+            page = client.rpc('user_chunk_vectors', {
+                'user_uuid': user_uuid,
+                'after_id': after_id,
+                'page_size': page_size
+            }).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size or (limit is not None and len(rows) >= limit):
+                return rows
+            after_id = page[-1]['id']
+
+    def index_chunks(self, user_uuid: str, chunk_records: List[Dict[str, Any]], vectors: List[Any],
+                     client=None) -> None:
+        embedding_rows = [
+            {'file_chunk_id': record['id'], 'vector': to_pgvector(vector), 'content_type': 'file_chunk'}
+            for record, vector in zip(chunk_records, vectors)
+        ]
+        if embedding_rows:
+            self._client(client).table('embeddings').insert(embedding_rows).execute()
+        if self.cache is not None:
+            self.cache.invalidate(user_uuid)
+
+    def delete_file(self, user_uuid: str, file_id: str) -> None:
+        # The files row delete cascades to file_chunks and embeddings
+        if self.cache is not None:
+            self.cache.invalidate(user_uuid)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'quantization': self.quantization,
+            'vector_cache': self.cache.stats() if self.cache is not None else None
+        }
+
+
+_QUANTIZED_EXTENSIONS = {"binary": "q1", "int8": "q8"}
+
+
+class _Segment:
+    """
+    One append-only set of files: NNNNNN.f32 (rows x dim float32), NNNNNN.jsonl
+    (row metadata) and, when quantization is on, NNNNNN.q1 / NNNNNN.q8
+    (the same rows quantized)
+    """
+
+    def __init__(self, directory: str, number: int, dim: int, quantization: str = "none"):
+        self.number = number
+        self.dim = dim
+        self.quantization = quantization
+        self.vector_path = os.path.join(directory, f"{number:06d}.f32")
+        self.meta_path = os.path.join(directory, f"{number:06d}.jsonl")
+        self.quantized_path = (os.path.join(directory, f"{number:06d}.{_QUANTIZED_EXTENSIONS[quantization]}")
+                               if quantization != "none" else None)
+        self.meta: List[Dict[str, Any]] = []
+        # Length of the sidecar already read, for refresh()
+        self.meta_bytes = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self.user_rows: Dict[str, List[int]] = {}
+        self._user_index: Dict[str, np.ndarray] = {}
+        self._map: Optional[np.memmap] = None
+        self._quantized_map: Optional[np.memmap] = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.meta)
+
+    def load(self) -> None:
+        """Read the sidecar and drop a torn tail left by a crash between the two appends"""
+        meta, torn = [], False
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        meta.append(json.loads(line))
+                    except ValueError:
+                        torn = True
+                        break
+        row_bytes = self.dim * 4
+        vector_rows = os.path.getsize(self.vector_path) // row_bytes if os.path.exists(self.vector_path) else 0
+        rows = min(len(meta), vector_rows)
+        if os.path.exists(self.vector_path) and os.path.getsize(self.vector_path) != rows * row_bytes:
+            with open(self.vector_path, "r+b") as fh:
+                fh.truncate(rows * row_bytes)
+        if len(meta) != rows or torn:
+            meta = meta[:rows]
+            self._write_meta(meta)
+        self.meta = meta
+        self.alive = np.ones(rows, dtype=bool)
+        for row, item in enumerate(meta):
+            self.user_rows.setdefault(item['user_id'], []).append(row)
+        self.meta_bytes = os.path.getsize(self.meta_path) if os.path.exists(self.meta_path) else 0
+        if self.quantized_path:
+            self._load_quantized()
+
+    def refresh(self) -> bool:
+        """
+        Pick up rows appended by another process since load(); False when the
+        files are not in a state this can follow (a full load() repairs them)
+        """
+        size = os.path.getsize(self.meta_path) if os.path.exists(self.meta_path) else 0
+        if size == self.meta_bytes:
+            return True
+        if size < self.meta_bytes:
+            return False
+        with open(self.meta_path, "rb") as fh:
+            fh.seek(self.meta_bytes)
+            data = fh.read(size - self.meta_bytes)
+        if not data.endswith(b"\n"):
+            return False
+        try:
+            items = [json.loads(line) for line in data.splitlines()]
+        except ValueError:
+            return False
+        rows = self.rows + len(items)
+        if os.path.getsize(self.vector_path) < rows * self.dim * 4:
+            return False
+        if self.quantized_path:
+            dtype, shape = quantization.row_layout(self.quantization, self.dim)
+            row_bytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            if not os.path.exists(self.quantized_path) or os.path.getsize(self.quantized_path) < rows * row_bytes:
+                return False
+        self._add_rows(items)
+        self.meta_bytes = size
+        return True
+
+    def _load_quantized(self) -> None:
+        """Trim quantized rows past the sidecar, and quantize rows written before quantization was enabled"""
+        dtype, shape = quantization.row_layout(self.quantization, self.dim)
+        row_bytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        size = os.path.getsize(self.quantized_path) if os.path.exists(self.quantized_path) else 0
+        have = min(size // row_bytes, self.rows)
+        if size != have * row_bytes:
+            with open(self.quantized_path, "ab") as fh:
+                fh.truncate(have * row_bytes)
+        if have < self.rows:
+            self._write(self.quantized_path,
+                        quantization.quantize(self.quantization, np.asarray(self.matrix()[have:])).tobytes())
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        with open(path, "ab") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def append(self, items: List[Dict[str, Any]], matrix: np.ndarray) -> None:
+        # Vectors first: a crash before the sidecar write leaves rows load() discards
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._write(self.vector_path, matrix.tobytes())
+        if self.quantized_path:
+            self._write(self.quantized_path, quantization.quantize(self.quantization, matrix).tobytes())
+        with open(self.meta_path, "a", encoding="utf-8") as fh:
+            for item in items:
+                fh.write(json.dumps(item) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+            self.meta_bytes = fh.tell()
+        self._add_rows(items)
+
+    def _add_rows(self, items: List[Dict[str, Any]]) -> None:
+        start = self.rows
+        self.meta.extend(items)
+        self.alive = np.concatenate([self.alive, np.ones(len(items), dtype=bool)])
+        for offset, item in enumerate(items):
+            self.user_rows.setdefault(item['user_id'], []).append(start + offset)
+            self._user_index.pop(item['user_id'], None)
+        self._map = None
+        self._quantized_map = None
+
+    def tombstone(self, file_ids: set, start: int = 0) -> int:
+        dead = 0
+        for row in range(start, self.rows):
+            if self.alive[row] and self.meta[row]['file_id'] in file_ids:
+                self.alive[row] = False
+                dead += 1
+        return dead
+
+    def matrix(self) -> Optional[np.memmap]:
+        if self._map is None and self.rows:
+            self._map = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self._map
+
+    def quantized(self) -> Optional[np.memmap]:
+        if self._quantized_map is None and self.rows and self.quantized_path:
+            dtype, shape = quantization.row_layout(self.quantization, self.dim)
+            self._quantized_map = np.memmap(self.quantized_path, dtype=dtype, mode="r", shape=(self.rows,) + shape)
+        return self._quantized_map
+
+    def paths(self) -> List[str]:
+        return [path for path in (self.vector_path, self.meta_path, self.quantized_path)
+                if path and os.path.exists(path)]
+
+    def candidates(self, user_uuid: str) -> np.ndarray:
+        index = self._user_index.get(user_uuid)
+        if index is None:
+            index = np.asarray(self.user_rows.get(user_uuid, []), dtype=np.int64)
+            self._user_index[user_uuid] = index
+        return index[self.alive[index]] if len(index) else index
+
+    def _write_meta(self, meta: List[Dict[str, Any]]) -> None:
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as fh:
+            for item in meta:
+                fh.write(json.dumps(item) + "\n")
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+
+class LocalSegmentBackend(RetrievalBackend):
+    """
+    Embeddings in memory-mapped float32 segment files, searched brute force.
+
+    Vectors are unit-normalised on append, so a query is one matrix-vector
+    product over the user's live rows in each segment; with quantization the
+    product runs over the candidates picked from the quantized rows. Deleting a
+    file appends its id to tombstones.jsonl; the rows are skipped from then on
+    and dropped when the segments are compacted on open.
+
+    Several processes (API workers) can share one directory. Every operation
+    holds an flock on store.lock, shared for searches (only while picking the
+    rows to score) and exclusive for appends, deletes and compaction, and
+    store.lock holds a generation that
+    writers bump: a process that sees a new generation reads the rows and
+    tombstones appended since it last looked, or reloads everything after a
+    compaction. Without fcntl (Windows) only one process may use a directory.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = LOCAL_VECTOR_DIR, dim: int = EMBEDDING_DIM,
+                 segment_rows: int = LOCAL_VECTOR_SEGMENT_ROWS, compact_ratio: float = LOCAL_VECTOR_COMPACT_RATIO,
+                 quantization: str = VECTOR_QUANTIZATION, rescore_multiplier: int = VECTOR_RESCORE_MULTIPLIER):
+        self.directory = directory
+        self.dim = dim
+        self.quantization = _quantization_mode(quantization, self.name)
+        self.rescore_multiplier = rescore_multiplier
+        self.segment_rows = segment_rows
+        self.compact_ratio = compact_ratio
+        self.tombstone_path = os.path.join(directory, "tombstones.jsonl")
+        self.compact_marker_path = os.path.join(directory, "compaction.json")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self.segments: List[_Segment] = []
+        self.deleted_files: set = set()
+        # (compactions, writes) last seen in store.lock, and how much of tombstones.jsonl was read
+        self.generation = (0, 0)
+        self._tombstone_bytes = 0
+        self._lock = threading.RLock()
+        self._lock_fd: Optional[int] = None
+        self.open()
+
+    def open(self) -> None:
+        start = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if self._lock_fd is None:
+                self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is None:
+                    logger.warning("fcntl is unavailable: do not share %s between processes", self.directory)
+            self._flock(exclusive=True)
+            try:
+                self._load()
+                total = sum(s.rows for s in self.segments)
+                dead = total - sum(int(s.alive.sum()) for s in self.segments)
+                if total and dead / total >= self.compact_ratio:
+                    self._compact()
+            finally:
+                self._unlock()
+        logger.info("Local vector store opened: %d segments, %d rows in %.0f ms", len(self.segments),
+                    sum(s.rows for s in self.segments), (time.perf_counter() - start) * 1000)
+
+    def search(self, user_uuid: str, query_vector, match_count: int, client=None) -> List[Dict[str, Any]]:
+        if match_count <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+        shortlist = quantization.rescore_count(match_count, self.rescore_multiplier)
+        with metrics.span("vector_local"):
+            # Only the candidate rows and maps are taken under the lock. Rows are never
+            # rewritten in place (appends go past the mapped rows, compaction writes new
+            # files), so the scoring below runs unlocked and searches proceed in parallel
+            with self._locked(exclusive=False):
+                work = []
+                for segment in self.segments:
+                    rows = segment.candidates(user_uuid)
+                    if len(rows):
+                        quantized = segment.quantized() if self.quantization != "none" else None
+                        work.append((segment, rows, segment.matrix(), quantized))
+            scored = []
+            for segment, rows, matrix, quantized in work:
+                if quantized is not None and len(rows) > shortlist:
+                    rows = rows[quantization.first_pass(self.quantization, quantized[rows], query, shortlist)]
+                scores = matrix[rows] @ query
+                if len(scores) > match_count:
+                    keep = np.argpartition(-scores, match_count - 1)[:match_count]
+                    rows, scores = rows[keep], scores[keep]
+                scored.extend((float(score), segment, int(row)) for score, row in zip(scores, rows))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            return [
+                {
+                    'id': segment.meta[row]['id'],
+                    'content': segment.meta[row].get('content'),
+                    'page_number': segment.meta[row].get('page_number'),
+                    'file_id': segment.meta[row]['file_id'],
+                    'similarity': score
+                }
+                for score, segment, row in scored[:match_count]
+            ]
+
+    def index_chunks(self, user_uuid: str, chunk_records: List[Dict[str, Any]], vectors: List[Any],
+                     client=None) -> None:
+        if not chunk_records:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(chunk_records), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        items = [
+            {
+                'id': record['id'],
+                'user_id': user_uuid,
+                'file_id': record['file_id'],
+                'page_number': record.get('page_number'),
+                'content': record.get('content')
+            }
+            for record in chunk_records
+        ]
+        with self._locked(exclusive=True):
+            offset = 0
+            while offset < len(items):
+                segment = self._writable_segment()
+                take = min(len(items) - offset, self.segment_rows - segment.rows)
+                segment.append(items[offset:offset + take], matrix[offset:offset + take])
+                offset += take
+            self._bump_generation()
+
+    def delete_file(self, user_uuid: str, file_id: str) -> None:
+        with self._locked(exclusive=True):
+            with open(self.tombstone_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({'file_id': file_id, 'user_id': user_uuid, 'deleted_at': time.time()}) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+                self._tombstone_bytes = fh.tell()
+            self.deleted_files.add(file_id)
+            for segment in self.segments:
+                segment.tombstone({file_id})
+            self._bump_generation()
+
+    def compact(self) -> None:
+        """Rewrite the live rows into new segments and clear the tombstones"""
+        with self._locked(exclusive=True):
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        compact() with the store locked exclusively. compaction.json records
+        progress, so a crash part way leaves either the old or the new segments
+        (see _finish_compaction), never both. Other processes may still map the
+        old files; they stay readable until those processes see the new
+        generation and reload.
+        """
+        live_items, live_vectors = [], []
+        for segment in self.segments:
+            rows = np.flatnonzero(segment.alive)
+            if len(rows):
+                live_vectors.append(np.array(segment.matrix()[rows]))
+                live_items.extend(segment.meta[row] for row in rows)
+        old_segments = self.segments
+        first_new = old_segments[-1].number + 1 if old_segments else 1
+        self._write_compact_marker({'state': 'writing', 'first_new': first_new})
+
+        self.segments = []
+        next_number = first_new
+        matrix = np.vstack(live_vectors) if live_vectors else np.zeros((0, self.dim), dtype=np.float32)
+        for offset in range(0, len(live_items), self.segment_rows):
+            segment = _Segment(self.directory, next_number, self.dim, self.quantization)
+            segment.append(live_items[offset:offset + self.segment_rows],
+                           matrix[offset:offset + self.segment_rows])
+            self.segments.append(segment)
+            next_number += 1
+
+        self._write_compact_marker({'state': 'done', 'first_new': first_new})
+        for segment in old_segments:
+            segment._map = None
+            segment._quantized_map = None
+        self.deleted_files = set()
+        self._tombstone_bytes = 0
+        self._finish_compaction()
+        self._bump_generation(compacted=True)
+        logger.info("Compacted local vector store to %d live rows", len(live_items))
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold the store (threads and processes), with this process's view brought up to date"""
+        with self._lock:
+            self._flock(exclusive)
+            try:
+                if self._read_generation() != self.generation:
+                    if not exclusive:
+                        # Catching up may repair files, which needs the store to itself
+                        self._flock(exclusive=True)
+                    self._catch_up()
+                yield
+            finally:
+                self._unlock()
+
+    def _flock(self, exclusive: bool) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _read_generation(self) -> tuple:
+        if fcntl is None:
+            return self.generation
+        try:
+            compactions, writes = os.pread(self._lock_fd, 64, 0).split()
+            return int(compactions), int(writes)
+        except ValueError:
+            return 0, 0
+
+    def _bump_generation(self, compacted: bool = False) -> None:
+        compactions, writes = self._read_generation()
+        self.generation = (compactions + 1, 0) if compacted else (compactions, writes + 1)
+        if fcntl is None:
+            return
+        # Fixed width, so an overwrite never leaves a longer old value behind
+        os.pwrite(self._lock_fd, f"{self.generation[0]:>20} {self.generation[1]:>20}\n".encode("ascii"), 0)
+
+    def _load(self) -> None:
+        """Read the whole store from disk (store locked exclusively)"""
+        self.segments = []
+        self._finish_compaction()
+        numbers = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                         if name.endswith(".f32") and name[:-4].isdigit())
+        for number in numbers:
+            segment = _Segment(self.directory, number, self.dim, self.quantization)
+            segment.load()
+            self.segments.append(segment)
+        self.deleted_files = set()
+        self._tombstone_bytes = 0
+        self._read_tombstones()
+        for segment in self.segments:
+            segment.tombstone(self.deleted_files)
+        self.generation = self._read_generation()
+
+    def _catch_up(self) -> None:
+        """Apply what other processes wrote since this one last looked (store locked exclusively)"""
+        generation = self._read_generation()
+        if generation[0] != self.generation[0]:
+            self._load()
+            return
+        known_rows = {segment.number: segment.rows for segment in self.segments}
+        for segment in self.segments:
+            if not segment.refresh():
+                self._load()
+                return
+        last = self.segments[-1].number if self.segments else 0
+        numbers = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                         if name.endswith(".f32") and name[:-4].isdigit() and int(name[:-4]) > last)
+        for number in numbers:
+            segment = _Segment(self.directory, number, self.dim, self.quantization)
+            segment.load()
+            self.segments.append(segment)
+        new_deletes = self._read_tombstones()
+        for segment in self.segments:
+            if new_deletes:
+                segment.tombstone(new_deletes)
+            segment.tombstone(self.deleted_files, start=known_rows.get(segment.number, 0))
+        self.generation = generation
+
+    def _read_tombstones(self) -> set:
+        """Add file ids deleted since the last read to deleted_files, and return them"""
+        added = set()
+        if not os.path.exists(self.tombstone_path):
+            return added
+        with open(self.tombstone_path, "rb") as fh:
+            fh.seek(self._tombstone_bytes)
+            data = fh.read()
+        # Only whole lines: a torn tail is re-read once it is complete
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                added.add(json.loads(line)['file_id'])
+            except (ValueError, KeyError):
+                continue
+        self._tombstone_bytes += end
+        self.deleted_files |= added
+        return added
+
+    def _write_compact_marker(self, state: Dict[str, Any]) -> None:
+        with open(self.compact_marker_path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(self.compact_marker_path + ".tmp", self.compact_marker_path)
+
+    def _finish_compaction(self) -> None:
+        """Drop the old segments of a completed compaction, or the new ones of an interrupted one"""
+        if not os.path.exists(self.compact_marker_path):
+            return
+        with open(self.compact_marker_path, encoding="utf-8") as fh:
+            marker = json.load(fh)
+        done = marker.get('state') == 'done'
+        for name in os.listdir(self.directory):
+            stem, _, extension = name.partition(".")
+            if extension not in ("f32", "jsonl", *_QUANTIZED_EXTENSIONS.values()) or not stem.isdigit():
+                continue
+            if (int(stem) < marker['first_new']) == done:
+                os.unlink(os.path.join(self.directory, name))
+        if done and os.path.exists(self.tombstone_path):
+            os.unlink(self.tombstone_path)
+        os.unlink(self.compact_marker_path)
+
+    def _writable_segment(self) -> _Segment:
+        if not self.segments or self.segments[-1].rows >= self.segment_rows:
+            number = self.segments[-1].number + 1 if self.segments else 1
+            segment = _Segment(self.directory, number, self.dim, self.quantization)
+            self.segments.append(segment)
+        return self.segments[-1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked(exclusive=False):
+            total = sum(s.rows for s in self.segments)
+            live = sum(int(s.alive.sum()) for s in self.segments)
+            disk = sum(os.path.getsize(p) for s in self.segments for p in s.paths())
+            return {
+                'backend': self.name,
+                'directory': self.directory,
+                'quantization': self.quantization,
+                'segments': len(self.segments),
+                'rows': total,
+                'live_rows': live,
+                'deleted_files': len(self.deleted_files),
+                'disk_bytes': disk
+            }
+
+
+_backend: Optional[RetrievalBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: str = RETRIEVAL_BACKEND) -> RetrievalBackend:
+    if name == "local":
+        return LocalSegmentBackend()
+    if name != "supabase":
+        logger.warning(f"Unknown RETRIEVAL_BACKEND {name!r}, using supabase")
+    return SupabaseRetrievalBackend(cache=vector_cache if VECTOR_CACHE_ENABLED else None)
+
+
+def get_retrieval_backend() -> RetrievalBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_retrieval_backend(backend: RetrievalBackend) -> None:
+    """Swap the process-wide backend (benchmarks, tools)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _iter_users(client, page_size: int = VECTOR_CACHE_PAGE_SIZE):
+    """Every users row, by keyset pages on id (PostgREST caps an unpaged select at max-rows)"""
+    last_id = None
+    while True:
+        query = client.table('users').select('id').order('id')
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def backfill_local(backend: LocalSegmentBackend, client) -> int:
+    """Copy every user's chunk embeddings from Supabase (user_chunk_vectors) into an empty local store"""
+    if any(segment.rows for segment in backend.segments):
+        raise SystemExit(f"{backend.directory} already holds vectors; backfill an empty LOCAL_VECTOR_DIR")
+    total = 0
+    for user in _iter_users(client):
+        rows = SupabaseRetrievalBackend._load_user_vectors(client, user['id'])
+        if not rows:
+            continue
+        backend.index_chunks(user['id'], rows, [parse_vector(row['vector']) for row in rows])
+        total += len(rows)
+        logger.info("Backfilled %d chunks for user %s", len(rows), user['id'])
+    return total
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["backfill"]:
+        raise SystemExit("usage: RETRIEVAL_BACKEND=local python retrieval_backends.py backfill")
+    from dotenv import load_dotenv
+    from supabase_client import init_supabase
+    load_dotenv()
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not supabase_url or not supabase_key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+    supabase = init_supabase(supabase_url, supabase_key)
+    if supabase is None:
+        raise SystemExit("Supabase client not initialized")
+    print(f"{backfill_local(LocalSegmentBackend(), supabase)} chunks copied to {LOCAL_VECTOR_DIR}")
@@ -1,29 +1,45 @@
+import logging
 import os
-from supabase import create_client, Client
+from supabase import Client
+
+from log_utils import debug_sampled, summarize_messages, truncated
+from supabase_pool import PooledSupabaseClient
+
+logger = logging.getLogger(__name__)
 
 supabase: Client = None
 
 def init_supabase(url: str, key: str):
     global supabase
     try:
-        supabase = create_client(url, key)
-        print(f"DEBUG: Supabase client initialized successfully")
+        # Table, RPC and storage calls share one keep-alive connection pool
+        supabase = PooledSupabaseClient(url, key)
+        logger.info("Supabase client initialized successfully")
         return supabase
     except Exception as e:
-        print(f"ERROR: Failed to initialize Supabase client: {e}")
+        logger.error(f"Failed to initialize Supabase client: {e}")
         supabase = None
         return None
 
+def get_async_postgrest():
+    """Async PostgREST client on the same pool settings, for async handlers"""
+    return supabase.async_postgrest if supabase else None
+
+async def close_supabase():
+    """Close the pooled connections (shutdown hook)"""
+    if supabase:
+        supabase.close()
+        await supabase.aclose()
+
 def get_or_create_user(firebase_uid: str, email: str = None, name: str = None):
-    print(f"DEBUG: get_or_create_user called with firebase_uid={firebase_uid}, email={email}, name={name}")
+    debug_sampled(logger, "get_or_create_user firebase_uid=%s email=%s name=%s", firebase_uid, email, name)
     
     # First, try to get existing user with all fields
     response = supabase.table('users').select('*').eq('firebase_uid', firebase_uid).execute()
-    print(f"DEBUG: Existing user query result: {response.data}")
     
     if response.data:
         existing_user = response.data[0]
-        print(f"DEBUG: Found existing user: {existing_user}")
+        debug_sampled(logger, "Found existing user %s", existing_user.get('id'))
         
         # Update user if we have new email/name info and they're missing
         if (email and not existing_user.get('email')) or (name and not existing_user.get('name')):
@@ -34,11 +50,10 @@ def get_or_create_user(firebase_uid: str, email: str = None, name: str = None):
                 update_data['name'] = name
             
             if update_data:
-                print(f"DEBUG: Updating user with data: {update_data}")
+                debug_sampled(logger, "Updating user %s fields %s", existing_user.get('id'), list(update_data))
                 supabase.table('users').update(update_data).eq('firebase_uid', firebase_uid).execute()
                 # Return updated user
                 response = supabase.table('users').select('*').eq('firebase_uid', firebase_uid).execute()
-                print(f"DEBUG: Updated user result: {response.data[0]}")
                 return response.data[0]
         
         return existing_user
@@ -49,9 +64,9 @@ def get_or_create_user(firebase_uid: str, email: str = None, name: str = None):
             'email': email,
             'name': name
         }
-        print(f"DEBUG: Creating new user with data: {user_data}")
+        debug_sampled(logger, "Creating new user for firebase_uid=%s", firebase_uid)
         response = supabase.table('users').insert(user_data).execute()
-        print(f"DEBUG: New user created: {response.data[0]}")
+        debug_sampled(logger, "New user created: %s", truncated(response.data[0]))
         return response.data[0]
 
 def store_message(user_id: str, role: str, content: str, metadata: dict = None):
@@ -64,6 +79,13 @@ def store_message(user_id: str, role: str, content: str, metadata: dict = None):
     response = supabase.table('messages').insert(message_data).execute()
     return response.data[0]
 
+def store_messages(messages: list):
+    """
+    Insert several message rows in one request.
+    Rows carry their own ids, so a retried batch skips rows that already landed.
+    """
+    supabase.table('messages').upsert(messages, on_conflict='id', ignore_duplicates=True).execute()
+
 def get_recent_messages(user_id: str, limit: int = None):
     # Get the most recent messages (newest first)
     query = supabase.table('messages').select('*').eq('user_id', user_id).order('created_at', desc=True)
@@ -72,17 +94,15 @@ def get_recent_messages(user_id: str, limit: int = None):
         query = query.limit(limit)
     
     response = query.execute()
-    print(f"DEBUG: Raw database response: {response.data}")
+    debug_sampled(logger, "Fetched messages for user %s: %s", user_id, summarize_messages(response.data))
     # Reverse to get chronological order (oldest first)
-    reversed_data = list(reversed(response.data))
-    print(f"DEBUG: Reversed data: {reversed_data}")
-    return reversed_data
+    return list(reversed(response.data))
 
 def clear_user_messages(user_id: str):
     """
     Deletes all messages for a specific user.
     """
-    print(f"DEBUG: Clearing all messages for user_id: {user_id}")
+    logger.info(f"Clearing all messages for user_id: {user_id}")
     response = supabase.table('messages').delete().eq('user_id', user_id).execute()
-    print(f"DEBUG: Clear messages response: {response}")
+    debug_sampled(logger, "Cleared %d messages for user_id %s", len(response.data or []), user_id)
     return response
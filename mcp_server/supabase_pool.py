@@ -0,0 +1,216 @@
+"""
+Pooled, keep-alive HTTP transport for the Supabase client
+Table, RPC and storage calls share one connection pool instead of each
+sub-client opening its own httpx client with default settings
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestSyncClient
+from storage3 import SyncStorageClient
+from storage3.utils import SyncClient as StorageSyncClient
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 multiplexes concurrent requests over one connection; needs the h2 package
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "false").lower() in ("1", "true", "yes")
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "30"))
+SUPABASE_WRITE_TIMEOUT = float(os.getenv("SUPABASE_WRITE_TIMEOUT", "30"))
+# How long a request waits for a free connection when the pool is exhausted
+SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "5"))
+# Storage uploads/downloads move whole files, so they get a longer read timeout
+SUPABASE_STORAGE_READ_TIMEOUT = float(os.getenv("SUPABASE_STORAGE_READ_TIMEOUT", "120"))
+# Connection-level retries (connect errors only, never a sent request)
+SUPABASE_CONNECT_RETRIES = int(os.getenv("SUPABASE_CONNECT_RETRIES", "1"))
+
+
+def http2_enabled() -> bool:
+    if not SUPABASE_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("SUPABASE_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+    )
+
+
+def pool_timeout(read: float = SUPABASE_READ_TIMEOUT) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=SUPABASE_CONNECT_TIMEOUT,
+        read=read,
+        write=SUPABASE_WRITE_TIMEOUT,
+        pool=SUPABASE_POOL_TIMEOUT
+    )
+
+
+def pool_config() -> Dict[str, object]:
+    """Effective pool settings (shown in admin stats)"""
+    return {
+        'max_connections': SUPABASE_POOL_MAX_CONNECTIONS,
+        'max_keepalive_connections': SUPABASE_POOL_MAX_KEEPALIVE,
+        'keepalive_expiry_seconds': SUPABASE_KEEPALIVE_EXPIRY,
+        'http2': http2_enabled(),
+        'connect_timeout_seconds': SUPABASE_CONNECT_TIMEOUT,
+        'read_timeout_seconds': SUPABASE_READ_TIMEOUT,
+        'pool_timeout_seconds': SUPABASE_POOL_TIMEOUT
+    }
+
+
+class SharedTransport:
+    """
+    One sync and one async connection pool per Supabase project.
+
+    httpx clients own their transport, so the sub-clients get a wrapper whose
+    close() is a no-op; the pool itself is closed once, by close().
+    """
+
+    def __init__(self):
+        http2 = http2_enabled()
+        self.sync = httpx.HTTPTransport(
+            limits=pool_limits(), http2=http2, retries=SUPABASE_CONNECT_RETRIES
+        )
+        self.async_ = httpx.AsyncHTTPTransport(
+            limits=pool_limits(), http2=http2, retries=SUPABASE_CONNECT_RETRIES
+        )
+
+    def sync_view(self) -> httpx.BaseTransport:
+        return _UnclosableTransport(self.sync)
+
+    def async_view(self) -> httpx.AsyncBaseTransport:
+        return _UnclosableAsyncTransport(self.async_)
+
+    def close(self) -> None:
+        self.sync.close()
+
+    async def aclose(self) -> None:
+        await self.async_.aclose()
+
+
+class _UnclosableTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.HTTPTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._transport.handle_request(request)
+
+    def close(self) -> None:
+        pass
+
+
+class _UnclosableAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """Sync PostgREST client (tables and RPC) on the shared pool"""
+
+    def __init__(self, *args, transport: SharedTransport, **kwargs):
+        self._shared_transport = transport
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return PostgrestSyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_timeout(),
+            transport=self._shared_transport.sync_view()
+        )
+
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client for async handlers, on the shared async pool"""
+
+    def __init__(self, *args, transport: SharedTransport, **kwargs):
+        self._shared_transport = transport
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_timeout(),
+            transport=self._shared_transport.async_view()
+        )
+
+
+class PooledStorageClient(SyncStorageClient):
+    """Storage client on the shared pool"""
+
+    def __init__(self, *args, transport: SharedTransport, **kwargs):
+        self._shared_transport = transport
+        super().__init__(*args, **kwargs)
+
+    def _create_session(self, base_url, headers, timeout, verify=True):
+        return StorageSyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_timeout(read=SUPABASE_STORAGE_READ_TIMEOUT),
+            transport=self._shared_transport.sync_view()
+        )
+
+
+class PooledSupabaseClient(Client):
+    """
+    supabase.Client whose table, RPC and storage sub-clients share one
+    keep-alive connection pool. The sub-clients are still created lazily and
+    recreated on auth changes exactly like the stock client; only their
+    HTTP sessions differ.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str, options: Optional[ClientOptions] = None):
+        self.transport = SharedTransport()
+        self._async_postgrest: Optional[AsyncPostgrestClient] = None
+        self._async_lock = threading.Lock()
+        super().__init__(supabase_url, supabase_key, options or ClientOptions())
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, **kwargs):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, transport=self.transport)
+
+    def _init_storage_client(self, storage_url, headers, storage_client_timeout=None, **kwargs):
+        return PooledStorageClient(storage_url, headers, transport=self.transport)
+
+    @property
+    def async_postgrest(self) -> AsyncPostgrestClient:
+        """Async PostgREST client sharing the pool settings (for use inside async handlers)"""
+        if self._async_postgrest is None:
+            with self._async_lock:
+                if self._async_postgrest is None:
+                    self._async_postgrest = PooledAsyncPostgrestClient(
+                        self.rest_url,
+                        headers=self.options.headers,
+                        schema=self.options.schema,
+                        transport=self.transport
+                    )
+        return self._async_postgrest
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -1,23 +1,102 @@
 import bcrypt
+import base64
 from jose import jwt
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import TokenBucketLimiter
+from ttl_cache import TTLCache
 
 # JWT settings
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
+# Dashboard stats are cached briefly so auto-refresh does not hit the database each time
+ADMIN_STATS_CACHE_TTL = float(os.getenv("ADMIN_STATS_CACHE_TTL", "30"))
+_stats_cache = TTLCache(ttl=ADMIN_STATS_CACHE_TTL, max_entries=4, name="admin_stats")
+
+# Active admin principals are cached by id so each admin API call does not re-read admin_users.
+# Revocations are held in memory, so they apply to the worker process that handled them.
+ADMIN_PRINCIPAL_CACHE_TTL = float(os.getenv("ADMIN_PRINCIPAL_CACHE_TTL", "60"))
+ADMIN_PRINCIPAL_COLUMNS = 'id, email, name, is_active, created_at, last_login'
+_principal_cache = TTLCache(ttl=ADMIN_PRINCIPAL_CACHE_TTL, max_entries=256, name="admin_principals")
+_revoked_tokens: Dict[str, float] = {}  # jti -> token expiry (unix time)
+_revoked_before: Dict[str, float] = {}  # admin_id -> tokens issued before this are rejected
+_revocation_lock = threading.Lock()
+
+# Password hashing runs on a small dedicated pool so a burst of logins cannot occupy
+# every server thread; callers beyond workers + queue wait at most the queue timeout.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_QUEUED = int(os.getenv("BCRYPT_MAX_QUEUED", "8"))
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "2"))
+_password_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_QUEUED)
+
+# Login attempts are limited before any hashing happens: tightly per client IP and
+# loosely per email across all clients, so bad passwords sent from one address
+# cannot lock a real admin out
+ADMIN_LOGIN_BURST = float(os.getenv("ADMIN_LOGIN_BURST", "5"))
+ADMIN_LOGIN_PER_MINUTE = float(os.getenv("ADMIN_LOGIN_PER_MINUTE", "5"))
+ADMIN_LOGIN_EMAIL_BURST = float(os.getenv("ADMIN_LOGIN_EMAIL_BURST", "50"))
+ADMIN_LOGIN_EMAIL_PER_MINUTE = float(os.getenv("ADMIN_LOGIN_EMAIL_PER_MINUTE", "20"))
+# Longest Retry-After reported (a zero refill rate would otherwise mean "never")
+ADMIN_LOGIN_MAX_RETRY_AFTER = 3600.0
+_login_limiter = TokenBucketLimiter(ADMIN_LOGIN_BURST, ADMIN_LOGIN_PER_MINUTE / 60.0)
+_email_login_limiter = TokenBucketLimiter(ADMIN_LOGIN_EMAIL_BURST, ADMIN_LOGIN_EMAIL_PER_MINUTE / 60.0)
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool is saturated"""
+
+def _run_password_task(fn, *args):
+    """Run a bcrypt call on the dedicated pool, blocking the calling thread only"""
+    if not _password_slots.acquire(timeout=BCRYPT_QUEUE_TIMEOUT):
+        raise PasswordHasherBusy("Password hashing pool is saturated")
+    try:
+        return _password_pool.submit(fn, *args).result()
+    finally:
+        _password_slots.release()
+
+def _hash_password(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def hash_password(password: str) -> str:
+    """Hash password using bcrypt with the configured cost factor"""
+    return _run_password_task(_hash_password, password)
+
 def verify_password(password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return _run_password_task(_verify_password, password, hashed_password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a bcrypt hash was made with a different cost factor than BCRYPT_ROUNDS"""
+    try:
+        # Format: $2b$<cost>$<salt+hash>
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def check_login_rate(email: str, client_ip: str) -> float:
+    """
+    Consume a login attempt for this email and client IP.
+    Returns 0 when allowed, otherwise seconds (at most ADMIN_LOGIN_MAX_RETRY_AFTER)
+    until the next attempt is allowed.
+    """
+    email = email.strip().lower()
+    retry_after = _login_limiter.acquire(f"ip:{client_ip}" if client_ip else f"unknown-client:{email}")
+    retry_after = max(retry_after, _email_login_limiter.acquire(f"email:{email}"))
+    return min(retry_after, ADMIN_LOGIN_MAX_RETRY_AFTER)
 
 def create_admin_user(email: str, password: str, name: str) -> Dict[str, Any]:
     """Create a new admin user"""
@@ -98,16 +177,25 @@ def authenticate_admin(email: str, password: str) -> Dict[str, Any]:
                 'error': 'Invalid credentials'
             }
         
-        # Update last login
-        supabase.table('admin_users').update({
+        # Update last login, upgrading the hash if the configured cost factor changed
+        login_update = {
             'last_login': datetime.now().isoformat()
-        }).eq('id', admin['id']).execute()
+        }
+        if password_needs_rehash(admin['password_hash']):
+            login_update['password_hash'] = hash_password(password)
+        supabase.table('admin_users').update(login_update).eq('id', admin['id']).execute()
         
         # Generate JWT token
+        issued = time.time()
+        issued_at = datetime.utcfromtimestamp(issued)
         token_data = {
             'admin_id': admin['id'],
             'email': admin['email'],
-            'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
+            'jti': uuid.uuid4().hex,
+            'iat': issued_at,
+            # iat has whole seconds only; revocation cutoffs are compared with this
+            'iat_ms': int(issued * 1000),
+            'exp': issued_at + timedelta(hours=JWT_EXPIRATION_HOURS)
         }
         
         token = jwt.encode(token_data, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
@@ -122,14 +210,52 @@ def authenticate_admin(email: str, password: str) -> Dict[str, Any]:
             }
         }
         
+    except PasswordHasherBusy as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'busy': True
+        }
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
         }
 
+def _load_admin_principal(admin_id: str) -> Optional[Dict[str, Any]]:
+    from supabase_client import supabase
+    
+    response = supabase.table('admin_users').select(ADMIN_PRINCIPAL_COLUMNS).eq('id', admin_id).eq('is_active', True).execute()
+    return response.data[0] if response.data else None
+
+def _is_revoked(payload: Dict[str, Any]) -> bool:
+    with _revocation_lock:
+        jti = payload.get('jti')
+        if jti and jti in _revoked_tokens:
+            return True
+        cutoff = _revoked_before.get(payload.get('admin_id'))
+        if cutoff is None:
+            return False
+        if 'iat_ms' in payload:
+            # A login right after "revoke all sessions" is issued after the cutoff
+            return payload['iat_ms'] <= int(cutoff * 1000)
+        # Tokens from before iat_ms: whole seconds, so the revocation second is rejected too
+        return payload.get('iat', 0) <= cutoff
+
+def _prune_revocations_locked(now: float) -> None:
+    for jti in [jti for jti, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[jti]
+    stale = now - JWT_EXPIRATION_HOURS * 3600
+    for admin_id in [a for a, cutoff in _revoked_before.items() if cutoff <= stale]:
+        del _revoked_before[admin_id]
+
 def verify_admin_token(token: str) -> Optional[Dict[str, Any]]:
-    """Verify admin JWT token"""
+    """
+    Verify admin JWT token.
+
+    The signature and expiry are checked locally; the admin principal comes from a
+    short-lived cache so that only the first call per TTL reads admin_users.
+    """
     try:
         from supabase_client import supabase
         
@@ -139,27 +265,116 @@ def verify_admin_token(token: str) -> Optional[Dict[str, Any]]:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         admin_id = payload.get('admin_id')
         
-        if not admin_id:
+        if not admin_id or _is_revoked(payload):
             return None
         
-        # Get admin user from database
-        response = supabase.table('admin_users').select('*').eq('id', admin_id).eq('is_active', True).execute()
-        
-        if response.data:
-            return response.data[0]
-        else:
-            return None
+        return _principal_cache.get_or_load(admin_id, lambda: _load_admin_principal(admin_id))
             
     except jwt.ExpiredSignatureError:
         return None
-    except jwt.InvalidTokenError:
+    except jwt.JWTError:
         return None
     except Exception as e:
         print(f"Error verifying admin token: {e}")
         return None
 
-def get_all_files(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
-    """Get all files for admin dashboard"""
+def revoke_admin_token(token: str) -> bool:
+    """Revoke a single admin token (e.g. on logout) until it expires"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.JWTError:
+        return False
+    
+    now = time.time()
+    with _revocation_lock:
+        _prune_revocations_locked(now)
+        jti = payload.get('jti')
+        if jti:
+            _revoked_tokens[jti] = float(payload.get('exp', now))
+        else:
+            # Tokens issued before jti was added can only be revoked per admin
+            _revoked_before[payload.get('admin_id')] = now
+    return True
+
+def invalidate_admin_principal(admin_id: str, revoke_tokens: bool = False) -> None:
+    """Drop a cached admin principal; optionally reject every token issued to it so far"""
+    _principal_cache.invalidate(admin_id)
+    if revoke_tokens:
+        now = time.time()
+        with _revocation_lock:
+            _prune_revocations_locked(now)
+            _revoked_before[admin_id] = now
+
+def deactivate_admin_user(admin_id: str) -> bool:
+    """Deactivate an admin user and immediately reject their outstanding tokens"""
+    try:
+        from supabase_client import supabase
+        
+        if supabase is None:
+            return False
+        
+        response = supabase.table('admin_users').update({'is_active': False}).eq('id', admin_id).execute()
+        invalidate_admin_principal(admin_id, revoke_tokens=True)
+        return bool(response.data)
+        
+    except Exception as e:
+        print(f"Error deactivating admin user: {e}")
+        return False
+
+def get_auth_cache_stats() -> Dict[str, Any]:
+    """Principal cache hit rate and revocation list size"""
+    with _revocation_lock:
+        revoked_tokens = len(_revoked_tokens)
+        revoked_admins = len(_revoked_before)
+    return {
+        **_principal_cache.stats(),
+        'revoked_tokens': revoked_tokens,
+        'revoked_admins': revoked_admins,
+        'login_rate_limit': {'client': _login_limiter.stats(), 'email': _email_login_limiter.stats()}
+    }
+
+# Admin file listing
+ADMIN_FILES_MAX_PAGE_SIZE = 500
+ADMIN_FILES_COUNT_MODES = ('exact', 'planned', 'estimated')
+
+def encode_files_cursor(created_at: str, file_id: str) -> str:
+    """Encode the (created_at, id) keyset position of a files row as an opaque cursor"""
+    raw = f"{created_at}|{file_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_files_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by encode_files_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, file_id = raw.rsplit('|', 1)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    # Both parts end up inside a PostgREST or() filter: accept only a timestamp and a UUID
+    try:
+        datetime.fromisoformat(created_at)
+        file_id = str(uuid.UUID(file_id))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    return created_at, file_id
+
+def _apply_file_filters(query, status: str = None, user_id: str = None, file_type: str = None):
+    if status:
+        query = query.eq('upload_status', status)
+    if user_id:
+        query = query.eq('user_id', user_id)
+    if file_type:
+        query = query.eq('file_type', file_type.lower())
+    return query
+
+def get_all_files(limit: int = 100, cursor: str = None, status: str = None, user_id: str = None,
+                  file_type: str = None, count_mode: str = 'exact', include_total: bool = True) -> Dict[str, Any]:
+    """
+    Get files for admin dashboard, newest first, using keyset pagination on (created_at, id).
+
+    Pass the returned next_cursor back as cursor to fetch the following page. The total
+    honours the filters but not the cursor; count_mode 'planned' or 'estimated' avoids
+    an exact count on large tables.
+    """
     try:
         from supabase_client import supabase
         
@@ -169,14 +384,52 @@ def get_all_files(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
                 'error': 'Supabase client not initialized'
             }
         
-        response = supabase.table('files').select(
-            'id, filename, original_filename, file_size, upload_status, created_at, updated_at, users!inner(name, email)'
-        ).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        if count_mode not in ADMIN_FILES_COUNT_MODES:
+            return {
+                'success': False,
+                'error': f"Invalid count mode: {count_mode}"
+            }
+        
+        limit = max(1, min(limit, ADMIN_FILES_MAX_PAGE_SIZE))
+        columns = 'id, user_id, filename, original_filename, file_type, file_size, upload_status, created_at, updated_at, users(name, email)'
+        
+        # On the first page the total comes back with the rows in the same round-trip.
+        # Later pages need a separate count because the cursor filter would shrink it.
+        count_inline = include_total and not cursor
+        query = supabase.table('files').select(columns, count=count_mode if count_inline else None)
+        query = _apply_file_filters(query, status, user_id, file_type)
+        
+        if cursor:
+            created_at, file_id = decode_files_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{file_id})'
+            )
+        
+        # Fetch one extra row to know whether another page exists
+        response = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+        rows = response.data or []
+        has_more = len(rows) > limit
+        files = rows[:limit]
+        
+        total = None
+        if count_inline:
+            total = response.count
+        elif include_total:
+            count_query = supabase.table('files').select('id', count=count_mode)
+            count_response = _apply_file_filters(count_query, status, user_id, file_type).limit(1).execute()
+            total = count_response.count
+        
+        next_cursor = None
+        if has_more and files:
+            next_cursor = encode_files_cursor(files[-1]['created_at'], files[-1]['id'])
         
         return {
             'success': True,
-            'files': response.data if response.data else [],
-            'total': len(response.data) if response.data else 0
+            'files': files,
+            'total': total,
+            'total_is_estimate': total is not None and count_mode != 'exact',
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }
         
     except Exception as e:
@@ -185,8 +438,16 @@ def get_all_files(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
             'error': str(e)
         }
 
-def get_file_details(file_id: str) -> Dict[str, Any]:
-    """Get detailed file information including chunks"""
+# Admin file details
+ADMIN_CHUNK_METADATA_LIMIT = 1000
+ADMIN_CHUNKS_MAX_PAGE_SIZE = 200
+
+def get_file_details(file_id: str, metadata_limit: int = ADMIN_CHUNK_METADATA_LIMIT) -> Dict[str, Any]:
+    """
+    Get file information with chunk metadata and count.
+
+    Chunk content is not included; fetch it page by page with get_file_chunks.
+    """
     try:
         from supabase_client import supabase
         
@@ -198,7 +459,7 @@ def get_file_details(file_id: str) -> Dict[str, Any]:
         
         # Get file info
         file_response = supabase.table('files').select(
-            '*, users!inner(name, email)'
+            '*, users(name, email)'
         ).eq('id', file_id).execute()
         
         if not file_response.data:
@@ -209,13 +470,64 @@ def get_file_details(file_id: str) -> Dict[str, Any]:
         
         file_info = file_response.data[0]
         
-        # Get file chunks
-        chunks_response = supabase.table('file_chunks').select('*').eq('file_id', file_id).order('chunk_index').execute()
+        # Chunk metadata and the exact count in one request
+        chunks_response = supabase.table('file_chunks').select(
+            'id, chunk_index, page_number', count='exact'
+        ).eq('file_id', file_id).order('chunk_index').limit(metadata_limit).execute()
+        chunks = chunks_response.data if chunks_response.data else []
+        chunk_count = chunks_response.count if chunks_response.count is not None else len(chunks)
         
         return {
             'success': True,
             'file': file_info,
-            'chunks': chunks_response.data if chunks_response.data else []
+            'chunk_count': chunk_count,
+            'chunks': chunks,
+            'chunks_truncated': chunk_count > len(chunks)
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def get_file_chunks(file_id: str, after_index: int = -1, limit: int = 50, query: str = None) -> Dict[str, Any]:
+    """
+    Get a page of chunk content for a file, ordered by chunk_index.
+
+    Pass the returned next_after_index back as after_index for the following page.
+    query restricts the page to chunks matching a full-text search (english config,
+    served by idx_file_chunks_content_fts).
+    """
+    try:
+        from supabase_client import supabase
+        
+        if supabase is None:
+            return {
+                'success': False,
+                'error': 'Supabase client not initialized'
+            }
+        
+        limit = max(1, min(limit, ADMIN_CHUNKS_MAX_PAGE_SIZE))
+        request = supabase.table('file_chunks').select(
+            'id, chunk_index, page_number, content, created_at'
+        ).eq('file_id', file_id).gt('chunk_index', after_index)
+        
+        if query:
+            request = request.text_search('content', query, options={'type': 'plain', 'config': 'english'})
+        
+        # Fetch one extra row to know whether another page exists
+        response = request.order('chunk_index').limit(limit + 1).execute()
+        rows = response.data if response.data else []
+        has_more = len(rows) > limit
+        chunks = rows[:limit]
+        
+        return {
+            'success': True,
+            'file_id': file_id,
+            'chunks': chunks,
+            'has_more': has_more,
+            'next_after_index': chunks[-1]['chunk_index'] if has_more and chunks else None
         }
         
     except Exception as e:
@@ -251,6 +563,7 @@ def delete_file_admin(file_id: str) -> bool:
     """Delete file (admin function)"""
     try:
         from supabase_client import supabase
+        from retrieval_backends import get_retrieval_backend
         
         if supabase is None:
             return False
@@ -270,6 +583,7 @@ def delete_file_admin(file_id: str) -> bool:
         
         # Delete file record (cascade will handle chunks and embeddings)
         supabase.table('files').delete().eq('id', file_id).execute()
+        get_retrieval_backend().delete_file(file_record['user_id'], file_id)
         
         return True
         
@@ -277,10 +591,56 @@ def delete_file_admin(file_id: str) -> bool:
         print(f"Error deleting file: {e}")
         return False
 
-def get_system_stats() -> Dict[str, Any]:
-    """Get system statistics for admin dashboard"""
+def _count_system_stats(supabase) -> Dict[str, Any]:
+    """Fallback for databases without the admin_system_stats() function"""
+    # Get user count
+    users_response = supabase.table('users').select('id', count='exact').limit(1).execute()
+    user_count = users_response.count if hasattr(users_response, 'count') else 0
+    
+    # Get file count
+    files_response = supabase.table('files').select('id', count='exact').limit(1).execute()
+    file_count = files_response.count if hasattr(files_response, 'count') else 0
+    
+    # Get processed files count
+    processed_response = supabase.table('files').select('id', count='exact').eq('upload_status', 'processed').limit(1).execute()
+    processed_count = processed_response.count if hasattr(processed_response, 'count') else 0
+    
+    # Get message count
+    messages_response = supabase.table('messages').select('id', count='exact').limit(1).execute()
+    message_count = messages_response.count if hasattr(messages_response, 'count') else 0
+    
+    return {
+        'total_users': user_count,
+        'total_files': file_count,
+        'processed_files': processed_count,
+        'total_messages': message_count
+    }
+
+def _load_system_stats(use_estimates: bool) -> Dict[str, Any]:
+    from supabase_client import supabase
+    
+    try:
+        response = supabase.rpc('admin_system_stats', {'use_estimates': use_estimates}).execute()
+        if response.data:
+            return response.data
+    except Exception as e:
+        print(f"admin_system_stats RPC failed, falling back to count queries: {e}")
+    return _count_system_stats(supabase)
+
+def get_system_stats(use_estimates: bool = False, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get system statistics for admin dashboard.
+
+    Served from a short-lived cache so the dashboard's auto-refresh (and several
+    admins looking at it) cost at most one database round-trip per TTL.
+    """
     try:
         from supabase_client import supabase
+        # Imported here so the admin and health paths do not load numpy and the retrieval stack
+        from answer_cache import answer_cache
+        from message_writer import message_writer
+        from retrieval_backends import get_retrieval_backend
+        from warmup import startup_state
         
         if supabase is None:
             return {
@@ -288,30 +648,23 @@ def get_system_stats() -> Dict[str, Any]:
                 'error': 'Supabase client not initialized'
             }
         
-        # Get user count
-        users_response = supabase.table('users').select('id', count='exact').execute()
-        user_count = users_response.count if hasattr(users_response, 'count') else 0
-        
-        # Get file count
-        files_response = supabase.table('files').select('id', count='exact').execute()
-        file_count = files_response.count if hasattr(files_response, 'count') else 0
-        
-        # Get processed files count
-        processed_response = supabase.table('files').select('id', count='exact').eq('upload_status', 'processed').execute()
-        processed_count = processed_response.count if hasattr(processed_response, 'count') else 0
-        
-        # Get message count
-        messages_response = supabase.table('messages').select('id', count='exact').execute()
-        message_count = messages_response.count if hasattr(messages_response, 'count') else 0
+        key = ('system_stats', use_estimates)
+        if refresh:
+            _stats_cache.invalidate(key)
+        entry = _stats_cache.get_or_load(
+            key, lambda: {'stats': _load_system_stats(use_estimates), 'loaded_at': time.time()}
+        )
         
         return {
             'success': True,
-            'stats': {
-                'total_users': user_count,
-                'total_files': file_count,
-                'processed_files': processed_count,
-                'total_messages': message_count
-            }
+            'stats': entry['stats'],
+            'auth_cache': get_auth_cache_stats(),
+            'message_writer': message_writer.stats(),
+            'answer_cache': answer_cache.stats(),
+            'startup': startup_state.snapshot(),
+            'retrieval_backend': get_retrieval_backend().stats(),
+            'cache_age_seconds': round(time.time() - entry['loaded_at'], 1),
+            'cache_ttl_seconds': _stats_cache.ttl
         }
         
     except Exception as e:
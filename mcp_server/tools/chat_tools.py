@@ -1,14 +1,25 @@
 from supabase_client import get_or_create_user, get_recent_messages, store_message as supabase_store_message, clear_user_messages
+from message_writer import message_writer
 
-def get_chat_history(firebase_uid: str, limit: int = None):
+def get_chat_history(firebase_uid: str, limit: int = None, user: dict = None):
     """
     Gets the chat history for a given user.
     If limit is None, fetches all messages.
+    Messages still waiting in the write-behind queue are included.
     """
-    user = get_or_create_user(firebase_uid)
+    user = user or get_or_create_user(firebase_uid)
     if limit is None:
-        return get_recent_messages(user['id'])
-    return get_recent_messages(user['id'], limit)
+        history = get_recent_messages(user['id'])
+    else:
+        history = get_recent_messages(user['id'], limit)
+    pending = message_writer.pending_for(user['id'])
+    if pending:
+        stored_ids = {message.get('id') for message in history}
+        history = history + [message for message in pending if message['id'] not in stored_ids]
+        history.sort(key=lambda message: message.get('created_at') or '')
+        if limit is not None:
+            history = history[-limit:]
+    return history
 
 def store_message(firebase_uid: str, role: str, content: str):
     """
@@ -17,9 +28,17 @@ def store_message(firebase_uid: str, role: str, content: str):
     user = get_or_create_user(firebase_uid)
     return supabase_store_message(user['id'], role, content)
 
+def queue_messages(messages: list):
+    """
+    Queues message rows (see message_writer.build_message) for a single
+    bulk insert after the response has been sent.
+    """
+    message_writer.enqueue(messages)
+
 def clear_chat_history(firebase_uid: str):
     """
     Clears all chat history for a given user.
     """
     user = get_or_create_user(firebase_uid)
+    message_writer.discard_pending(user['id'])
     return clear_user_messages(user['id'])
@@ -1,15 +1,37 @@
 import os
 import uuid
 import hashlib
+import contextvars
+import importlib.util
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait as futures_wait
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-import PyPDF2
 import io
 import json
 
-# Import enhanced embedding functions
+import numpy as np
+
+import metrics
+from deadline import DeadlineExceeded, optional_stage_allowed, remaining_seconds
+from log_utils import debug_sampled
+from profiler import profile_stage
+from ttl_cache import TTLCache
+from retrieval_backends import get_retrieval_backend
+
+logger = logging.getLogger(__name__)
+
+# Chunk and embedding rows sent per insert request while ingesting a file
+INGEST_INSERT_BATCH_SIZE = int(os.getenv("INGEST_INSERT_BATCH_SIZE", "100"))
+
+# Import enhanced embedding functions. Only the presence of sentence-transformers is
+# checked here; the library itself loads with the models, on first use or at warmup
 try:
-    from embeddings import generate_embedding, generate_embeddings_batch, rerank_results, EMBEDDING_DIM
+    # With a shared model server (MODEL_SERVER_ADDRESS) the workers need not have it installed
+    if importlib.util.find_spec("sentence_transformers") is None and not os.getenv("MODEL_SERVER_ADDRESS"):
+        raise ImportError("sentence_transformers is not installed")
+    from embeddings import (generate_embedding, generate_embeddings_batch, generate_embedding_array,
+                            generate_embeddings_array, rerank_results, EMBEDDING_DIM)
     SEMANTIC_EMBEDDINGS_AVAILABLE = True
     print("✅ Semantic embeddings enabled (Sentence Transformers)")
 except ImportError:
@@ -48,15 +70,22 @@ except ImportError:
         """Fallback batch embedding"""
         return [generate_embedding(text) for text in texts]
     
+    def generate_embedding_array(text: str) -> np.ndarray:
+        """Fallback embedding as a float32 array"""
+        return np.asarray(generate_embedding(text), dtype=np.float32)
+    
+    def generate_embeddings_array(texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Fallback batch embedding as a float32 matrix"""
+        return np.asarray(generate_embeddings_batch(texts), dtype=np.float32).reshape(len(texts), EMBEDDING_DIM)
+    
     def rerank_results(query: str, documents: List[str], top_k: Optional[int] = None) -> List[tuple]:
         """Fallback re-ranking (no-op)"""
         return [(idx, 0.5) for idx in range(len(documents))]
 
-def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]:
+def extract_text(file_content: bytes, filename: str) -> Dict[str, Any]:
     """
-    Extract text from various file types
+    Extract text (and per-type counts such as page_count) from various file types, without chunking
     """
-    import os
     import mimetypes
 
     # Detect MIME type from filename
@@ -67,29 +96,24 @@ def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]
     try:
         if mime_type == 'application/pdf':
             from PyPDF2 import PdfReader
-            import io
             pdf_reader = PdfReader(io.BytesIO(file_content))
             text_content = "\n".join([page.extract_text() or "" for page in pdf_reader.pages])
             return {
                 'text': text_content,
                 'mime_type': mime_type,
-                'chunks': _chunk_text(text_content),
                 'page_count': len(pdf_reader.pages)
             }
         elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or filename.lower().endswith('.docx'):
             from docx import Document
-            import io
             doc = Document(io.BytesIO(file_content))
             text_content = "\n".join([para.text for para in doc.paragraphs if para.text])
             return {
                 'text': text_content,
                 'mime_type': mime_type,
-                'chunks': _chunk_text(text_content),
                 'paragraph_count': len(doc.paragraphs)
             }
         elif mime_type == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or filename.lower().endswith('.xlsx'):
             import openpyxl
-            import io
             workbook = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True)
             text_content = []
             for sheet in workbook:
@@ -101,7 +125,6 @@ def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]
             return {
                 'text': text_content,
                 'mime_type': mime_type,
-                'chunks': _chunk_text(text_content),
                 'sheet_count': len(workbook.sheetnames)
             }
         elif mime_type in ['text/plain', 'text/html', 'application/json', 'text/csv', 'application/xml', 'text/xml'] or any(filename.lower().endswith(ext) for ext in ['.txt','.html','.json','.csv','.xml']):
@@ -112,14 +135,21 @@ def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]
                 text_content = soup.get_text()
             return {
                 'text': text_content,
-                'mime_type': mime_type,
-                'chunks': _chunk_text(text_content)
+                'mime_type': mime_type
             }
         else:
             raise ValueError(f"Unsupported file type: {mime_type}")
     except Exception as e:
         raise Exception(f"Error extracting text from {filename}: {str(e)}")
 
+def extract_text_from_file(file_content: bytes, filename: str) -> Dict[str, Any]:
+    """
+    Extract text from various file types and split it into chunks
+    """
+    extracted = extract_text(file_content, filename)
+    extracted['chunks'] = _chunk_text(extracted['text'])
+    return extracted
+
 def _chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200, default_page: int = 1) -> List[Dict[str, Any]]:
     """
     Split text into overlapping chunks and return structured chunk dicts.
@@ -211,40 +241,64 @@ def create_file_record(user_id: str, filename: str, file_size: int, file_path: s
     except Exception as e:
         raise Exception(f"Failed to create file record: {str(e)}")
 
-def process_file_chunks(file_id: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _normalize_chunks(chunks: List[Any]) -> List[Dict[str, Any]]:
+    normalized: List[Dict[str, Any]] = []
+    for chunk in chunks:
+        # Ensure chunk is a dict
+        if isinstance(chunk, str):
+            chunk = {
+                'chunk_index': len(normalized),
+                'content': chunk,
+                'page_number': None
+            }
+        normalized.append({
+            'chunk_index': chunk.get('chunk_index', len(normalized)),
+            'content': chunk.get('content', ''),
+            'page_number': chunk.get('page_number')
+        })
+    return normalized
+
+def embed_chunks(chunks: List[Dict[str, Any]]) -> np.ndarray:
+    """Embedding vectors for the chunks (one float32 row each), computed in batches"""
+    return generate_embeddings_array([chunk.get('content', '') for chunk in chunks])
+
+def store_chunks(file_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray,
+                 user_uuid: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Insert chunk rows, INGEST_INSERT_BATCH_SIZE rows per request, and index their
+    embeddings in the retrieval backend
+    """
+    from supabase_client import supabase
+    if supabase is None:
+        raise Exception("Supabase client not initialized")
+    if user_uuid is None:
+        user_uuid = supabase.table('files').select('user_id').eq('id', file_id).execute().data[0]['user_id']
+    backend = get_retrieval_backend()
+    chunk_records: List[Dict[str, Any]] = []
+    for offset in range(0, len(chunks), INGEST_INSERT_BATCH_SIZE):
+        batch = chunks[offset:offset + INGEST_INSERT_BATCH_SIZE]
+        chunk_response = supabase.table('file_chunks').insert([
+            {'file_id': file_id, **chunk} for chunk in batch
+        ]).execute()
+        if not chunk_response.data:
+            continue
+        vector_by_index = {
+            chunk['chunk_index']: vector
+            for chunk, vector in zip(batch, vectors[offset:offset + INGEST_INSERT_BATCH_SIZE])
+        }
+        records = [record for record in chunk_response.data if record.get('chunk_index') in vector_by_index]
+        backend.index_chunks(user_uuid, records, [vector_by_index[record['chunk_index']] for record in records],
+                             client=supabase)
+        chunk_records.extend(chunk_response.data)
+    return chunk_records
+
+def process_file_chunks(file_id: str, chunks: List[Dict[str, Any]],
+                        user_uuid: Optional[str] = None) -> List[Dict[str, Any]]:
     """Process and store file chunks with embeddings"""
     try:
-        from supabase_client import supabase
-        if supabase is None:
-            raise Exception("Supabase client not initialized")
-        chunk_records: List[Dict[str, Any]] = []
-        for chunk in chunks:
-            # Ensure chunk is a dict
-            if isinstance(chunk, str):
-                chunk = {
-                    'chunk_index': len(chunk_records),
-                    'content': chunk,
-                    'page_number': None
-                }
-            chunk_data = {
-                'file_id': file_id,
-                'chunk_index': chunk.get('chunk_index', len(chunk_records)),
-                'content': chunk.get('content', ''),
-                'page_number': chunk.get('page_number')
-            }
-            chunk_response = supabase.table('file_chunks').insert(chunk_data).execute()
-            if not chunk_response.data:
-                continue
-            chunk_record = chunk_response.data[0]
-            chunk_records.append(chunk_record)
-            embedding = generate_embedding(chunk_data['content'])
-            embedding_data = {
-                'file_chunk_id': chunk_record['id'],
-                'vector': embedding,
-                'content_type': 'file_chunk'
-            }
-            supabase.table('embeddings').insert(embedding_data).execute()
-        return chunk_records
+        chunks = _normalize_chunks(chunks)
+        vectors = embed_chunks(chunks)
+        return store_chunks(file_id, chunks, vectors, user_uuid)
     except Exception as e:
         raise Exception(f"Failed to process file chunks: {str(e)}")
 
@@ -264,7 +318,7 @@ def upload_pdf_file(user_id: str, filename: str, file_content: bytes) -> Dict[st
             'upload_status': 'processing'
         }).eq('id', file_record['id']).execute()
         try:
-            chunk_records = process_file_chunks(file_record['id'], extracted_data['chunks'])
+            chunk_records = process_file_chunks(file_record['id'], extracted_data['chunks'], user_uuid)
             supabase.table('files').update({
                 'upload_status': 'processed',
                 'updated_at': datetime.now().isoformat()
@@ -278,6 +332,8 @@ def upload_pdf_file(user_id: str, filename: str, file_content: bytes) -> Dict[st
                 'file_path': file_path
             }
         except Exception as processing_error:
+            # Some chunks may have been indexed before the failure
+            get_retrieval_backend().delete_file(user_uuid, file_record['id'])
             supabase.table('files').update({
                 'upload_status': 'failed',
                 'processing_error': str(processing_error),
@@ -324,7 +380,174 @@ def get_file_by_id(file_id: str) -> Optional[Dict[str, Any]]:
         print(f"Error fetching file: {e}")
         return None
 
-def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_reranking: bool = True) -> List[Dict[str, Any]]:
+# Multi-query retrieval: search with the query plus rewrites of it and fuse the rankings
+MULTI_QUERY_RETRIEVAL = os.getenv("MULTI_QUERY_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+# "llm" rewrites with Gemini (cached, under a deadline); "local" uses a keyword-only rewrite
+MULTI_QUERY_EXPANDER = os.getenv("MULTI_QUERY_EXPANDER", "llm").lower()
+# Seconds to wait for query expansion before searching with the original query alone
+MULTI_QUERY_EXPANSION_TIMEOUT = float(os.getenv("MULTI_QUERY_EXPANSION_TIMEOUT", "0.8"))
+# Seconds to wait for the expansion searches once the original query's search is done
+MULTI_QUERY_SEARCH_TIMEOUT = float(os.getenv("MULTI_QUERY_SEARCH_TIMEOUT", "1.5"))
+RRF_K = 60
+# Vector candidates fetched per requested result when re-ranking
+RETRIEVAL_CANDIDATE_MULTIPLIER = int(os.getenv("RETRIEVAL_CANDIDATE_MULTIPLIER", "3"))
+# Fuse full-text keyword matches (keyword_search_chunks) into the vector results
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+
+_retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+# LLM expansion calls run apart from the searches so slow ones cannot hold up search threads
+_expansion_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-expansion")
+_expansion_cache = TTLCache(ttl=3600, max_entries=2048, name="query_expansions")
+
+def _submit(pool: ThreadPoolExecutor, stage: str, fn, *args):
+    """pool.submit carrying the request's context (deadline, trace, profile session) into the worker"""
+    return pool.submit(contextvars.copy_context().run, profile_stage(stage, fn), *args)
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'do', 'does', 'did', 'what', 'whats',
+    'which', 'who', 'whom', 'when', 'where', 'why', 'how', 'can', 'could', 'would', 'should',
+    'will', 'i', 'me', 'my', 'you', 'your', 'we', 'our', 'it', 'its', 'of', 'in', 'on', 'at',
+    'to', 'for', 'from', 'about', 'please', 'tell', 'show', 'give', 'and', 'or', 'there', 'any'
+}
+
+def _local_rewrites(query: str) -> List[str]:
+    """Cheap rewrite: the query's content words only"""
+    words = [w.strip('?!.,;:\'"()') for w in query.split()]
+    keywords = [w for w in words if w and w.lower() not in _STOPWORDS]
+    rewrite = " ".join(keywords)
+    return [rewrite] if rewrite and rewrite.lower() != query.strip().lower() else []
+
+def _llm_expansions(query: str, conversation_context: Optional[List[Dict[str, Any]]]) -> List[str]:
+    from ai_client import expand_query
+    expansions = expand_query(query, conversation_context)
+    return [q for q in expansions if q != query]
+
+def get_query_variants(query: str, conversation_context: Optional[List[Dict[str, Any]]] = None,
+                       timeout: float = MULTI_QUERY_EXPANSION_TIMEOUT) -> List[str]:
+    """
+    Original query plus rewrites of it.
+
+    LLM expansions are cached; when the call misses the deadline the original query
+    is used alone and the result still lands in the cache for the next time.
+    """
+    if MULTI_QUERY_EXPANDER == "local":
+        return [query] + _local_rewrites(query)
+
+    # Rewrites depend on the conversation, so they are only shared within the same one
+    cache_key = query.strip().lower()
+    if conversation_context:
+        context_json = json.dumps([[m.get('role'), m.get('content')] for m in conversation_context])
+        cache_key += "|" + hashlib.sha256(context_json.encode('utf-8')).hexdigest()
+    cached = _expansion_cache.get(cache_key)
+    if cached is not None:
+        return [query] + cached
+
+    if not optional_stage_allowed("query_expansion"):
+        return [query]
+    timeout = min(timeout, remaining_seconds(timeout))
+
+    future = _submit(_expansion_pool, "query_expansion", _llm_expansions, query, conversation_context)
+
+    def _remember(done):
+        if not done.cancelled() and done.exception() is None:
+            _expansion_cache.set(cache_key, done.result())
+
+    future.add_done_callback(_remember)
+    try:
+        return [query] + future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        metrics.increment("retrieval_expansion_timeouts_total")
+        return [query]
+    except Exception as e:
+        logger.warning(f"Query expansion failed, using original query: {e}")
+        return [query]
+
+def _match_chunks(supabase, query_vector: np.ndarray, match_count: int, user_uuid: str) -> List[Dict[str, Any]]:
+    """Vector similarity search through the configured retrieval backend (RETRIEVAL_BACKEND)"""
+    rows = get_retrieval_backend().search(user_uuid, query_vector, match_count, client=supabase)
+    return [
+        {
+            'id': row['id'],
+            'content': row['content'],
+            'page_number': row.get('page_number'),
+            'file_id': row['file_id'],
+            'similarity_score': row.get('similarity', 0)
+        }
+        for row in (rows or [])
+    ]
+
+def _keyword_chunks(supabase, query: str, match_count: int, user_uuid: str) -> List[Dict[str, Any]]:
+    """Full-text search via the keyword_search_chunks RPC (content words only, as plainto_tsquery ANDs them)"""
+    keywords = _local_rewrites(query) or [query]
+    with metrics.span("keyword_rpc"):
+        rpc_resp = supabase.rpc('keyword_search_chunks', {
+            'search_query': keywords[0],
+            'user_uuid': user_uuid,
+            'match_count': match_count
+        }).execute()
+    return [
+        {
+            'id': row['id'],
+            'content': row['content'],
+            'page_number': row.get('page_number'),
+            'file_id': row['file_id'],
+            'similarity_score': 0.0,
+            'keyword_rank': row.get('rank', 0)
+        }
+        for row in (rpc_resp.data or [])
+    ]
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by reciprocal rank fusion.
+    Each chunk keeps its best similarity_score and gains a fusion_score.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            entry = fused.get(result['id'])
+            if entry is None:
+                entry = fused[result['id']] = {**result, 'fusion_score': 0.0}
+            else:
+                entry['similarity_score'] = max(entry['similarity_score'], result['similarity_score'])
+            entry['fusion_score'] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda r: r['fusion_score'], reverse=True)
+
+def _multi_query_search(supabase, query: str, query_vector: np.ndarray, match_count: int, user_uuid: str,
+                        conversation_context: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Search with the query and its rewrites concurrently, then fuse the rankings"""
+    # The original query's search runs while the rewrites are generated and embedded
+    original_future = _submit(_retrieval_pool, "vector_search", _match_chunks, supabase, query_vector, match_count,
+                              user_uuid)
+    variants = get_query_variants(query, conversation_context)
+    expansion_futures = []
+    if len(variants) > 1:
+        variant_vectors = generate_embeddings_array(variants[1:])
+        expansion_futures = [
+            _submit(_retrieval_pool, "vector_search", _match_chunks, supabase, vector, match_count, user_uuid)
+            for vector in variant_vectors
+        ]
+
+    # Bounded by the request deadline (unbounded without one, like a direct search)
+    try:
+        result_lists = [original_future.result(timeout=remaining_seconds())]
+    except FuturesTimeoutError:
+        raise DeadlineExceeded("retrieval")
+    search_timeout = min(MULTI_QUERY_SEARCH_TIMEOUT, remaining_seconds(MULTI_QUERY_SEARCH_TIMEOUT))
+    done, not_done = futures_wait(expansion_futures, timeout=search_timeout)
+    for future in done:
+        if future.exception() is None:
+            result_lists.append(future.result())
+    if not_done:
+        metrics.increment("retrieval_expansion_search_timeouts_total", amount=len(not_done))
+    metrics.increment("retrieval_multi_query_total", variants=str(len(result_lists)))
+    return reciprocal_rank_fusion(result_lists)
+
+def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_reranking: bool = True,
+                          query_embedding: Optional[np.ndarray] = None, multi_query: Optional[bool] = None,
+                          conversation_context: Optional[List[Dict[str, Any]]] = None,
+                          candidate_multiplier: Optional[int] = None,
+                          hybrid: Optional[bool] = None) -> List[Dict[str, Any]]:
     """
     Search for similar file chunks using semantic vector similarity with optional re-ranking
     
@@ -333,6 +556,14 @@ def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_rerankin
         user_id: Firebase user ID
         limit: Number of results to return
         use_reranking: Whether to use cross-encoder re-ranking for better results
+        query_embedding: Precomputed embedding of query (avoids embedding it twice)
+        multi_query: Also search with rewrites of the query and fuse the results
+                     (defaults to MULTI_QUERY_RETRIEVAL)
+        conversation_context: Recent messages used when rewriting the query
+        candidate_multiplier: Candidates fetched per result when re-ranking
+                              (defaults to RETRIEVAL_CANDIDATE_MULTIPLIER)
+        hybrid: Also run a keyword search and fuse it with the vector results
+                (defaults to HYBRID_RETRIEVAL)
         
     Returns:
         List of matching chunks with similarity scores
@@ -340,47 +571,55 @@ def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_rerankin
     try:
         from supabase_client import supabase, get_or_create_user
         if supabase is None:
-            print("Supabase client not initialized")
+            logger.error("Supabase client not initialized")
             return []
         
+        if multi_query is None:
+            multi_query = MULTI_QUERY_RETRIEVAL
+        if candidate_multiplier is None:
+            candidate_multiplier = RETRIEVAL_CANDIDATE_MULTIPLIER
+        if hybrid is None:
+            hybrid = HYBRID_RETRIEVAL
+        
         # Map Firebase UID to UUID
         user_record = get_or_create_user(user_id)
         user_uuid = user_record['id']
         
         # Generate query embedding using semantic embeddings
-        query_vector = generate_embedding(query)
+        query_vector = query_embedding if query_embedding is not None else generate_embedding_array(query)
         
         # Retrieve more candidates for re-ranking (if enabled)
-        initial_limit = limit * 3 if use_reranking and SEMANTIC_EMBEDDINGS_AVAILABLE else limit
+        initial_limit = limit * max(1, candidate_multiplier) if use_reranking and SEMANTIC_EMBEDDINGS_AVAILABLE else limit
         
         # Call RPC for vector similarity
         try:
-            rpc_resp = supabase.rpc('match_file_chunks', {
-                'query_embedding': query_vector,
-                'match_count': initial_limit,
-                'user_uuid': user_uuid
-            }).execute()
+            keyword_future = (
+                _submit(_retrieval_pool, "keyword_search", _keyword_chunks, supabase, query, initial_limit, user_uuid)
+                if hybrid else None
+            )
+            if multi_query:
+                results = _multi_query_search(supabase, query, query_vector, initial_limit, user_uuid, conversation_context)
+            else:
+                results = _match_chunks(supabase, query_vector, initial_limit, user_uuid)
+            if keyword_future is not None:
+                try:
+                    keyword_results = keyword_future.result()
+                    if keyword_results:
+                        results = reciprocal_rank_fusion([results, keyword_results])
+                except Exception as keyword_error:
+                    logger.warning(f"Keyword search failed, using vector results only: {keyword_error}")
             
-            if rpc_resp.data:
-                results = [
-                    {
-                        'id': row['id'],
-                        'content': row['content'],
-                        'page_number': row.get('page_number'),
-                        'file_id': row['file_id'],
-                        'similarity_score': row.get('similarity', 0)
-                    }
-                    for row in rpc_resp.data
-                ]
-                
+            if results:
                 # Apply re-ranking if enabled and available
-                if use_reranking and SEMANTIC_EMBEDDINGS_AVAILABLE and len(results) > 1:
+                if (use_reranking and SEMANTIC_EMBEDDINGS_AVAILABLE and len(results) > 1
+                        and optional_stage_allowed("rerank")):
                     try:
                         # Extract documents for re-ranking
                         documents = [r['content'] for r in results]
                         
                         # Re-rank using cross-encoder
-                        ranked_indices = rerank_results(query, documents, top_k=limit)
+                        with metrics.span("rerank"):
+                            ranked_indices = rerank_results(query, documents, top_k=limit)
                         
                         # Reorder results based on re-ranking scores
                         reranked_results = []
@@ -391,17 +630,20 @@ def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_rerankin
                             result['similarity_score'] = rerank_score  # Use rerank score as primary
                             reranked_results.append(result)
                         
-                        print(f"✅ Re-ranked {len(results)} results to top {len(reranked_results)}")
+                        debug_sampled(logger, "Re-ranked %d results to top %d", len(results), len(reranked_results))
                         return reranked_results
                         
                     except Exception as rerank_error:
-                        print(f"⚠️  Re-ranking failed, using vector similarity: {rerank_error}")
+                        logger.warning(f"Re-ranking failed, using vector similarity: {rerank_error}")
                         return results[:limit]
                 
                 return results[:limit]
                 
+        except DeadlineExceeded:
+            # Out of time: the text-overlap fallback would only add a full scan
+            raise
         except Exception as e:
-            print(f"Vector RPC failed, falling back to text overlap: {e}")
+            logger.warning(f"Vector RPC failed, falling back to text overlap: {e}")
         
         # Fallback: simple text overlap across user's files
         user_files = get_user_files(user_id)
@@ -431,8 +673,10 @@ def search_similar_chunks(query: str, user_id: str, limit: int = 5, use_rerankin
         chunks_with_scores.sort(key=lambda x: x['similarity_score'], reverse=True)
         return chunks_with_scores[:limit]
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error searching similar chunks: {e}")
+        logger.error(f"Error searching similar chunks: {e}")
         return []
 
 def delete_file(file_id: str, user_id: str) -> bool:
@@ -461,6 +705,7 @@ def delete_file(file_id: str, user_id: str) -> bool:
         
         # Delete file record (cascade will handle chunks and embeddings)
         supabase.table('files').delete().eq('id', file_id).execute()
+        get_retrieval_backend().delete_file(user_uuid, file_id)
         
         return True
         
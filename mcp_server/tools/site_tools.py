@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Any
 _site_facts: Dict[str, str] = {}
 _structural_awareness: Dict[str, Any] = {}
 _functional_awareness: Dict[str, Any] = {}
+# get_ui_context() output, rebuilt after any of the load_* functions runs
+_ui_context: Optional[str] = None
 
 FRONTEND_ROOT_RELATIVE = os.path.join('..', '..', 'NovaFuze_web')
 
@@ -92,7 +94,8 @@ def _scan_directory_for_components(dir_path: str) -> List[Dict[str, str]]:
 
 def load_structural_awareness(project_root: Optional[str] = None) -> Dict[str, Any]:
     """Extract structural information: pages, routes, layout."""
-    global _structural_awareness
+    global _structural_awareness, _ui_context
+    _ui_context = None
     _structural_awareness = {}
     
     root = project_root or os.path.abspath(os.path.join(os.path.dirname(__file__), FRONTEND_ROOT_RELATIVE))
@@ -136,7 +139,8 @@ def load_structural_awareness(project_root: Optional[str] = None) -> Dict[str, A
 
 def load_functional_awareness(project_root: Optional[str] = None) -> Dict[str, Any]:
     """Extract functional information: components, actions, APIs."""
-    global _functional_awareness
+    global _functional_awareness, _ui_context
+    _ui_context = None
     _functional_awareness = {}
     
     root = project_root or os.path.abspath(os.path.join(os.path.dirname(__file__), FRONTEND_ROOT_RELATIVE))
@@ -217,7 +221,8 @@ def load_functional_awareness(project_root: Optional[str] = None) -> Dict[str, A
 
 def load_site_facts(project_root: Optional[str] = None) -> Dict[str, str]:
     """Scan selected frontend files to extract email, phone, and links."""
-    global _site_facts
+    global _site_facts, _ui_context
+    _ui_context = None
     _site_facts = {}
 
     root = project_root or os.path.abspath(os.path.join(os.path.dirname(__file__), FRONTEND_ROOT_RELATIVE))
@@ -277,7 +282,14 @@ def get_functional_awareness() -> Dict[str, Any]:
 
 
 def get_ui_context() -> str:
-    """Get combined UI context for the AI."""
+    """Get combined UI context for the AI (built once per load)."""
+    global _ui_context
+    if _ui_context is None:
+        _ui_context = _build_ui_context()
+    return _ui_context
+
+
+def _build_ui_context() -> str:
     structural = get_structural_awareness()
     functional = get_functional_awareness()
     facts = get_site_facts()
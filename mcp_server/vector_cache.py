@@ -0,0 +1,235 @@
+"""
+Per-user in-memory vector index, a read-through cache over match_file_chunks
+A user's chunk embeddings are loaded once into a contiguous float32 matrix;
+follow-up questions are answered with one matrix-vector product instead of an
+RPC. Entries are evicted least-recently-used to stay under a memory budget and
+are invalidated by the file_tools upload/delete paths of this process.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import metrics
+from embeddings import parse_vector
+
+# Off by default: with several workers an upload only invalidates the worker that
+# handled it, so other workers can serve a stale index for up to the TTL
+VECTOR_CACHE_ENABLED = os.getenv("VECTOR_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+VECTOR_CACHE_MAX_MB = float(os.getenv("VECTOR_CACHE_MAX_MB", "256"))
+VECTOR_CACHE_TTL_SECONDS = float(os.getenv("VECTOR_CACHE_TTL_SECONDS", "300"))
+# Users with more chunks than this are always searched through the RPC
+VECTOR_CACHE_MAX_CHUNKS_PER_USER = int(os.getenv("VECTOR_CACHE_MAX_CHUNKS_PER_USER", "50000"))
+
+# Per-row bookkeeping on top of the vector and content (ids, list slots, dict)
+_ROW_OVERHEAD_BYTES = 200
+
+
+class UserVectors:
+    """One user's chunks: unit-normalised vectors plus the columns match_file_chunks returns"""
+
+    __slots__ = ('ids', 'contents', 'page_numbers', 'file_ids', 'matrix', 'nbytes', 'expires_at')
+
+    def __init__(self, rows: List[Dict[str, Any]], ttl: float):
+        self.ids = [row['id'] for row in rows]
+        self.contents = [row.get('content') for row in rows]
+        self.page_numbers = [row.get('page_number') for row in rows]
+        self.file_ids = [row.get('file_id') for row in rows]
+        if rows:
+            matrix = np.vstack([parse_vector(row['vector']) for row in rows]).astype(np.float32, copy=False)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.nbytes = (self.matrix.nbytes + sum(len(c or '') for c in self.contents)
+                       + _ROW_OVERHEAD_BYTES * len(rows))
+        self.expires_at = time.monotonic() + ttl
+
+    def search(self, query_vector, match_count: int) -> List[Dict[str, Any]]:
+        """Top match_count chunks by cosine similarity, shaped like match_file_chunks rows"""
+        if not self.ids or match_count <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        if match_count < len(scores):
+            top = np.argpartition(-scores, match_count - 1)[:match_count]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [
+            {
+                'id': self.ids[i],
+                'content': self.contents[i],
+                'page_number': self.page_numbers[i],
+                'file_id': self.file_ids[i],
+                'similarity': float(scores[i])
+            }
+            for i in top
+        ]
+
+
+class VectorCache:
+    """
+    LRU of UserVectors bounded by total bytes.
+    Concurrent misses for the same user share one load, as in TTLCache.get_or_load.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = VECTOR_CACHE_TTL_SECONDS,
+                 max_chunks_per_user: int = VECTOR_CACHE_MAX_CHUNKS_PER_USER):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_chunks_per_user = max_chunks_per_user
+        self._entries: "OrderedDict[str, UserVectors]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # Bumped by invalidate() so a load that raced with an upload is not stored
+        self._generations: Dict[str, int] = {}
+        # Users whose index did not fit, until when to send them straight to the RPC
+        self._oversized: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def search(self, user_uuid: str, query_vector, match_count: int,
+               loader: Callable[[str, int], List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Cached top-k for the user, loading their vectors with loader(user_uuid, limit) on a
+        miss; the loader may stop after limit rows (one more than max_chunks_per_user).
+        Returns None when the user's index does not fit the cache (use the RPC instead);
+        that outcome is remembered for the TTL or until the user is invalidated.
+        """
+        if self._is_oversized(user_uuid):
+            return self._bypass()
+        entry = self._get(user_uuid)
+        if entry is None:
+            entry = self._load(user_uuid, loader)
+            if entry is None:
+                return None
+        return entry.search(query_vector, match_count)
+
+    def invalidate(self, user_uuid: str) -> None:
+        with self._lock:
+            self._generations[user_uuid] = self._generations.get(user_uuid, 0) + 1
+            self._oversized.pop(user_uuid, None)
+            entry = self._entries.pop(user_uuid, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            for user_uuid in list(self._entries):
+                self._generations[user_uuid] = self._generations.get(user_uuid, 0) + 1
+            self._entries.clear()
+            self._oversized.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': VECTOR_CACHE_ENABLED,
+                'users': len(self._entries),
+                'chunks': sum(len(e.ids) for e in self._entries.values()),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'bypassed': self.bypassed,
+                'oversized_users': len(self._oversized),
+                'ttl_seconds': self.ttl
+            }
+
+    def _get(self, user_uuid: str) -> Optional[UserVectors]:
+        with self._lock:
+            entry = self._entries.get(user_uuid)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[user_uuid]
+                self._bytes -= entry.nbytes
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(user_uuid)
+            self.hits += 1
+        metrics.increment("vector_cache_lookups_total", result="hit")
+        return entry
+
+    def _is_oversized(self, user_uuid: str) -> bool:
+        with self._lock:
+            until = self._oversized.get(user_uuid)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._oversized[user_uuid]
+                return False
+            return True
+
+    def _load(self, user_uuid: str, loader: Callable[[str, int], List[Dict[str, Any]]]) -> Optional[UserVectors]:
+        with self._lock:
+            load_lock = self._load_locks.setdefault(user_uuid, threading.Lock())
+        with load_lock:
+            entry = self._get(user_uuid)
+            if entry is not None:
+                return entry
+            with self._lock:
+                self.misses += 1
+                generation = self._generations.get(user_uuid, 0)
+            metrics.increment("vector_cache_lookups_total", result="miss")
+            try:
+                with metrics.span("vector_cache_load"):
+                    rows = loader(user_uuid, self.max_chunks_per_user + 1)
+                if rows is None:
+                    return self._bypass()
+                if len(rows) > self.max_chunks_per_user:
+                    return self._bypass(user_uuid, generation)
+                entry = UserVectors(rows, self.ttl)
+                if entry.nbytes > self.max_bytes:
+                    return self._bypass(user_uuid, generation)
+                self._store(user_uuid, entry, generation)
+                return entry
+            finally:
+                with self._lock:
+                    self._load_locks.pop(user_uuid, None)
+
+    def _bypass(self, oversized_user: Optional[str] = None, generation: Optional[int] = None) -> None:
+        with self._lock:
+            self.bypassed += 1
+            # A file deleted during the load may have shrunk the user: only mark a current result
+            if oversized_user is not None and self._generations.get(oversized_user, 0) == generation:
+                now = time.monotonic()
+                for user_uuid, until in list(self._oversized.items()):
+                    if until <= now:
+                        del self._oversized[user_uuid]
+                self._oversized[oversized_user] = now + self.ttl
+        metrics.increment("vector_cache_lookups_total", result="bypass")
+        return None
+
+    def _store(self, user_uuid: str, entry: UserVectors, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(user_uuid, 0) != generation:
+                # Invalidated while loading: serve this result once, but do not keep it
+                return
+            previous = self._entries.pop(user_uuid, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[user_uuid] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+
+vector_cache = VectorCache(max_bytes=int(VECTOR_CACHE_MAX_MB * 1024 * 1024))
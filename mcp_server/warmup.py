@@ -0,0 +1,159 @@
+"""
+Warm startup: work done before a worker reports itself ready for traffic
+Phases load and exercise the models, build the knowledge-base indexes and open
+pooled connections, so the first chat after a deploy does not pay for them.
+/health answers as soon as the process is up; /ready only once warmup finished.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# "background" serves /health at once and flips /ready when done,
+# "blocking" finishes warmup before the app accepts any request, "off" skips it
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+WARMUP_TEXTS = [
+    "What services does NovaFuze offer?",
+    "Summarize the uploaded document about quarterly billing.",
+    "How do I contact support about my account?",
+]
+
+metrics.registry.describe("startup_phase_seconds", "Duration of each warm startup phase")
+
+
+class StartupState:
+    """Readiness flag plus per-phase results, shared between startup and /ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.phases: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, status: str, seconds: float, detail: Optional[str] = None) -> None:
+        entry = {'phase': phase, 'status': status, 'ms': round(seconds * 1000, 1)}
+        if detail:
+            entry['detail'] = detail
+        with self._lock:
+            self.phases.append(entry)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = [dict(p) for p in self.phases]
+        total = None
+        if self.started_at is not None:
+            total = round(((self.finished_at or time.perf_counter()) - self.started_at) * 1000, 1)
+        return {
+            'ready': self.ready,
+            'status': 'ready' if self.ready else 'warming',
+            'degraded': [p['phase'] for p in phases if p['status'] == 'failed'],
+            'total_ms': total,
+            'phases': phases
+        }
+
+
+def _warm_models() -> str:
+    """
+    Load the encoder and cross-encoder and run one batch through each.
+    Calls the models directly: the embedding helpers return zeros instead of
+    raising, which would report a model that failed to load as warm.
+    """
+    from tools import file_tools
+    if not file_tools.SEMANTIC_EMBEDDINGS_AVAILABLE:
+        return "skipped: sentence-transformers not installed"
+    import embeddings
+    if embeddings.MODEL_SERVER_ADDRESS:
+        from model_server import get_client
+        client = get_client(embeddings.MODEL_SERVER_ADDRESS)
+        client.embed(WARMUP_TEXTS)
+        client.rerank(WARMUP_TEXTS[0], WARMUP_TEXTS)
+        return f"model server at {embeddings.MODEL_SERVER_ADDRESS} answering"
+    embeddings.get_embedding_model().encode(WARMUP_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    embeddings.get_reranker_model().predict([(WARMUP_TEXTS[0], text) for text in WARMUP_TEXTS])
+    return "encoder and re-ranker loaded"
+
+
+def _build_knowledge() -> str:
+    """Knowledge-base line index and the combined UI context from the frontend scan"""
+    from tools import site_tools
+    from novafuze_knowledge import build_knowledge_index
+    lines, _ = build_knowledge_index()
+    return f"{len(lines)} knowledge lines, UI context {len(site_tools.get_ui_context())} chars"
+
+
+def _prime_connections() -> str:
+    """Open a pooled Supabase connection and create the Gemini model clients"""
+    import ai_client
+    from supabase_client import supabase
+    for route in (ai_client.ROUTE_FAST, ai_client.ROUTE_STRONG):
+        ai_client.get_model(route)
+    if supabase is None:
+        return "skipped: Supabase client not initialized"
+    supabase.table('users').select('id').limit(1).execute()
+    return "Supabase pool and Gemini clients ready"
+
+
+def _open_retrieval() -> str:
+    """Open the retrieval backend (reads and maps the local segment files)"""
+    from retrieval_backends import get_retrieval_backend
+    stats = get_retrieval_backend().stats()
+    if stats['backend'] == 'local':
+        return f"local store: {stats['live_rows']} rows in {stats['segments']} segments"
+    return f"{stats['backend']} backend"
+
+
+PHASES: List[Tuple[str, Callable[[], str]]] = [
+    ("connections", _prime_connections),
+    ("knowledge", _build_knowledge),
+    ("retrieval", _open_retrieval),
+    ("models", _warm_models),
+]
+
+
+def run_phase(state: "StartupState", name: str, fn: Callable[[], Optional[str]]) -> str:
+    """Run one startup phase, recording its duration and outcome; returns the status"""
+    start = time.perf_counter()
+    if state.started_at is None:
+        state.started_at = start
+    try:
+        detail = fn()
+        status = "skipped" if detail and detail.startswith("skipped") else "ok"
+    except Exception as e:
+        detail, status = str(e), "failed"
+        logger.warning("Startup phase %s failed: %s", name, e)
+    elapsed = time.perf_counter() - start
+    metrics.observe("startup_phase_seconds", elapsed, phase=name)
+    state.record(name, status, elapsed, detail)
+    logger.info("Startup phase %s %s in %.0f ms", name, status, elapsed * 1000)
+    return status
+
+
+def run_warmup(state: "StartupState", phases: Optional[List[Tuple[str, Callable[[], str]]]] = None) -> Dict[str, Any]:
+    """
+    Run every warmup phase in order and mark the worker ready.
+    A failing phase is logged and reported as degraded; the worker still becomes
+    ready, since it would have served traffic cold before warmup existed.
+    """
+    for name, fn in phases or PHASES:
+        run_phase(state, name, fn)
+    state.finished_at = time.perf_counter()
+    state.ready = True
+    logger.info("Warm startup finished in %.0f ms", (state.finished_at - state.started_at) * 1000)
+    return state.snapshot()
+
+
+def mark_ready(state: "StartupState") -> None:
+    """Readiness without warmup (WARMUP_MODE=off)"""
+    state.finished_at = time.perf_counter()
+    state.ready = True
+
+
+startup_state = StartupState()